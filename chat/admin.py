@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, Message,OnlineChatStatus
+from .models import Conversation, Message, OnlineChatStatus, ConversationSummary
 from .models import DELIVERED, READ  
 
 class ConversationAdmin(admin.ModelAdmin):
@@ -35,3 +35,12 @@ class MessageAdmin(admin.ModelAdmin):
 admin.site.register(Conversation, ConversationAdmin)
 admin.site.register(Message, MessageAdmin)
 admin.site.register(OnlineChatStatus)
+
+
+class ConversationSummaryAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'partner_name', 'last_activity', 'unread_count')
+    search_fields = ('owner__username', 'partner_name')
+    ordering = ('-last_activity',)
+
+
+admin.site.register(ConversationSummary, ConversationSummaryAdmin)
@@ -0,0 +1,153 @@
+"""
+Per-worker identity cache for the chat consumer: a bounded in-process LRU with
+a TTL in front of the shared Redis cache. Other workers see invalidations once
+their local entry expires.
+
+Users are cached as the few fields the consumer reads (USER_FIELDS plus the
+avatar), never the whole row with its password hash and permissions.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from user_authentication.models import CustomUser
+from .inbox import avatar_name
+from .models import Conversation
+
+# CustomUser fields the chat consumer reads off a cached user
+USER_FIELDS = ['id', 'full_name', 'role']
+
+
+class LRUCache:
+    """
+    Thread-safe, bounded LRU mapping with a per-entry time-to-live.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+users = LRUCache(settings.CHAT_IDENTITY_CACHE_SIZE, settings.CHAT_IDENTITY_CACHE_TTL)
+conversations = LRUCache(settings.CHAT_IDENTITY_CACHE_SIZE, settings.CHAT_IDENTITY_CACHE_TTL)
+
+
+def _user_key(user_id):
+    return f"chat:user:{user_id}"
+
+
+def _pair(user_one_id, user_two_id):
+    return tuple(sorted((int(user_one_id), int(user_two_id))))
+
+
+def _conversation_key(pair):
+    return f"chat:conversation:{pair[0]}:{pair[1]}"
+
+
+def _user_data(user):
+    data = {field: getattr(user, field) for field in USER_FIELDS}
+    data['avatar'] = avatar_name(user)
+    return data
+
+
+def _from_data(data):
+    """
+    A CustomUser holding only the cached fields; any other field is deferred
+    and loaded from the database on access.
+    """
+    # from_db takes the values in the model's field order
+    fields = [field.attname for field in CustomUser._meta.concrete_fields if field.attname in USER_FIELDS]
+    user = CustomUser.from_db('default', fields, [data[field] for field in fields])
+    user.avatar = data['avatar']
+    return user
+
+
+def cached_user(user_id):
+    """
+    User from the in-process cache, or None. Safe to call from the event loop.
+    """
+    return users.get(int(user_id))
+
+
+def load_user(user_id):
+    """
+    User from Redis, falling back to the database; fills both cache tiers.
+    """
+    user_id = int(user_id)
+    data = cache.get(_user_key(user_id))
+    if data is None:
+        data = _user_data(
+            CustomUser.objects.select_related('investor_preferences', 'business_preferences').get(id=user_id)
+        )
+        cache.set(_user_key(user_id), data, settings.CHAT_IDENTITY_CACHE_TTL)
+    user = _from_data(data)
+    users.set(user_id, user)
+    return user
+
+
+def cached_conversation(user_one_id, user_two_id):
+    """
+    Conversation between two users from the in-process cache, or None.
+    """
+    return conversations.get(_pair(user_one_id, user_two_id))
+
+
+def load_conversation(user_one_id, user_two_id):
+    """
+    Conversation between two users from Redis or the database, creating it if
+    it does not exist yet; fills both cache tiers.
+    """
+    pair = _pair(user_one_id, user_two_id)
+    conversation = cache.get(_conversation_key(pair))
+    if conversation is None:
+        conversation = Conversation.objects.filter(
+            Q(user_one_id=user_one_id, user_two_id=user_two_id) |
+            Q(user_one_id=user_two_id, user_two_id=user_one_id)
+        ).first()
+        if conversation is None:
+            conversation = Conversation.objects.create(user_one_id=user_one_id, user_two_id=user_two_id)
+        cache.set(_conversation_key(pair), conversation, settings.CHAT_IDENTITY_CACHE_TTL)
+    conversations.set(pair, conversation)
+    return conversation
+
+
+def invalidate_user(user_id):
+    users.delete(int(user_id))
+    cache.delete(_user_key(user_id))
+
+
+def invalidate_conversation(user_one_id, user_two_id):
+    pair = _pair(user_one_id, user_two_id)
+    conversations.delete(pair)
+    cache.delete(_conversation_key(pair))
@@ -1,27 +1,47 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
-from .models import Conversation, Message, OnlineChatStatus
-from user_authentication.models import CustomUser
+from .models import Message
+from .summaries import record_message
+from . import cache as identity_cache
+from . import presence
+from . import write_behind
+from .uploads import VoiceUpload, UploadTooLarge
+from notifications.tasks import notify_offline_message
+from django.conf import settings
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from channels.db import database_sync_to_async
-from django_redis import get_redis_connection
-from django.db.models import Q
-import base64, os, uuid, logging, json
+import asyncio, base64, uuid, logging, json
 from django.core.files.base import ContentFile
 
 
 logger = logging.getLogger(__name__)
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    # Persist text messages through the Redis stream instead of inline INSERTs
+    write_behind = settings.CHAT_WRITE_BEHIND
+    user = None
+    voice_upload = None
+    heartbeat_task = None
+
     async def connect(self):
         """
         Handle new WebSocket connection
         """
         try:
-            # Extract user ID from the WebSocket connection URL
-            user_id = self.scope['url_route']['kwargs']['id']
-            
-            # Retrieve the user
-            self.user = await self.get_user(user_id)
+            # The user comes from the JWT access token, not the URL
+            user = self.scope.get('user')
+            if user is None or not user.is_authenticated:
+                await self.close(code=4001)
+                return
+
+            # Legacy URLs carry an id, which must be the token's user
+            url_id = self.scope['url_route']['kwargs'].get('id')
+            if url_id is not None and str(url_id) != str(user.id):
+                await self.close(code=4003)
+                return
+
+            self.user = user
+            user_id = user.id
             
             # Create a unique chat room for this user
             self.chat_room = f'user_{user_id}_chat'
@@ -29,15 +49,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
             # Add the user to their personal chat room group
             await self.channel_layer.group_add(self.chat_room, self.channel_name)
             
-            # Update user status
-            await self.update_user_status('online')
-            await self.update_user_status_db(user_id, 'online')
+            # Register this connection; only the user's first tab announces them online
+            came_online = await presence.connect(self.user.id, self.channel_name)
+            if came_online:
+                await self.broadcast_status_change(presence.ONLINE)
+            self.heartbeat_task = asyncio.ensure_future(self.keep_alive())
             
-            # Broadcast status change to conversation partners
-            await self.broadcast_status_change('online')
-            
-            # Accept the WebSocket connection
-            await self.accept()
+            # Accept the WebSocket connection, echoing the auth subprotocol if one was used
+            await self.accept(subprotocol=self.scope.get('auth_subprotocol'))
             
             logger.info(f"User {user_id} connected to WebSocket successfully")
         
@@ -49,13 +68,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         Handle WebSocket disconnection
         """
+        if self.user is None:
+            # Rejected before joining any group
+            return
+
         try:
-            # Update user status to offline
-            await self.update_user_status('offline')
-            await self.update_user_status_db(self.user.pk, 'offline')
-            
-            # Broadcast status change
-            await self.broadcast_status_change('offline')
+            # Drop a voice upload that was never finished
+            if self.voice_upload:
+                self.voice_upload.discard()
+                self.voice_upload = None
+
+            if self.heartbeat_task:
+                self.heartbeat_task.cancel()
+
+            # Other tabs keep the user online; otherwise go offline after a grace period
+            remaining = await presence.disconnect(self.user.id, self.channel_name)
+            if not remaining:
+                asyncio.ensure_future(self.offline_after_grace())
             
             # Remove user from the chat room group
             await self.channel_layer.group_discard(self.chat_room, self.channel_name)
@@ -65,11 +94,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"WebSocket disconnection error: {e}")
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """
         Handle incoming WebSocket messages
         """
         try:
+            # Binary frames carry chunks of the voice upload in progress
+            if bytes_data is not None:
+                await self.handle_audio_chunk(bytes_data)
+                return
+
             # Parse incoming JSON data
             data = json.loads(text_data)
             message_type = data.get('content_type', 'message')
@@ -78,8 +112,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.handle_chat_message(data)
             elif message_type == 'status_request':
                 await self.handle_status_request(data)
+            elif message_type == 'status_batch_request':
+                await self.handle_status_batch_request(data)
+            elif message_type == 'heartbeat':
+                await self.handle_heartbeat(data)
             elif message_type == 'audio':
                 await self.handle_chat_audio(data)
+            elif message_type == 'audio_start':
+                await self.handle_audio_start(data)
+            elif message_type == 'audio_finish':
+                await self.handle_audio_finish(data)
+            elif message_type == 'audio_cancel':
+                await self.handle_audio_cancel(data)
         
         except json.JSONDecodeError:
             logger.error("Invalid JSON received")
@@ -93,7 +137,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         try:
             # Extract message details
             message_content = data.get('message')
-            sender_id = data.get('sender_id')
+            # Always the authenticated user; a client supplied sender_id is ignored
+            sender_id = self.user.id
             receiver_id = data.get('receiver_id')
             
             # Get sender and receiver
@@ -107,11 +152,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
             # Get or create conversation
             conversation = await self.get_or_create_conversation(sender, receiver)
             
-            # Create message
-            message = await self.create_message(conversation, sender, message_content)
+            # Create message (buffered for batched persistence in write-behind mode)
+            if self.write_behind:
+                message = await self.buffer_message(conversation, sender, message_content)
+            else:
+                message = await self.create_message(conversation, sender, message_content)
             
             # Send message to both sender and receiver rooms
             await self.send_chat_message(message, [sender_room, receiver_room])
+            await self.notify_if_offline(sender, receiver, message)
         
         except Exception as e:
             logger.error(f"Chat message handling error: {e}")
@@ -122,7 +171,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         try:
             audio_content = data.get('audio_data')
-            sender_id = data.get('sender_id')
+            # Always the authenticated user; a client supplied sender_id is ignored
+            sender_id = self.user.id
             receiver_id = data.get('receiver_id')
             
             sender = await self.get_user(sender_id)
@@ -136,10 +186,100 @@ class ChatConsumer(AsyncWebsocketConsumer):
             message = await self.create_audio_message(conversation, sender, audio_content)
             
             await self.send_chat_message(message, [sender_room, receiver_room])
+            await self.notify_if_offline(sender, receiver, message)
         
         except Exception as e:
             logger.error(f"Chat audio message handling error: {e}")
 
+    async def handle_audio_start(self, data):
+        """
+        Begin a streamed voice upload; the audio follows as binary frames
+        """
+        try:
+            if self.voice_upload:
+                self.voice_upload.discard()
+
+            declared_size = int(data.get('size') or 0)
+            if declared_size > settings.CHAT_VOICE_MAX_BYTES:
+                await self.send_upload_error(None, 'Voice message is too large')
+                return
+
+            self.voice_upload = VoiceUpload(self.user.id, data.get('receiver_id'))
+            await self.send(text_data=json.dumps({
+                'type': 'audio_upload_ready',
+                'upload_id': self.voice_upload.upload_id,
+                'max_bytes': self.voice_upload.max_bytes,
+            }))
+
+        except Exception as e:
+            logger.error(f"Audio upload start error: {e}")
+
+    async def handle_audio_chunk(self, chunk):
+        """
+        Append a binary frame to the voice upload in progress
+        """
+        upload = self.voice_upload
+        if upload is None:
+            await self.send_upload_error(None, 'No voice upload in progress')
+            return
+
+        try:
+            await sync_to_async(upload.append, thread_sensitive=False)(chunk)
+        except UploadTooLarge as e:
+            upload.discard()
+            self.voice_upload = None
+            await self.send_upload_error(upload.upload_id, str(e))
+
+    async def handle_audio_finish(self, data):
+        """
+        Store the completed voice upload, then create and broadcast its message
+        """
+        upload = self.voice_upload
+        if upload is None or upload.upload_id != data.get('upload_id'):
+            await self.send_upload_error(data.get('upload_id'), 'Unknown voice upload')
+            return
+        self.voice_upload = None
+
+        try:
+            if not upload.size:
+                await self.send_upload_error(upload.upload_id, 'Voice message is empty')
+                return
+
+            sender = await self.get_user(upload.sender_id)
+            receiver = await self.get_user(upload.receiver_id)
+            conversation = await self.get_or_create_conversation(sender, receiver)
+
+            message = await self.create_uploaded_audio_message(conversation, sender, upload)
+
+            await self.send_chat_message(
+                message, [f'user_{sender.id}_chat', f'user_{receiver.id}_chat']
+            )
+            await self.notify_if_offline(sender, receiver, message)
+
+        except Exception as e:
+            logger.error(f"Audio upload finish error: {e}")
+            await self.send_upload_error(upload.upload_id, 'Failed to store voice message')
+        finally:
+            upload.discard()
+
+    async def handle_audio_cancel(self, data):
+        """
+        Abort the voice upload in progress
+        """
+        if self.voice_upload:
+            self.voice_upload.discard()
+            self.voice_upload = None
+
+    async def send_upload_error(self, upload_id, error):
+        """
+        Report a failed voice upload to the client
+        """
+        await self.send(text_data=json.dumps({
+            'type': 'audio_upload_error',
+            'upload_id': upload_id,
+            'error': error,
+        }))
+
     async def handle_status_request(self, data):
         """
         Handle status request from client
@@ -160,25 +300,79 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Status request error: {e}")
 
+    async def handle_status_batch_request(self, data):
+        """
+        Handle a status request for many users at once (e.g. a contact list)
+        """
+        try:
+            user_ids = presence.parse_user_ids(data.get('user_ids') or [])
+            statuses = await self.get_user_statuses(user_ids)
+
+            await self.send(text_data=json.dumps({
+                'type': 'status_batch_response',
+                'statuses': statuses,
+            }))
+
+        except ValueError as e:
+            await self.send(text_data=json.dumps({
+                'type': 'status_batch_error',
+                'error': str(e),
+            }))
+        except Exception as e:
+            logger.error(f"Status batch request error: {e}")
+
+    async def handle_heartbeat(self, data):
+        """
+        Refresh presence on a client heartbeat and acknowledge it
+        """
+        try:
+            await presence.heartbeat(self.user.id, self.channel_name)
+            await self.send(text_data=json.dumps({'type': 'heartbeat_ack'}))
+
+        except Exception as e:
+            logger.error(f"Heartbeat error: {e}")
+
+    async def keep_alive(self):
+        """
+        Heartbeat presence for as long as this connection is open
+        """
+        while True:
+            await asyncio.sleep(settings.CHAT_PRESENCE_HEARTBEAT_INTERVAL)
+            try:
+                await presence.heartbeat(self.user.id, self.channel_name)
+            except Exception as e:
+                logger.error(f"Presence heartbeat error: {e}")
+
+    async def offline_after_grace(self):
+        """
+        Announce the user offline unless they reconnect within the grace period
+        """
+        try:
+            await asyncio.sleep(settings.CHAT_PRESENCE_OFFLINE_GRACE)
+            went_offline = await presence.go_offline_if_idle(self.user.id)
+            if went_offline:
+                await self.broadcast_status_change(presence.OFFLINE)
+
+        except Exception as e:
+            logger.error(f"Presence offline error: {e}")
+
     async def broadcast_status_change(self, status):
         """
-        Broadcast user status change to conversation partners
+        Broadcast user status change to conversation partners that are online
         """
         try:
-            # Get users in conversations with current user
-            conversation_users = await self.get_users_in_conversations()
+            # Cached partner list filtered by presence; offline partners fetch status on connect
+            partner_ids = await presence.online_partner_ids(self.user.id)
             
-            # Send status update to each conversation partner
-            for user in conversation_users:
-                user_room = f'user_{user.id}_chat'
-                await self.channel_layer.group_send(
-                    user_room,
-                    {
-                        "type": "status_update",
-                        "user_id": self.user.id,
-                        "status": status,
-                    }
-                )
+            event = {
+                "type": "status_update",
+                "user_id": self.user.id,
+                "status": status,
+            }
+            await asyncio.gather(*(
+                self.channel_layer.group_send(f'user_{partner_id}_chat', event)
+                for partner_id in partner_ids
+            ))
         
         except Exception as e:
             logger.error(f"Status broadcast error: {e}")
@@ -208,6 +402,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Send chat message error: {e}")
 
+    async def notify_if_offline(self, sender, receiver, message):
+        """
+        Leave a notification for a receiver with no chat socket open; written
+        by the task worker so the send path stays free of database writes
+        """
+        try:
+            if await presence.status(receiver.id) == presence.OFFLINE:
+                await notify_offline_message.adelay(sender.id, receiver.id, message.conversation_id, message.id)
+
+        except Exception as e:
+            logger.error(f"Offline message notification error: {e}")
+
     async def chat_message(self, event):
         """
         Forward received message to WebSocket client
@@ -238,53 +444,32 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Status update sending error: {e}")
 
-    async def update_user_status(self, status):
+    async def get_user(self, user_id):
         """
-        Update user status in Redis
+        Retrieve user, from the identity cache when possible
         """
-        try:
-            # Get Redis connection
-            redis_connection = get_redis_connection("default")
-            
-            # Set user status in Redis
-            await database_sync_to_async(redis_connection.set)(
-                f"user:{self.user.id}:status", status
-            )
-        
-        except Exception as e:
-            logger.error(f"Redis status update error: {e}")
+        user = identity_cache.cached_user(user_id)
+        if user is None:
+            user = await database_sync_to_async(identity_cache.load_user)(user_id)
+        return user
 
-    @database_sync_to_async
-    def get_user(self, user_id):
+    async def get_or_create_conversation(self, user_one, user_two):
         """
-        Retrieve user from database
+        Retrieve or create a conversation between two users, from the identity cache when possible
         """
-        return CustomUser.objects.get(id=int(user_id))
-
-    @database_sync_to_async
-    def get_or_create_conversation(self, user_one, user_two):
-        """
-        Retrieve or create a conversation between two users
-        """
-        try:
-            # Try to find existing conversation
-            return Conversation.objects.get(
-                (Q(user_one=user_one, user_two=user_two) | 
-                 Q(user_one=user_two, user_two=user_one))
-            )
-        except Conversation.DoesNotExist:
-            # Create new conversation if not exists
-            return Conversation.objects.create(
-                user_one=user_one, 
-                user_two=user_two
+        conversation = identity_cache.cached_conversation(user_one.id, user_two.id)
+        if conversation is None:
+            conversation = await database_sync_to_async(identity_cache.load_conversation)(
+                user_one.id, user_two.id
             )
+        return conversation
 
     @database_sync_to_async
     def create_message(self, conversation, sender, content):
         """
         Create and save text message to database
         """
-        return Message.objects.create(
+        message = Message.objects.create(
             conversation=conversation,
             sender=sender,
             content_type='text',
@@ -292,7 +477,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
             status='sent',
             timestamp=timezone.now()
         )
+        record_message(message)
+        return message
     
+    async def buffer_message(self, conversation, sender, content):
+        """
+        Assign id and timestamp to a text message and queue it for persistence
+        """
+        return await write_behind.buffer_message(conversation, sender, content)
+
     @database_sync_to_async
     def create_audio_message(self, conversation, sender, content):
         """
@@ -311,64 +504,41 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
         
         message.voice.save(audio_file_name, ContentFile(audio_data), save=True)
+        record_message(message)
         
         return message
 
     @database_sync_to_async
-    def get_user_status(self, user_id):
+    def create_uploaded_audio_message(self, conversation, sender, upload):
         """
-        Retrieve user status from Redis
+        Stream a finished voice upload into storage, then save its message
         """
-        try:
-            redis_connection = get_redis_connection("default")
-            status = redis_connection.get(f"user:{user_id}:status")
-            return status.decode('utf-8') if status else 'offline'
-        except Exception as e:
-            logger.error(f"Get user status error: {e}")
-            return 'offline'
-    
-    @database_sync_to_async
-    def update_user_status_db(self, user_id, status):
+        message = Message(
+            conversation=conversation,
+            sender=sender,
+            content_type='voice',
+            status='sent',
+            timestamp=timezone.now()
+        )
+        voice_file = upload.as_file()
+        message.voice.save(voice_file.name, voice_file, save=False)
+        message.save()
+        record_message(message)
+
+        return message
+
+    async def get_user_status(self, user_id):
         """
-        Update user status in database
+        Retrieve user status from presence
         """
         try:
-            # Get or create OnlineChatStatus
-            online_status, created = OnlineChatStatus.objects.get_or_create(
-                user_id=user_id,
-                defaults={'status': status}
-            )
-            
-            # Update status if not created
-            if not created:
-                online_status.status = status
-                online_status.save()
-            
-            return online_status
-        
+            return await presence.status(user_id)
         except Exception as e:
-            logger.error(f"Database status update error: {e}")
-            return None
+            logger.error(f"Get user status error: {e}")
+            return 'offline'
 
-    @database_sync_to_async
-    def get_users_in_conversations(self):
+    async def get_user_statuses(self, user_ids):
         """
-        Retrieve users involved in conversations with current user
+        Retrieve the status of many users from presence in one round trip
         """
-        try:
-            # Find conversations involving the current user
-            conversations = Conversation.objects.filter(
-                Q(user_one=self.user) | Q(user_two=self.user)
-            )
-            
-            # Get unique users from these conversations
-            users = CustomUser.objects.filter(
-                Q(conversations_as_user_one__in=conversations) | 
-                Q(conversations_as_user_two__in=conversations)
-            ).exclude(id=self.user.id).distinct()
-            
-            return list(users)
-        
-        except Exception as e:
-            logger.error(f"Get conversation users error: {e}")
-            return []
\ No newline at end of file
+        return await presence.astatuses(user_ids)
@@ -0,0 +1,127 @@
+from django.core.files.storage import default_storage
+from django.db.models import Q, OuterRef, Subquery
+from .models import Conversation, ConversationSummary, Message, TEXT, IMAGE, VOICE
+from . import presence
+from zephyr import images
+
+
+def _file_url(field_name, name):
+    """
+    Build the storage URL for a file name read straight from the database.
+    """
+    if not name:
+        return None
+    return Message._meta.get_field(field_name).storage.url(name)
+
+
+def _message_content(content_type, content, image, voice):
+    """
+    Mirror of `Message.get_content` for values annotated onto a conversation.
+    """
+    if content_type == TEXT:
+        return content
+    elif content_type == IMAGE:
+        return _file_url('image', image)
+    elif content_type == VOICE:
+        return _file_url('voice', voice)
+    return None
+
+
+def display_name(user):
+    """
+    Name shown for a user in chat: company name for businesses, full name otherwise.
+    """
+    if user.role == 'business':
+        business_pref = getattr(user, 'business_preferences', None)
+        if business_pref and business_pref.company_name:
+            return business_pref.company_name
+    return user.full_name
+
+
+def avatar_name(user):
+    """
+    Storage name of a user's avatar thumbnail based on their role (the original
+    while the thumbnail is pending), or None if they have not set one.
+    """
+    if user.role == 'investor':
+        preferences = getattr(user, 'investor_preferences', None)
+    elif user.role == 'business':
+        preferences = getattr(user, 'business_preferences', None)
+    else:
+        preferences = None
+    return images.variant_name_or_original(preferences, 'avatar_image') if preferences else None
+
+
+def avatar_url(user):
+    """
+    Avatar URL for a user based on their role, or None if they have not set one.
+    """
+    name = avatar_name(user)
+    return default_storage.url(name) if name else None
+
+
+def conversations_for_inbox(user=None):
+    """
+    Conversations (of `user`, if given) with both participants' profiles joined
+    in and the last message annotated, so they can be summarised in one query.
+    """
+    last_message = Message.objects.filter(conversation=OuterRef('pk')).order_by('-timestamp', '-id')
+
+    conversations = Conversation.objects.all()
+    if user is not None:
+        conversations = conversations.filter(Q(user_one=user) | Q(user_two=user))
+
+    return conversations.select_related(
+        'user_one__investor_preferences',
+        'user_one__business_preferences',
+        'user_two__investor_preferences',
+        'user_two__business_preferences',
+    ).annotate(
+        last_message_type=Subquery(last_message.values('content_type')[:1]),
+        last_message_content=Subquery(last_message.values('content')[:1]),
+        last_message_image=Subquery(last_message.values('image')[:1]),
+        last_message_voice=Subquery(last_message.values('voice')[:1]),
+        last_message_at=Subquery(last_message.values('timestamp')[:1]),
+    ).order_by('-last_updated')
+
+
+def last_message_preview(conversation):
+    """
+    Inbox preview of the last message annotated by `conversations_for_inbox`.
+    """
+    if conversation.last_message_at is None:
+        return None
+    return _message_content(
+        conversation.last_message_type,
+        conversation.last_message_content,
+        conversation.last_message_image,
+        conversation.last_message_voice,
+    )
+
+
+def build_inbox(user):
+    """
+    Build the chat inbox payload for `user` from their conversation summaries.
+
+    One indexed range scan over the user's `ConversationSummary` rows ordered by
+    last activity, plus one Redis MGET for the partners' presence.
+    """
+    summaries = list(
+        ConversationSummary.objects.filter(owner=user).order_by('-last_activity')
+    )
+
+    statuses = presence.statuses({summary.partner_id for summary in summaries})
+
+    return [
+        {
+            "user_id": summary.partner_id,
+            "user_name": summary.partner_name,
+            "status": statuses.get(summary.partner_id, 'offline'),
+            "avatar_image": default_storage.url(summary.partner_avatar) if summary.partner_avatar else None,
+            "last_message": summary.last_message if summary.last_message_at else "No messages",
+            "last_seen_time": summary.last_message_at,
+            "unread_count": summary.unread_count,
+            "conversation_id": summary.conversation_id,
+        }
+        for summary in summaries
+    ]
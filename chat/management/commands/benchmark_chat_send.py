@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+import uuid
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+from user_authentication.models import CustomUser
+from chat.consumers import ChatConsumer
+from chat import write_behind
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark chat sends through ChatConsumer: messages/sec and send-to-receive "
+        "latency for inline INSERTs versus write-behind persistence."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--mode', choices=['inline', 'write-behind', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        sender = CustomUser.objects.create(
+            username=f'bench-sender-{run_id}', email=f'sender-{run_id}@bench.invalid', full_name='Bench Sender',
+        )
+        receiver = CustomUser.objects.create(
+            username=f'bench-receiver-{run_id}', email=f'receiver-{run_id}@bench.invalid', full_name='Bench Receiver',
+        )
+        modes = ['inline', 'write-behind'] if options['mode'] == 'both' else [options['mode']]
+        try:
+            for mode in modes:
+                if mode == 'write-behind':
+                    result = self.run_write_behind(sender, receiver, options)
+                else:
+                    result = async_to_sync(self.run_mode)(sender, receiver, False, options)
+                self.report(mode, result)
+        finally:
+            # Conversations and messages cascade with the users.
+            sender.delete()
+            receiver.delete()
+
+    def run_write_behind(self, sender, receiver, options):
+        flusher = write_behind.MessageFlusher(f'benchmark-{sender.pk}')
+        flusher.ensure_group()
+        thread = threading.Thread(target=flusher.run, daemon=True)
+        thread.start()
+        try:
+            result = async_to_sync(self.run_mode)(sender, receiver, True, options)
+            redis = get_redis_connection("default")
+            started = time.perf_counter()
+            while redis.xlen(write_behind.STREAM_KEY):
+                time.sleep(0.01)
+            result['persisted_after'] = time.perf_counter() - started
+        finally:
+            flusher.stop()
+            thread.join()
+        return result
+
+    async def run_mode(self, sender, receiver, buffered, options):
+        total = options['messages']
+        layer = get_channel_layer()
+        consumer = ChatConsumer()
+        consumer.channel_layer = layer
+        consumer.user = sender
+        consumer.write_behind = buffered
+
+        receiver_room = f'user_{receiver.id}_chat'
+        receiver_channel = await layer.new_channel()
+        await layer.group_add(receiver_room, receiver_channel)
+
+        sent_at = {}
+        latencies = []
+
+        async def receive_all():
+            while len(latencies) < total:
+                event = await layer.receive(receiver_channel)
+                started = sent_at.pop(event.get('content'), None)
+                if started is not None:
+                    latencies.append(time.perf_counter() - started)
+
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def send(index):
+            async with semaphore:
+                content = f'benchmark message {index}'
+                sent_at[content] = time.perf_counter()
+                await consumer.handle_chat_message({
+                    'message': content,
+                    'sender_id': sender.id,
+                    'receiver_id': receiver.id,
+                })
+
+        # Warm up the identity cache and the conversation outside the measurement.
+        await consumer.get_or_create_conversation(sender, receiver)
+
+        started = time.perf_counter()
+        receiving = asyncio.ensure_future(receive_all())
+        await asyncio.gather(*(send(index) for index in range(total)))
+        await asyncio.wait_for(receiving, timeout=120)
+        elapsed = time.perf_counter() - started
+        await layer.group_discard(receiver_room, receiver_channel)
+
+        latencies.sort()
+        return {
+            'throughput': total / elapsed,
+            'p50': latencies[len(latencies) // 2],
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        }
+
+    def report(self, mode, result):
+        line = (
+            f"{mode:>12}: {result['throughput']:8.1f} msg/s   "
+            f"p50 {result['p50'] * 1000:7.2f} ms   p99 {result['p99'] * 1000:7.2f} ms"
+        )
+        if 'persisted_after' in result:
+            line += f"   fully persisted {result['persisted_after'] * 1000:.0f} ms after last receive"
+        self.stdout.write(line)
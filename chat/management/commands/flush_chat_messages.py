@@ -0,0 +1,22 @@
+import socket
+from django.core.management.base import BaseCommand
+from chat.write_behind import MessageFlusher
+
+
+class Command(BaseCommand):
+    help = "Persist chat messages buffered in write-behind mode from the Redis stream to the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer', default=socket.gethostname(),
+            help="Stream consumer name; keep it stable across restarts so pending messages are replayed.",
+        )
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        flusher = MessageFlusher(options['consumer'], batch_size=options['batch_size'])
+        self.stdout.write(f"Flushing chat messages as consumer '{options['consumer']}'")
+        try:
+            flusher.run()
+        except KeyboardInterrupt:
+            flusher.stop()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from chat.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized chat inbox rows (ConversationSummary) from messages and profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        processed = rebuild_summaries(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt summaries for {processed} conversations."))
@@ -54,6 +54,9 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['timestamp']  
+        indexes = [
+            models.Index(fields=['conversation', 'timestamp', 'id'], name='chat_msg_conv_ts_id'),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} at {self.timestamp}"
@@ -87,4 +90,30 @@ class OnlineChatStatus(models.Model):
     status=models.CharField(max_length=20,default='offline')
 
     def __str__(self) -> str:
-        return f"user:{self.user}-status:{self.status}"
\ No newline at end of file
+        return f"user:{self.user}-status:{self.status}"
+
+class ConversationSummary(models.Model):
+    """
+    Denormalized inbox row for one participant of a conversation.
+
+    Kept up to date as messages are sent and as the partner's profile changes,
+    so the inbox is a single range scan over the owner's rows.
+    """
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='conversation_summaries')
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='summaries')
+    partner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    partner_name = models.CharField(max_length=255, blank=True)
+    partner_avatar = models.CharField(max_length=255, blank=True, null=True)  # Storage name of the partner's avatar
+    last_message = models.TextField(blank=True, null=True)
+    last_message_at = models.DateTimeField(blank=True, null=True)
+    last_activity = models.DateTimeField()  # Last message time, or conversation creation time
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['owner', 'conversation']
+        indexes = [
+            models.Index(fields=['owner', '-last_activity'], name='chat_summary_owner_activity'),
+        ]
+
+    def __str__(self):
+        return f"Summary of conversation {self.conversation_id} for {self.owner_id}"
@@ -0,0 +1,71 @@
+import base64
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+class MessageKeysetPagination:
+    """
+    Keyset pagination over messages ordered by (timestamp, id).
+
+    Without a cursor the newest `limit` messages are returned. `before=<cursor>`
+    pages towards older messages (infinite scroll) and `after=<cursor>` towards
+    newer ones. Each page is an index range scan on
+    (conversation_id, timestamp, id), so its cost does not depend on how deep
+    into the thread it is. Messages are always returned oldest first.
+    """
+    default_limit = 50
+    max_limit = 200
+
+    def encode_cursor(self, message):
+        raw = f"{message.timestamp.isoformat()}|{message.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(timestamp), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise ValidationError({"cursor": "Invalid cursor."})
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({"limit": "Limit must be an integer."})
+        return max(1, min(limit, self.max_limit))
+
+    def paginate_queryset(self, queryset, request):
+        limit = self.get_limit(request)
+        before = request.query_params.get('before')
+        after = request.query_params.get('after')
+
+        if after:
+            timestamp, pk = self.decode_cursor(after)
+            queryset = queryset.filter(
+                Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk)
+            ).order_by('timestamp', 'id')
+            page = list(queryset[:limit + 1])
+            self.has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            if before:
+                timestamp, pk = self.decode_cursor(before)
+                queryset = queryset.filter(
+                    Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk)
+                )
+            page = list(queryset.order_by('-timestamp', '-id')[:limit + 1])
+            self.has_more = len(page) > limit
+            page = page[:limit][::-1]
+
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "messages": data,
+            "has_more": self.has_more,
+            "before": self.encode_cursor(self.page[0]) if self.page else None,
+            "after": self.encode_cursor(self.page[-1]) if self.page else None,
+        })
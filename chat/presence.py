@@ -0,0 +1,190 @@
+"""
+Redis-only presence for chat users.
+
+Every open websocket is a member of the user's connection set, scored with the
+time of its last heartbeat, so several tabs keep the user online until the last
+one closes or stops heartbeating. `user:{id}:status` holds 'online' with a TTL
+refreshed by heartbeats: a crashed worker's users drop to offline on their own.
+Partner lists used for status fan-out are cached rather than queried per event.
+
+The consumer side is async on the shared asyncio pool; `statuses()` and
+`invalidate_partners()` are the synchronous entry points for views and signals.
+"""
+import json
+import time
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django_redis import get_redis_connection
+from zephyr.async_redis import get_connection
+from .models import Conversation
+
+ONLINE = 'online'
+OFFLINE = 'offline'
+
+
+def _status_key(user_id):
+    return f"user:{user_id}:status"
+
+
+def _connections_key(user_id):
+    return f"presence:{user_id}:connections"
+
+
+def _partners_key(user_id):
+    return f"chat:partners:{user_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+async def connect(user_id, channel_name):
+    """
+    Register a websocket connection and mark the user online.
+
+    Returns True when the user was not online before, i.e. partners should be told.
+    """
+    now = time.time()
+    ttl = settings.CHAT_PRESENCE_TTL
+    pipeline = get_connection().pipeline()
+    pipeline.zadd(_connections_key(user_id), {channel_name: now})
+    pipeline.zremrangebyscore(_connections_key(user_id), '-inf', now - ttl)
+    pipeline.expire(_connections_key(user_id), ttl)
+    pipeline.set(_status_key(user_id), ONLINE, ex=ttl, get=True)
+    previous = (await pipeline.execute())[-1]
+    return previous != ONLINE.encode()
+
+
+async def heartbeat(user_id, channel_name):
+    """
+    Keep a connection, and with it the user's online status, alive for another TTL.
+    """
+    ttl = settings.CHAT_PRESENCE_TTL
+    pipeline = get_connection().pipeline()
+    pipeline.zadd(_connections_key(user_id), {channel_name: time.time()})
+    pipeline.expire(_connections_key(user_id), ttl)
+    pipeline.set(_status_key(user_id), ONLINE, ex=ttl)
+    await pipeline.execute()
+
+
+async def disconnect(user_id, channel_name):
+    """
+    Drop a websocket connection. Returns the number of live connections left.
+    """
+    now = time.time()
+    pipeline = get_connection().pipeline()
+    pipeline.zrem(_connections_key(user_id), channel_name)
+    pipeline.zremrangebyscore(_connections_key(user_id), '-inf', now - settings.CHAT_PRESENCE_TTL)
+    pipeline.zcard(_connections_key(user_id))
+    return (await pipeline.execute())[-1]
+
+
+async def go_offline_if_idle(user_id):
+    """
+    Mark the user offline unless a connection appeared in the meantime.
+
+    Called once the disconnect grace period has passed, so quick reconnects
+    (page reloads, deploys) never flap the status. Returns True when the user
+    actually went offline.
+    """
+    connections_key = _connections_key(user_id)
+
+    async def mark_offline(pipe):
+        live = await pipe.zcount(connections_key, time.time() - settings.CHAT_PRESENCE_TTL, '+inf')
+        if live or await pipe.get(_status_key(user_id)) != ONLINE.encode():
+            return False
+        pipe.multi()
+        pipe.delete(_status_key(user_id))
+        return True
+
+    # Retried by redis-py if a connection or heartbeat touches the keys meanwhile.
+    return await get_connection().transaction(
+        mark_offline, connections_key, _status_key(user_id), value_from_callable=True
+    )
+
+
+async def status(user_id):
+    value = await get_connection().get(_status_key(user_id))
+    return value.decode() if value else OFFLINE
+
+
+def parse_user_ids(values):
+    """
+    Distinct integer user ids from a client supplied list, capped at
+    CHAT_STATUS_BATCH_MAX. Raises ValueError on anything else.
+    """
+    try:
+        user_ids = list(dict.fromkeys(int(value) for value in values if str(value).strip()))
+    except (TypeError, ValueError):
+        raise ValueError("User ids must be integers")
+    if len(user_ids) > settings.CHAT_STATUS_BATCH_MAX:
+        raise ValueError(f"At most {settings.CHAT_STATUS_BATCH_MAX} user ids per request")
+    return user_ids
+
+
+def _status_map(user_ids, values):
+    return {
+        user_id: value.decode() if value else OFFLINE
+        for user_id, value in zip(user_ids, values)
+    }
+
+
+def statuses(user_ids):
+    """
+    Status of many users in one round trip, as a dict keyed by user id.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    return _status_map(user_ids, _redis().mget([_status_key(user_id) for user_id in user_ids]))
+
+
+async def astatuses(user_ids):
+    """
+    Async version of `statuses()` for consumers.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    values = await get_connection().mget([_status_key(user_id) for user_id in user_ids])
+    return _status_map(user_ids, values)
+
+
+def _query_partner_ids(user_id):
+    return [
+        user_two_id if user_one_id == user_id else user_one_id
+        for user_one_id, user_two_id in Conversation.objects.filter(
+            Q(user_one_id=user_id) | Q(user_two_id=user_id)
+        ).values_list('user_one_id', 'user_two_id')
+    ]
+
+
+async def partner_ids(user_id):
+    """
+    Ids of everyone the user has a conversation with, cached between status changes.
+    """
+    user_id = int(user_id)
+    redis = get_connection()
+    cached = await redis.get(_partners_key(user_id))
+    if cached is not None:
+        return json.loads(cached)
+    partners = await database_sync_to_async(_query_partner_ids)(user_id)
+    await redis.set(_partners_key(user_id), json.dumps(partners), ex=settings.CHAT_PRESENCE_PARTNERS_TTL)
+    return partners
+
+
+async def online_partner_ids(user_id):
+    """
+    Partners that currently have an open connection; only they need status pushes.
+    """
+    partner_statuses = await astatuses(await partner_ids(user_id))
+    return [
+        partner_id
+        for partner_id, partner_status in partner_statuses.items()
+        if partner_status == ONLINE
+    ]
+
+
+def invalidate_partners(*user_ids):
+    _redis().delete(*[_partners_key(user_id) for user_id in user_ids])
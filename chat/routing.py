@@ -2,5 +2,7 @@ from django.urls import path, re_path
 from .consumers import ChatConsumer
 
 websocket_urlpatterns = [
+    re_path(r'^ws/chat/$', ChatConsumer.as_asgi()),
+    # Legacy route; the id must match the authenticated user.
     re_path(r'^ws/chat/(?P<id>\w+)/$', ChatConsumer.as_asgi()),
-]
\ No newline at end of file
+]
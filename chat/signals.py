@@ -0,0 +1,53 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from user_authentication.models import CustomUser, InvestorPreferences
+from user_management.models import BusinessPreferences
+from .models import Conversation
+from .summaries import ensure_summaries, refresh_partner
+from .cache import invalidate_conversation, invalidate_user
+from .presence import invalidate_partners
+from zephyr.images import image_variants_ready
+
+# Fields of CustomUser that feed into a conversation partner's display data.
+PROFILE_FIELDS = {'full_name', 'role'}
+
+
+@receiver(post_save, sender=Conversation)
+def create_conversation_summaries(sender, instance, created, **kwargs):
+    if created:
+        ensure_summaries(instance)
+        invalidate_partners(instance.user_one_id, instance.user_two_id)
+
+
+@receiver(post_delete, sender=Conversation)
+def forget_conversation(sender, instance, **kwargs):
+    invalidate_conversation(instance.user_one_id, instance.user_two_id)
+    invalidate_partners(instance.user_one_id, instance.user_two_id)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def refresh_summaries_for_user(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not PROFILE_FIELDS & set(update_fields)):
+        return
+    refresh_partner(instance)
+
+
+@receiver(post_save, sender=InvestorPreferences)
+@receiver(post_save, sender=BusinessPreferences)
+@receiver(image_variants_ready, sender=InvestorPreferences)
+@receiver(image_variants_ready, sender=BusinessPreferences)
+def refresh_summaries_for_profile(sender, instance, **kwargs):
+    # The cached identity carries the avatar
+    invalidate_user(instance.user_id)
+    user = instance.user
+    if sender is InvestorPreferences:
+        user.investor_preferences = instance
+    else:
+        user.business_preferences = instance
+    refresh_partner(user)
@@ -0,0 +1,165 @@
+from collections import Counter
+from django.db.models import Case, DateTimeField, F, PositiveIntegerField, Q, Sum, TextField, Value, When
+from django.db.models.functions import Greatest
+from .models import Conversation, ConversationSummary
+from .inbox import avatar_name, conversations_for_inbox, display_name, last_message_preview
+
+
+def _summary_rows(conversation):
+    """
+    Unsaved summary rows for both participants of an inbox-annotated conversation.
+    """
+    preview = last_message_preview(conversation)
+    last_activity = conversation.last_message_at or conversation.created_at
+    participants = (
+        (conversation.user_one, conversation.user_two),
+        (conversation.user_two, conversation.user_one),
+    )
+    return [
+        ConversationSummary(
+            owner=owner,
+            conversation=conversation,
+            partner=partner,
+            partner_name=display_name(partner),
+            partner_avatar=avatar_name(partner),
+            last_message=preview,
+            last_message_at=conversation.last_message_at,
+            last_activity=last_activity,
+        )
+        for owner, partner in participants
+    ]
+
+
+def rebuild_summaries(conversations=None, batch_size=500):
+    """
+    Recompute summary rows for the given conversations (all of them by default).
+
+    Existing rows keep their unread counters; everything else is refreshed from
+    the messages and profiles. Returns the number of conversations processed.
+    """
+    if conversations is None:
+        conversations = Conversation.objects.all()
+    annotated = conversations_for_inbox().filter(pk__in=conversations.values('pk'))
+
+    processed = 0
+    rows = []
+    for conversation in annotated.iterator(chunk_size=batch_size):
+        rows.extend(_summary_rows(conversation))
+        processed += 1
+        if len(rows) >= batch_size:
+            _upsert(rows)
+            rows = []
+    if rows:
+        _upsert(rows)
+    return processed
+
+
+def _upsert(rows):
+    ConversationSummary.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['owner', 'conversation'],
+        update_fields=['partner', 'partner_name', 'partner_avatar', 'last_message', 'last_message_at', 'last_activity'],
+    )
+
+
+def ensure_summaries(conversation):
+    """
+    Create the summary rows for a newly created conversation.
+    """
+    rebuild_summaries(Conversation.objects.filter(pk=conversation.pk))
+
+
+def _latest_message_updates(message):
+    """
+    UPDATE values that make `message` the preview unless a newer message
+    already is, so concurrent sends committing out of order keep the latest.
+    """
+    newer = Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.timestamp)
+    return {
+        'last_message': Case(
+            When(newer, then=Value(message.get_content())), default=F('last_message'), output_field=TextField(),
+        ),
+        'last_message_at': Case(
+            When(newer, then=Value(message.timestamp)), default=F('last_message_at'), output_field=DateTimeField(),
+        ),
+        'last_activity': Greatest(F('last_activity'), Value(message.timestamp)),
+    }
+
+
+def record_message(message):
+    """
+    Apply a newly saved message to both participants' summaries in one UPDATE,
+    bumping the unread counter of the participant who did not send it.
+    """
+    updated = ConversationSummary.objects.filter(conversation_id=message.conversation_id).update(
+        **_latest_message_updates(message),
+        unread_count=Case(
+            When(~Q(owner_id=message.sender_id), then=F('unread_count') + 1),
+            default=F('unread_count'),
+            output_field=PositiveIntegerField(),
+        ),
+    )
+    if not updated:
+        # Conversation predates the summaries; build its rows from the messages.
+        ensure_summaries(message.conversation)
+        ConversationSummary.objects.filter(
+            conversation_id=message.conversation_id
+        ).exclude(owner_id=message.sender_id).update(unread_count=F('unread_count') + 1)
+
+
+def record_messages(messages):
+    """
+    Apply a batch of newly saved messages to the summaries, one UPDATE per
+    conversation: the latest message becomes the preview unless a newer one
+    already is, and each participant's unread counter grows by the number of
+    messages they did not send.
+    """
+    by_conversation = {}
+    for message in messages:
+        by_conversation.setdefault(message.conversation_id, []).append(message)
+
+    for conversation_id, batch in by_conversation.items():
+        latest = max(batch, key=lambda message: (message.timestamp, message.id))
+        sent_by = Counter(message.sender_id for message in batch)
+        summaries = ConversationSummary.objects.filter(conversation_id=conversation_id)
+        updates = {
+            **_latest_message_updates(latest),
+            'unread_count': Case(
+                *[When(owner_id=sender_id, then=F('unread_count') + len(batch) - count)
+                  for sender_id, count in sent_by.items()],
+                default=F('unread_count') + len(batch),
+                output_field=PositiveIntegerField(),
+            ),
+        }
+        if not summaries.update(**updates):
+            # Conversation predates the summaries; build its rows, then count the batch.
+            ensure_summaries(Conversation.objects.get(pk=conversation_id))
+            summaries.update(**updates)
+
+
+def mark_read(owner, conversation):
+    """
+    Reset the owner's unread counter for a conversation.
+    """
+    ConversationSummary.objects.filter(
+        owner=owner, conversation=conversation, unread_count__gt=0
+    ).update(unread_count=0)
+
+
+def unread_total(owner):
+    """
+    Total number of unread messages across all of the owner's conversations.
+    """
+    total = ConversationSummary.objects.filter(owner=owner).aggregate(total=Sum('unread_count'))['total']
+    return total or 0
+
+
+def refresh_partner(user):
+    """
+    Propagate a user's display name and avatar to every summary showing them as partner.
+    """
+    ConversationSummary.objects.filter(partner=user).update(
+        partner_name=display_name(user),
+        partner_avatar=avatar_name(user),
+    )
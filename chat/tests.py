@@ -1,3 +1,93 @@
+from unittest import mock
+import fakeredis
 from django.test import TestCase
+from django.utils import timezone
+from user_authentication.models import CustomUser
+from .models import Conversation, ConversationSummary, Message
+from . import presence, write_behind
 
-# Create your tests here.
+
+class MessageFlusherTests(TestCase):
+    """
+    Buffered messages must be stored and counted once however often their
+    stream entries are replayed, and an entry that keeps failing must be
+    dead-lettered without holding back the rest.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob = [
+            CustomUser.objects.create(
+                username=name.lower(), email=f'{name.lower()}@example.com', full_name=name, role='investor',
+            )
+            for name in ('Alice', 'Bob')
+        ]
+        with mock.patch.object(presence, 'get_redis_connection', return_value=fakeredis.FakeRedis()):
+            cls.conversation = Conversation.objects.create(user_one=cls.alice, user_two=cls.bob)
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(write_behind, 'get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.flusher = write_behind.MessageFlusher('test', batch_size=10, block_ms=1, max_deliveries=2)
+        self.flusher.ensure_group()
+        self.next_id = 1000
+
+    def buffer(self, content, conversation_id=None, sender=None):
+        self.next_id += 1
+        self.redis.xadd(write_behind.STREAM_KEY, {
+            'id': self.next_id,
+            'conversation_id': conversation_id or self.conversation.id,
+            'sender_id': (sender or self.alice).id,
+            'content': content,
+            'timestamp': timezone.now().isoformat(),
+        })
+        return self.next_id
+
+    def pending(self):
+        return self.redis.xpending(write_behind.STREAM_KEY, write_behind.GROUP_NAME)['pending']
+
+    def unread(self, user):
+        return ConversationSummary.objects.get(owner=user, conversation=self.conversation).unread_count
+
+    def test_flush_stores_counts_and_acknowledges(self):
+        first, second = self.buffer('hi'), self.buffer('there')
+
+        self.assertEqual(self.flusher.run_once(), 2)
+        self.assertEqual(
+            list(Message.objects.filter(conversation=self.conversation).values_list('id', 'content')),
+            [(first, 'hi'), (second, 'there')],
+        )
+        self.assertEqual(self.unread(self.bob), 2)
+        self.assertEqual(self.unread(self.alice), 0)
+        self.assertEqual(self.pending(), 0)
+        self.assertEqual(self.redis.xlen(write_behind.STREAM_KEY), 0)
+
+    def test_replayed_entries_are_inserted_once(self):
+        self.buffer('hi')
+        entries = self.flusher._read('>')
+        self.flusher._persist(entries)
+        # A flusher that died before acknowledging replays the batch
+        self.flusher._persist(entries)
+
+        self.assertEqual(Message.objects.filter(conversation=self.conversation).count(), 1)
+        self.assertEqual(self.unread(self.bob), 1)
+
+    def test_failing_entry_is_dead_lettered(self):
+        self.buffer('hi')
+        broken = self.buffer('lost', conversation_id=self.conversation.id + 1)
+        self.buffer('there')
+
+        with self.assertLogs(write_behind.logger, 'WARNING'):
+            self.assertEqual(self.flusher.run_once(), 2)
+        self.assertEqual(self.pending(), 1)
+        self.assertEqual(self.redis.xlen(write_behind.DEAD_LETTER_KEY), 0)
+
+        with self.assertLogs(write_behind.logger, 'ERROR'):
+            self.assertEqual(self.flusher.run_once(), 0)
+        self.assertEqual(self.pending(), 0)
+        [(_, fields)] = self.redis.xrange(write_behind.DEAD_LETTER_KEY)
+        self.assertEqual(int(fields[b'id']), broken)
+        self.assertEqual(Message.objects.filter(conversation=self.conversation).count(), 2)
+        self.assertEqual(self.unread(self.bob), 2)
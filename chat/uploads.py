@@ -0,0 +1,42 @@
+import tempfile
+import uuid
+from django.conf import settings
+from django.core.files import File
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class VoiceUpload:
+    """
+    A voice note arriving over the chat websocket as binary frames.
+
+    Chunks are spooled to a temporary file (in memory only up to
+    CHAT_VOICE_SPOOL_BYTES) and the size limit is enforced as they arrive, so
+    memory per upload stays bounded and oversized notes are rejected early.
+    """
+
+    def __init__(self, sender_id, receiver_id, max_bytes=None):
+        self.upload_id = uuid.uuid4().hex
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.max_bytes = max_bytes or settings.CHAT_VOICE_MAX_BYTES
+        self.size = 0
+        self._file = tempfile.SpooledTemporaryFile(max_size=settings.CHAT_VOICE_SPOOL_BYTES)
+
+    def append(self, chunk):
+        if self.size + len(chunk) > self.max_bytes:
+            raise UploadTooLarge(f"Voice message exceeds {self.max_bytes} bytes")
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def as_file(self):
+        """
+        The received bytes as a Django `File`, rewound for streaming into storage.
+        """
+        self._file.seek(0)
+        return File(self._file, name=f"{self.upload_id}.webm")
+
+    def discard(self):
+        self._file.close()
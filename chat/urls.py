@@ -1,8 +1,10 @@
 from django.urls import path, include
-from .views import UserProfileView, ConversationMessagesView
+from .views import UserProfileView, ConversationMessagesView, UnreadCountView, PresenceStatusView
 
 urlpatterns = [
     path('user/messages/', UserProfileView.as_view(), name='user-profile'),
     path('messages/<int:user_id>/', ConversationMessagesView.as_view(), name='conversation-messages'),
+    path('unread/', UnreadCountView.as_view(), name='chat-unread-count'),
+    path('status/', PresenceStatusView.as_view(), name='chat-presence-status'),
 
 ]
@@ -1,108 +1,44 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status as status_code
-from django.db.models import Max
-from .models import Conversation, Message,OnlineChatStatus
-from user_authentication.models import CustomUser, InvestorPreferences
-from user_management.models import BusinessPreferences
-from connections.models import Connections
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from .models import Conversation
 from django.db.models import Q
 from rest_framework.permissions import IsAuthenticated
 from .serializers import MessageSerializer
-from django_redis import get_redis_connection
+from .pagination import MessageKeysetPagination
+from .inbox import build_inbox
+from .summaries import mark_read, unread_total
+from . import presence
 
 
 class UserProfileView(APIView):
+    """
+    Chat inbox for the authenticated user: one entry per conversation with the
+    partner's name, avatar, online status and the last message.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        try:
-            user = request.user
-        except CustomUser.DoesNotExist:
-            return Response({"error": "User not found"}, status=status_code.HTTP_404_NOT_FOUND)
-
-        # Fetch all conversations where the authenticated user is a participant
-        conversations = Conversation.objects.filter(
-            Q(user_one=user) | Q(user_two=user)
-        ).order_by('-last_updated')  # Optionally order by the last updated timestamp
-
-        user_profiles = []
-
-        for conversation in conversations:
-            # Determine the other user in the conversation
-            other_user = conversation.user_two if conversation.user_one == user else conversation.user_one
-
-            # Fetch user name based on role
-            if other_user.role == 'business':
-                business_pref = BusinessPreferences.objects.filter(user=other_user).first()
-                user_name = business_pref.company_name if business_pref and business_pref.company_name else other_user.full_name
-            else:
-                user_name = other_user.full_name
-
-            # Fetch avatar image based on role
-            if other_user.role == 'investor':
-                avatar = InvestorPreferences.objects.filter(user=other_user).first()
-                avatar_image = avatar.avatar_image.url if avatar else None
-            elif other_user.role == 'business':
-                avatar = BusinessPreferences.objects.filter(user=other_user).first()
-                avatar_image = avatar.avatar_image.url if avatar else None
-            else:
-                avatar_image = None
-
-            # Fetch the last message for the conversation
-            last_message = None
-            last_seen_time = None
-            last_msg = Message.objects.filter(conversation=conversation).order_by('-timestamp').first()
-            if last_msg:
-                last_message = last_msg.get_content()
-                last_seen_time = last_msg.timestamp
-            else:
-                last_message = "No messages"
-                last_seen_time = None
-
-            # Fetch status (assuming an online/offline tracking mechanism is in place)
-            # status = "Offline"  # Placeholder (replace with actual logic if available)
-            # key = f"user:{other_user.pk}:status"
-            try:
-                status_obj = OnlineChatStatus.objects.get(user__id=other_user.pk)
-                status = status_obj.status
-                print(status_obj.user.email,status)
-            except:
-                # OnlineChatStatus.objects.create(user__id=other_user.pk,stat)
-                status = 'offline'
-            # redis_connection = get_redis_connection("default")
-
-            # # Get the value for the key
-            # try:
-            #     status = redis_connection.get(key)
-            #     status = status.decode('utf-8')
-            #     print(status)
-            # except:
-            #     status='offline'
-            #     print('offline')
-
-        # 
-
-            # Prepare the profile data for the other user in the conversation
-            profile_data = {
-                "user_id": other_user.id,
-                "user_name": user_name,
-                "status": status,
-                "avatar_image": avatar_image,
-                "last_message": last_message,
-                "last_seen_time": last_seen_time,
-                "conversation_id": conversation.id,  
-            }
-
-            user_profiles.append(profile_data)
-
+        user_profiles = build_inbox(request.user)
         return Response(user_profiles, status=status_code.HTTP_200_OK)
 
 
+class ConversationMessagesView(APIView):
+    """
+    Message history of the conversation with `user_id`, paginated by keyset.
 
+    Query params:
+        - limit (int, optional): Page size, defaults to 50 (max 200).
+        - before (str, optional): Cursor; returns messages older than it.
+        - after (str, optional): Cursor; returns messages newer than it.
 
-class ConversationMessagesView(APIView):
+    The response carries `before`/`after` cursors for the returned page and a
+    `has_more` flag for the direction that was paged.
+    """
     permission_classes = [IsAuthenticated]
+    pagination_class = MessageKeysetPagination
 
     def get(self, request, user_id):
         user = request.user
@@ -111,9 +47,40 @@ class ConversationMessagesView(APIView):
             (Q(user_one__id=user_id) & Q(user_two=user))
         ).first()
         if not conversation:
-            return Response({"messages": []})
+            return Response({"messages": [], "has_more": False, "before": None, "after": None})
 
-        messages = conversation.messages.all()
+        paginator = self.pagination_class()
+        messages = paginator.paginate_queryset(conversation.messages.all(), request)
         serializer = MessageSerializer(messages, many=True)
+        if not request.query_params.get('before'):
+            mark_read(user, conversation)
         
-        return Response({"messages": serializer.data})
\ No newline at end of file
+        return paginator.get_paginated_response(serializer.data)
+
+
+class UnreadCountView(APIView):
+    """
+    Total number of unread chat messages for the authenticated user, for badges.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_count": unread_total(request.user)}, status=status_code.HTTP_200_OK)
+
+class PresenceStatusView(APIView):
+    """
+    Online status of many users in a single Redis round trip.
+
+    Query params:
+        - ids (str): Comma separated user ids, at most CHAT_STATUS_BATCH_MAX.
+
+    Returns a map of user id to 'online' / 'offline'.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            user_ids = presence.parse_user_ids(request.query_params.get('ids', '').split(','))
+        except ValueError as e:
+            raise ValidationError({"ids": str(e)})
+        return Response({"statuses": presence.statuses(user_ids)}, status=status_code.HTTP_200_OK)
@@ -0,0 +1,258 @@
+"""
+Write-behind persistence for chat text messages.
+
+Messages get their primary key from a block reserved on the Postgres sequence
+and a server timestamp, are appended to a Redis stream and broadcast straight
+away. `MessageFlusher` (run by `manage.py flush_chat_messages`) drains the
+stream into Postgres and only acknowledges entries once they are committed, so
+pending entries are replayed after a crash. An entry that keeps failing on its
+own (e.g. its conversation was deleted) is moved to the dead-letter stream
+after CHAT_WRITE_BEHIND_MAX_DELIVERIES attempts instead of blocking the rest.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DataError, IntegrityError, connection, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+from zephyr.async_redis import get_connection
+from .models import Message, SENT, TEXT
+from .summaries import record_messages
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'chat:messages:stream'
+GROUP_NAME = 'chat-message-flushers'
+DEAD_LETTER_KEY = 'chat:messages:dead'
+
+# Failures caused by the entry itself rather than the database being unavailable
+ENTRY_ERRORS = (IntegrityError, DataError, ObjectDoesNotExist, KeyError, ValueError)
+
+
+class MessageIdAllocator:
+    """
+    Hands out message primary keys from blocks reserved on the table's sequence,
+    so ids are final before the row exists and never collide with regular inserts.
+    """
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._ids = deque()
+        self._lock = threading.Lock()
+
+    def _reserve_block(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                [Message._meta.db_table, self.block_size],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def next_id(self):
+        with self._lock:
+            if not self._ids:
+                self._ids.extend(self._reserve_block())
+            return self._ids.popleft()
+
+    def take_reserved(self):
+        """
+        An id from the current block without touching the database, or None
+        when the block is used up. Safe to call from the event loop.
+        """
+        with self._lock:
+            return self._ids.popleft() if self._ids else None
+
+
+allocator = MessageIdAllocator(settings.CHAT_WRITE_BEHIND_ID_BLOCK)
+
+
+async def buffer_message(conversation, sender, content):
+    """
+    Assign an id and timestamp to a text message and append it to the stream.
+
+    Returns an unsaved `Message` carrying its final id, ready to be broadcast.
+    Only reserving a new id block goes through the database thread pool.
+    """
+    message_id = allocator.take_reserved()
+    if message_id is None:
+        message_id = await database_sync_to_async(allocator.next_id)()
+    message = Message(
+        id=message_id,
+        conversation=conversation,
+        sender=sender,
+        content_type=TEXT,
+        content=content,
+        status=SENT,
+        timestamp=timezone.now(),
+    )
+    await get_connection().xadd(STREAM_KEY, {
+        'id': message.id,
+        'conversation_id': message.conversation_id,
+        'sender_id': message.sender_id,
+        'content': content or '',
+        'timestamp': message.timestamp.isoformat(),
+    })
+    return message
+
+
+def _decode(fields):
+    fields = {key.decode(): value.decode() for key, value in fields.items()}
+    return Message(
+        id=int(fields['id']),
+        conversation_id=int(fields['conversation_id']),
+        sender_id=int(fields['sender_id']),
+        content_type=TEXT,
+        content=fields['content'],
+        status=SENT,
+        timestamp=datetime.fromisoformat(fields['timestamp']),
+    )
+
+
+def _insert_new(messages):
+    """
+    INSERT the messages whose id is not stored yet and return those, so a
+    replayed batch only counts its messages once.
+    """
+    fields = Message._meta.concrete_fields
+    table = connection.ops.quote_name(Message._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    row = f"({', '.join(['%s'] * len(fields))})"
+    # The values as buffered; pre_save would replace the timestamp with the flush time
+    params = [field.get_db_prep_save(getattr(message, field.attname), connection) for message in messages for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) VALUES {', '.join([row] * len(messages))} "
+            f"ON CONFLICT (id) DO NOTHING RETURNING id",
+            params,
+        )
+        inserted = {row[0] for row in cursor.fetchall()}
+    return [message for message in messages if message.id in inserted]
+
+
+class MessageFlusher:
+    """
+    Drains the message stream into Postgres in batches.
+
+    Entries are read through a consumer group and acknowledged only after the
+    batch is committed. Unacknowledged entries of this consumer are flushed
+    before new ones, and entries left idle by dead flushers are claimed
+    periodically.
+    Ids are assigned up front, so a replay skips the rows already inserted and
+    only applies the new ones to the summaries. When a batch fails because of
+    one of its entries, the entries are flushed one by one and the failing
+    ones stay pending until they run out of deliveries.
+    """
+
+    def __init__(self, consumer_name, batch_size=None, block_ms=None, claim_idle_ms=60000, max_deliveries=None):
+        self.redis = get_redis_connection("default")
+        self.consumer_name = consumer_name
+        self.batch_size = batch_size or settings.CHAT_WRITE_BEHIND_BATCH_SIZE
+        self.block_ms = block_ms or settings.CHAT_WRITE_BEHIND_FLUSH_MS
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries or settings.CHAT_WRITE_BEHIND_MAX_DELIVERIES
+        self._stopped = threading.Event()
+
+    def ensure_group(self):
+        try:
+            self.redis.xgroup_create(STREAM_KEY, GROUP_NAME, id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def claim_abandoned(self):
+        """
+        Take over entries left unacknowledged by flushers that died mid-batch.
+        """
+        start = '0-0'
+        while True:
+            start, _claimed, *_ = self.redis.xautoclaim(
+                STREAM_KEY, GROUP_NAME, self.consumer_name,
+                min_idle_time=self.claim_idle_ms, start_id=start, count=self.batch_size,
+            )
+            if start in (b'0-0', '0-0'):
+                return
+
+    def _read(self, last_id):
+        response = self.redis.xreadgroup(
+            GROUP_NAME, self.consumer_name, {STREAM_KEY: last_id},
+            count=self.batch_size, block=None if last_id == '0' else self.block_ms,
+        )
+        if not response:
+            return []
+        entries = response[0][1]
+        deleted = [entry_id for entry_id, fields in entries if not fields]
+        if deleted:
+            self.redis.xack(STREAM_KEY, GROUP_NAME, *deleted)
+        return [(entry_id, fields) for entry_id, fields in entries if fields]
+
+    def _persist(self, entries):
+        messages = [_decode(fields) for _, fields in entries]
+        with transaction.atomic():
+            record_messages(_insert_new(messages))
+        self._ack([entry_id for entry_id, _ in entries])
+        return len(messages)
+
+    def _ack(self, entry_ids, pipeline=None):
+        pipeline = pipeline or self.redis.pipeline()
+        pipeline.xack(STREAM_KEY, GROUP_NAME, *entry_ids)
+        pipeline.xdel(STREAM_KEY, *entry_ids)
+        pipeline.execute()
+
+    def _deliveries(self, entry_id):
+        pending = self.redis.xpending_range(STREAM_KEY, GROUP_NAME, min=entry_id, max=entry_id, count=1)
+        return pending[0]['times_delivered'] if pending else 0
+
+    def _dead_letter(self, entry_id, fields, error):
+        logger.error(f"Chat message stream entry {entry_id} dead-lettered: {error!r}")
+        pipeline = self.redis.pipeline()
+        pipeline.xadd(DEAD_LETTER_KEY, {**fields, 'entry_id': entry_id, 'error': repr(error)})
+        self._ack([entry_id], pipeline)
+
+    def flush(self, entries):
+        """
+        Persist one batch of stream entries and acknowledge them. Returns the
+        number of entries flushed.
+        """
+        try:
+            return self._persist(entries)
+        except ENTRY_ERRORS as e:
+            if len(entries) == 1:
+                entry_id, fields = entries[0]
+                if self._deliveries(entry_id) >= self.max_deliveries:
+                    self._dead_letter(entry_id, fields, e)
+                else:
+                    logger.warning(f"Chat message stream entry {entry_id} failed, left pending: {e}")
+                return 0
+        # Isolate the entry that failed the batch
+        return sum(self.flush([entry]) for entry in entries)
+
+    def run_once(self):
+        """
+        Flush this consumer's pending entries (left over from a crash or a
+        failed batch) if there are any, otherwise the next batch of new ones.
+        """
+        entries = self._read('0') or self._read('>')
+        return self.flush(entries) if entries else 0
+
+    def run(self):
+        self.ensure_group()
+        last_claim = None
+        while not self._stopped.is_set():
+            try:
+                if last_claim is None or time.monotonic() - last_claim > self.claim_idle_ms / 1000:
+                    self.claim_abandoned()
+                    last_claim = time.monotonic()
+                self.run_once()
+            except Exception as e:
+                # The batch stays pending and is retried on the next pass.
+                logger.error(f"Chat message flush error: {e}")
+                time.sleep(1)
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from connections.suggestions import compute_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s "people you may know" suggestions into Redis.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        processed = compute_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Computed suggestions for {processed} users."))
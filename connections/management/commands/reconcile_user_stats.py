@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from connections.stats import reconcile_user_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's follower/following counts from the connections table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        processed = reconcile_user_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled connection counts for {processed} users."))
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_user_stats(apps, schema_editor):
+    Connections = apps.get_model('connections', 'Connections')
+    UserStats = apps.get_model('connections', 'UserStats')
+
+    stats = {}
+    for column, field in (('followed', 'followers_count'), ('follower', 'following_count')):
+        rows = Connections.objects.order_by().values(column).annotate(total=Count('pk'))
+        for row in rows.iterator():
+            stats.setdefault(row[column], {})[field] = row['total']
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id, **counts) for user_id, counts in stats.items()], batch_size=1000,
+    )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connections', '0001_initial'),
+        ('user_authentication', '0006_investorpreferences_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'connections_user_stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='connections',
+            index=models.Index(fields=['followed', '-created_at', '-id'], name='connections_followed_created'),
+        ),
+        migrations.AddIndex(
+            model_name='connections',
+            index=models.Index(fields=['follower', '-created_at', '-id'], name='connections_follower_created'),
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -8,7 +8,12 @@ class Connections(models.Model):
 
     class Meta:
         unique_together = ('follower', 'followed')
-        db_table = 'connections'  
+        db_table = 'connections'
+        indexes = [
+            # Cursor pagination of a user's followers / followed accounts
+            models.Index(fields=['followed', '-created_at', '-id'], name='connections_followed_created'),
+            models.Index(fields=['follower', '-created_at', '-id'], name='connections_follower_created'),
+        ]
     
     def __str__(self):
         return f"{self.follower.email} follows {self.followed.email}"
@@ -16,3 +21,19 @@ class Connections(models.Model):
     def is_mutual(self):
         """Check if this connection is mutual."""
         return Connections.objects.filter(follower=self.followed, followed=self.follower).exists()
+
+
+class UserStats(models.Model):
+    """
+    Denormalized follower/following counts, kept up to date by connections.signals
+    (see connections.stats). A user without a row has no connections.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'connections_user_stats'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.followers_count} followers, {self.following_count} following"
@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from user_authentication.models import InvestorPreferences
 from user_management.models import BusinessPreferences
 from user_authentication.models import CustomUser
+from zephyr import images
+from .stats import counts
 
 User = get_user_model()
 
@@ -21,10 +23,10 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'followers_count', 'following_count']
 
     def get_followers_count(self, obj):
-        return obj.followers.count()
+        return counts(obj)[0]
 
     def get_following_count(self, obj):
-        return obj.following.count()
+        return counts(obj)[1]
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -39,12 +41,12 @@ class UserProfileSerializer(serializers.ModelSerializer):
         # Handle investor role
         if obj.role == 'investor':
             investor_pref = getattr(obj, 'investor_preferences', None)
-            return investor_pref.avatar_image.url if investor_pref and investor_pref.avatar_image else None
+            return images.variant_url(investor_pref, 'avatar_image') if investor_pref else None
         
         # Handle business role, with error handling if 'business_preferences' doesn't exist
         elif obj.role == 'business':
             business_pref = getattr(obj, 'business_preferences', None)
-            return business_pref.avatar_image.url if business_pref and business_pref.avatar_image else None
+            return images.variant_url(business_pref, 'avatar_image') if business_pref else None
         
         # Default case
         return None
@@ -57,3 +59,23 @@ class UserProfileSerializer(serializers.ModelSerializer):
         
         # Default case for other roles
         return obj.full_name
+
+
+class FollowerSerializer(FollowSerializer):
+    """
+    A connection with the follower's profile.
+    """
+    user = UserProfileSerializer(source='follower', read_only=True)
+
+    class Meta(FollowSerializer.Meta):
+        fields = FollowSerializer.Meta.fields + ['user']
+
+
+class FollowingSerializer(FollowSerializer):
+    """
+    A connection with the followed user's profile.
+    """
+    user = UserProfileSerializer(source='followed', read_only=True)
+
+    class Meta(FollowSerializer.Meta):
+        fields = FollowSerializer.Meta.fields + ['user']
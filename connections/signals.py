@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Connections
+from .stats import adjust
+from .tasks import schedule_refresh
+from . import suggestions
+
+
+@receiver(post_save, sender=Connections)
+def increment_connection_counts(sender, instance, created, **kwargs):
+    if created:
+        adjust(instance.followed_id, 'followers_count', 1)
+        adjust(instance.follower_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Connections)
+def decrement_connection_counts(sender, instance, **kwargs):
+    adjust(instance.followed_id, 'followers_count', -1)
+    adjust(instance.follower_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Connections)
+def refresh_suggestions_on_follow(sender, instance, created, **kwargs):
+    if created:
+        def on_commit():
+            suggestions.discard(instance.follower_id, instance.followed_id)
+            schedule_refresh([instance.follower_id, instance.followed_id])
+        transaction.on_commit(on_commit, robust=True)
+
+
+@receiver(post_delete, sender=Connections)
+def refresh_suggestions_on_unfollow(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: schedule_refresh([instance.follower_id, instance.followed_id]), robust=True
+    )
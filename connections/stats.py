@@ -0,0 +1,77 @@
+"""
+Denormalized follower/following counts in `UserStats`.
+
+The counts move with atomic `F()` updates as connections are created and
+deleted (see `connections.signals`); `reconcile_user_stats` recomputes them
+from the connections table for anything that bypassed signals.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import Connections, UserStats
+
+# UserStats column -> the Connections column that points at the counted user.
+COUNTERS = {
+    'followers_count': 'followed',
+    'following_count': 'follower',
+}
+
+
+def _count(column, user_id):
+    return Connections.objects.filter(**{column: user_id}).count()
+
+
+def adjust(user_id, field, delta):
+    """
+    Atomically move one count of a user by `delta`, creating the user's row
+    from the connections table if there is none yet.
+    """
+    updated = UserStats.objects.filter(pk=user_id).update(**{field: Greatest(F(field) + delta, Value(0))})
+    if not updated:
+        # Counted after the connection change, so the delta is already included
+        UserStats.objects.bulk_create([
+            UserStats(user_id=user_id, **{name: _count(column, user_id) for name, column in COUNTERS.items()})
+        ], ignore_conflicts=True)
+
+
+def counts(user):
+    """
+    (followers_count, following_count) of a user.
+    """
+    try:
+        stats = user.stats
+    except UserStats.DoesNotExist:
+        return 0, 0
+    return stats.followers_count, stats.following_count
+
+
+def count_subquery(column):
+    """
+    Correlated COUNT of the connections whose `column` is the outer user.
+    """
+    return Coalesce(
+        Subquery(
+            Connections.objects.filter(**{column: OuterRef('pk')})
+            .order_by()
+            .values(column)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile_user_stats(batch_size=1000):
+    """
+    Create missing rows and recompute every user's counts from the connections
+    table, one primary key range per UPDATE. Returns the number of users processed.
+    """
+    user_ids = list(get_user_model().objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        UserStats.objects.bulk_create([UserStats(user_id=user_id) for user_id in batch], ignore_conflicts=True)
+        UserStats.objects.filter(pk__gte=batch[0], pk__lte=batch[-1]).update(**{
+            name: count_subquery(column) for name, column in COUNTERS.items()
+        })
+    return len(user_ids)
@@ -0,0 +1,337 @@
+"""
+Precomputed "people you may know" suggestions.
+
+Candidates for a user come from the follow graph and profile tags:
+
+- friends of friends: accounts followed by the accounts the user follows,
+- followers the user does not follow back,
+- users sharing a preferred industry or location (investor preferences and
+  business profiles),
+
+weighted by how often they occur, with a bonus for recent activity. A tag
+contributes at most SUGGESTIONS_TAG_SAMPLE of its users, so a tag shared by
+most accounts does not expand into all of them. Accounts
+already followed, the user themselves, admins and blocked users are dropped,
+and the best SUGGESTIONS_TOP_K are stored per user in a Redis sorted set.
+Users with too few candidates are topped up with the most followed accounts.
+
+`compute_all()` (run by `manage.py compute_suggestions`) loads the graph and
+the tags once as NumPy CSR index arrays and expands each user's row with
+vectorized gathers, i.e. one row of the sparse products A·A, A·Aᵀ and T·Tᵀ.
+`refresh(user_id)` computes one user from the database after a follow or
+unfollow; both feed the same ranking. Reads never compute: a user without
+stored suggestions is shown `fallback_ids()` while a refresh is queued.
+"""
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+from django_redis import get_redis_connection
+from user_authentication.models import InvestorPreferences
+from user_management.models import BusinessPreferences
+from .models import Connections, UserStats
+
+POPULAR_KEY = 'connections:suggestions:popular'
+
+# Feature -> score per occurrence
+WEIGHTS = {
+    'friends_of_friends': 3.0,
+    'follows_you': 4.0,
+    'shared_industries': 2.0,
+    'shared_locations': 1.0,
+}
+ACTIVE_BONUS = 1.0
+ACTIVE_DAYS = 7
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+def _suggestions_key(user_id):
+    return f"connections:suggestions:{user_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _ids(values):
+    return np.fromiter(values, dtype=np.int64)
+
+
+def _eligible_users():
+    """
+    Users that may be suggested: not admins and not blocked.
+    """
+    return get_user_model().objects.filter(status=True).exclude(role='admin')
+
+
+def _active_since():
+    return timezone.now() - timedelta(days=ACTIVE_DAYS)
+
+
+# Tag -> investor preferences many-to-many field; business profiles have a foreign key named after the tag
+TAG_FIELDS = {
+    'industry': 'preferred_industries',
+    'location': 'preferred_locations',
+}
+
+
+def _tag_pairs(tag, user_ids=None, tag_ids=None, limit=None):
+    """
+    (user id, tag id) pairs of a tag across investor preferences and business
+    profiles, optionally only for `user_ids`, only of `tag_ids` or at most
+    `limit` of them.
+    """
+    through = getattr(InvestorPreferences, TAG_FIELDS[tag]).through
+    investor = through.objects.values_list('investorpreferences__user_id', f'{tag}_id')
+    business = BusinessPreferences.objects.filter(**{f'{tag}__isnull': False}).values_list('user_id', f'{tag}_id')
+    if user_ids is not None:
+        investor = investor.filter(investorpreferences__user_id__in=user_ids)
+        business = business.filter(user_id__in=user_ids)
+    if tag_ids is not None:
+        investor = investor.filter(**{f'{tag}_id__in': tag_ids})
+        business = business.filter(**{f'{tag}_id__in': tag_ids})
+    if limit is not None:
+        pairs = list(investor[:limit])
+        return pairs + list(business[:limit - len(pairs)])
+    return list(investor) + list(business)
+
+
+def _tag_members(tag, tag_ids, limit):
+    """
+    (user id, tag id) pairs of at most `limit` users of each tag in `tag_ids`.
+    """
+    pairs = []
+    for tag_id in tag_ids:
+        pairs += _tag_pairs(tag, tag_ids=[tag_id], limit=limit)
+    return pairs
+
+
+def rank(user_id, features, excluded, lookup, k):
+    """
+    Best `k` candidates of one user.
+
+    Args:
+        features (dict): Feature name -> array of candidate user ids, one
+            entry per occurrence.
+        excluded (array): User ids never to suggest (already followed).
+        lookup: Maps an array of user ids to (eligible, active) boolean arrays.
+
+    Returns:
+        list: (user id, score) pairs, best first.
+    """
+    arrays = [features.get(name, EMPTY) for name in WEIGHTS]
+    candidates, inverse = np.unique(np.concatenate(arrays), return_inverse=True)
+    if not len(candidates):
+        return []
+
+    scores = np.zeros(len(candidates))
+    offset = 0
+    for array, weight in zip(arrays, WEIGHTS.values()):
+        scores += weight * np.bincount(inverse[offset:offset + len(array)], minlength=len(candidates))
+        offset += len(array)
+    eligible, active = lookup(candidates)
+    scores += ACTIVE_BONUS * active
+
+    keep = eligible & ~np.isin(candidates, excluded) & (candidates != user_id)
+    candidates, scores = candidates[keep], scores[keep]
+    if len(candidates) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+        candidates, scores = candidates[top], scores[top]
+    order = np.argsort(-scores, kind='stable')
+    return list(zip(candidates[order].tolist(), scores[order].tolist()))
+
+
+class CSR:
+    """
+    Rows of a sparse 0/1 matrix built from (row id, column id) pairs: column
+    ids sorted by row with an index pointer per distinct row id. Rows are
+    found by binary search, so ids need not be dense.
+    """
+
+    def __init__(self, pairs):
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        order = np.argsort(pairs[:, 0], kind='stable')
+        rows, self.columns = pairs[order, 0], pairs[order, 1]
+        self.row_ids, starts = np.unique(rows, return_index=True)
+        self.indptr = np.append(starts, len(rows))
+
+    def transpose(self):
+        return CSR(np.column_stack([self.columns, self.row_ids.repeat(np.diff(self.indptr))]))
+
+    def gather(self, row_ids):
+        """
+        Concatenated columns of `row_ids`: the non-zeros of x·M for the 0/1
+        row vector x of `row_ids`, repeated rather than summed.
+        """
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        positions = np.searchsorted(self.row_ids, row_ids)
+        found = positions < len(self.row_ids)
+        found[found] = self.row_ids[positions[found]] == row_ids[found]
+        starts, ends = self.indptr[positions[found]], self.indptr[positions[found] + 1]
+        lengths = ends - starts
+        total = lengths.sum()
+        if not total:
+            return EMPTY
+        # Position of every element of every span without a Python loop
+        return self.columns[np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)]
+
+    def row(self, row_id):
+        return self.gather([row_id])
+
+    def sample(self, limit, seed=0):
+        """
+        The matrix with at most `limit` random columns kept per row.
+        """
+        lengths = np.diff(self.indptr)
+        if not len(lengths) or lengths.max() <= limit:
+            return self
+        rows = self.row_ids.repeat(lengths)
+        # Shuffle within each row, then keep the first `limit` of every row
+        order = np.lexsort((np.random.default_rng(seed).random(len(rows)), rows))
+        rank = np.arange(len(rows)) - np.repeat(self.indptr[:-1], lengths)
+        keep = order[rank < limit]
+        return CSR(np.column_stack([rows[keep], self.columns[keep]]))
+
+
+def popular(k):
+    """
+    The `k` most followed eligible users, cached for SUGGESTIONS_TTL. Pads the
+    suggestions of users with few candidates.
+    """
+    redis = _redis()
+    cached = redis.zrevrange(POPULAR_KEY, 0, k - 1)
+    if cached:
+        return [int(user_id) for user_id in cached]
+    ranked = list(
+        UserStats.objects.filter(user__in=_eligible_users(), followers_count__gt=0)
+        .order_by('-followers_count', 'pk')
+        .values_list('user_id', 'followers_count')[:k]
+    )
+    if ranked:
+        pipeline = redis.pipeline()
+        pipeline.delete(POPULAR_KEY)
+        pipeline.zadd(POPULAR_KEY, dict(ranked))
+        pipeline.expire(POPULAR_KEY, settings.SUGGESTIONS_TTL)
+        pipeline.execute()
+    return [user_id for user_id, _count in ranked]
+
+
+def _pad(user_id, scored, excluded, fallback, k):
+    taken = {candidate for candidate, _score in scored}
+    taken.update(excluded.tolist())
+    taken.add(user_id)
+    # Below every scored candidate, most followed first
+    padding = [candidate for candidate in fallback if candidate not in taken][:k - len(scored)]
+    return scored + [(candidate, -(index + 1)) for index, candidate in enumerate(padding)]
+
+
+def _store(pipeline, user_id, scored):
+    key = _suggestions_key(user_id)
+    pipeline.delete(key)
+    if scored:
+        pipeline.zadd(key, dict(scored))
+        pipeline.expire(key, settings.SUGGESTIONS_TTL)
+
+
+def compute_all(batch_size=1000):
+    """
+    Recompute and store the suggestions of every user. Returns the number of
+    users processed.
+    """
+    k = settings.SUGGESTIONS_TOP_K
+    user_ids = _ids(get_user_model().objects.order_by('pk').values_list('pk', flat=True))
+    eligible_ids = _ids(_eligible_users().order_by('pk').values_list('pk', flat=True))
+    active_ids = _ids(
+        _eligible_users().filter(last_login__gte=_active_since()).order_by('pk').values_list('pk', flat=True)
+    )
+
+    follows = CSR(list(Connections.objects.values_list('follower_id', 'followed_id')))
+    followers = follows.transpose()
+    tags = {}
+    for tag in TAG_FIELDS:
+        user_tags = CSR(_tag_pairs(tag))
+        tags[tag] = (user_tags, user_tags.transpose().sample(settings.SUGGESTIONS_TAG_SAMPLE))
+
+    def lookup(candidates):
+        return np.isin(candidates, eligible_ids), np.isin(candidates, active_ids)
+
+    fallback = popular(k)
+    redis = _redis()
+    for start in range(0, len(user_ids), batch_size):
+        pipeline = redis.pipeline()
+        for user_id in user_ids[start:start + batch_size].tolist():
+            followed = follows.row(user_id)
+            features = {
+                'friends_of_friends': follows.gather(followed),
+                'follows_you': followers.row(user_id),
+                'shared_industries': tags['industry'][1].gather(tags['industry'][0].row(user_id)),
+                'shared_locations': tags['location'][1].gather(tags['location'][0].row(user_id)),
+            }
+            scored = rank(user_id, features, followed, lookup, k)
+            _store(pipeline, user_id, _pad(user_id, scored, followed, fallback, k))
+        pipeline.execute()
+    return len(user_ids)
+
+
+def refresh(user_id):
+    """
+    Recompute and store one user's suggestions from the database. Returns
+    the stored (user id, score) pairs, best first.
+    """
+    k = settings.SUGGESTIONS_TOP_K
+    followed = _ids(Connections.objects.filter(follower_id=user_id).values_list('followed_id', flat=True))
+    features = {
+        'friends_of_friends': _ids(
+            Connections.objects.filter(follower_id__in=followed.tolist()).values_list('followed_id', flat=True)
+        ),
+        'follows_you': _ids(Connections.objects.filter(followed_id=user_id).values_list('follower_id', flat=True)),
+    }
+    for tag, feature in (('industry', 'shared_industries'), ('location', 'shared_locations')):
+        tag_ids = {tag_id for _user_id, tag_id in _tag_pairs(tag, user_ids=[user_id])}
+        features[feature] = _ids(
+            candidate for candidate, _tag_id in _tag_members(tag, tag_ids, settings.SUGGESTIONS_TAG_SAMPLE)
+        )
+
+    def lookup(candidates):
+        rows = _eligible_users().filter(pk__in=candidates.tolist()).values_list('pk', 'last_login')
+        active_since = _active_since()
+        flags = {pk: bool(last_login and last_login >= active_since) for pk, last_login in rows}
+        eligible = np.fromiter((candidate in flags for candidate in candidates.tolist()), dtype=bool, count=len(candidates))
+        active = np.fromiter((flags.get(candidate, False) for candidate in candidates.tolist()), dtype=bool, count=len(candidates))
+        return eligible, active
+
+    scored = _pad(user_id, rank(user_id, features, followed, lookup, k), followed, popular(k), k)
+    pipeline = _redis().pipeline()
+    _store(pipeline, user_id, scored)
+    pipeline.execute()
+    return scored
+
+
+def discard(user_id, suggested_id):
+    """
+    Drop one suggestion right away, e.g. once the user followed it.
+    """
+    _redis().zrem(_suggestions_key(user_id), suggested_id)
+
+
+def suggested_ids(user_id, count):
+    """
+    The ids of a user's best `count` suggestions, or None if none are stored.
+    """
+    cached = _redis().zrevrange(_suggestions_key(user_id), 0, count - 1)
+    if not cached:
+        return None
+    return [int(suggested_id) for suggested_id in cached]
+
+
+def fallback_ids(user_id, count):
+    """
+    The most followed accounts the user does not follow yet, shown until
+    their own suggestions are computed.
+    """
+    followed = _ids(Connections.objects.filter(follower_id=user_id).values_list('followed_id', flat=True))
+    fallback = popular(settings.SUGGESTIONS_TOP_K)
+    return [suggested_id for suggested_id, _score in _pad(user_id, [], followed, fallback, count)]
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django_redis import get_redis_connection
+from zephyr.tasks import task
+from . import suggestions
+
+
+@task(max_retries=2)
+def refresh_suggestions(user_id):
+    """
+    Recompute one user's "people you may know" suggestions.
+    """
+    suggestions.refresh(user_id)
+
+
+def schedule_refresh(user_ids, countdown=None):
+    """
+    Queue a suggestions refresh for each user, at most one per user and
+    SUGGESTIONS_REFRESH_INTERVAL, so a burst of follows costs one recompute.
+    """
+    redis = get_redis_connection("default")
+    interval = settings.SUGGESTIONS_REFRESH_INTERVAL
+    for user_id in user_ids:
+        if redis.set(f"connections:suggestions:pending:{user_id}", 1, nx=True, ex=interval):
+            refresh_suggestions.apply_async((user_id,), countdown=interval if countdown is None else countdown)
@@ -1,3 +1,42 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
+from .suggestions import CSR
 
-# Create your tests here.
+
+class CSRTests(SimpleTestCase):
+    """
+    The follow graph matrix behind suggestions: row lookups by sparse id,
+    transposition and per-row sampling of the columns.
+    """
+
+    def setUp(self):
+        # User 7 follows 100 users, user 3 follows two, user 50 follows one
+        self.pairs = [(7, column) for column in range(200, 300)] + [(3, 11), (3, 10), (50, 3)]
+        self.matrix = CSR(self.pairs)
+
+    def test_rows_by_sparse_id(self):
+        self.assertEqual(self.matrix.row(3).tolist(), [11, 10])
+        self.assertEqual(self.matrix.row(4).tolist(), [])
+        self.assertEqual(self.matrix.gather([50, 3, 99]).tolist(), [3, 11, 10])
+
+    def test_transpose(self):
+        followers = self.matrix.transpose()
+        self.assertEqual(followers.row(3).tolist(), [50])
+        self.assertEqual(followers.row(250).tolist(), [7])
+
+    def test_sample_keeps_at_most_limit_columns_per_row(self):
+        sampled = self.matrix.sample(5)
+        kept = sampled.row(7).tolist()
+        self.assertEqual(len(kept), 5)
+        self.assertEqual(len(set(kept)), 5)
+        self.assertTrue(set(kept) <= set(range(200, 300)))
+        # Rows within the limit are kept whole
+        self.assertEqual(sorted(sampled.row(3).tolist()), [10, 11])
+        self.assertEqual(sampled.row(50).tolist(), [3])
+
+    def test_sample_is_seeded(self):
+        self.assertEqual(self.matrix.sample(5, seed=1).row(7).tolist(), self.matrix.sample(5, seed=1).row(7).tolist())
+        self.assertNotEqual(self.matrix.sample(5, seed=1).row(7).tolist(), self.matrix.sample(5, seed=2).row(7).tolist())
+
+    def test_sample_within_limit_is_unchanged(self):
+        self.assertIs(self.matrix.sample(100), self.matrix)
+        self.assertEqual(CSR([]).sample(5).row(1).tolist(), [])
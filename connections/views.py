@@ -1,20 +1,23 @@
+import random
+from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework import generics
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from .models import Connections
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from .serializers import FollowSerializer, UserProfileSerializer
+from .serializers import FollowerSerializer, FollowingSerializer, UserProfileSerializer
+from .stats import counts
+from . import suggestions
+from .tasks import schedule_refresh
 from user_authentication.models import CustomUser
-from django.db.models import Q, Count
-from django.utils import timezone
-from datetime import timedelta
 from chat.models import Conversation
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from notifications.models import Notification
-from datetime import datetime
+from notifications.models import Notification, FOLLOW
+from notifications.service import notify
+from notifications import unread
 
 User = get_user_model()
 
@@ -28,32 +31,14 @@ class FollowUserView(APIView):
         if Connections.objects.filter(follower=follower, followed=followed).exists():
             return Response({"detail": "Already following this user."}, status=status.HTTP_400_BAD_REQUEST)
 
-        
-
-        channel_layer = get_channel_layer()
-        message = f"{followed.full_name} started following you!"
-        
-        current_time = datetime.now()
-        formatted_time = f"{current_time:%Y-%m-%dT%H:%M:%S.%f}Z"
-        current_time = formatted_time
-
-        async_to_sync(channel_layer.group_send)(
-            f"notifications_{followed.id}",
-            {
-                "type": "send_notification",
-                "message": message,
-                "created_at": current_time,
-            }
-        )
-
-        notification = Notification.objects.create(
-            recipient=followed,
-            message=f"{follower.full_name} started following you!",
-        )
-
-
         Connections.objects.create(follower=follower, followed=followed)
         Conversation.objects.create(user_one=follower, user_two=followed)
+
+        # Stored now, pushed to the followed user's socket in the background
+        notify(
+            [followed.id], FOLLOW, f"{follower.full_name} started following you!",
+            actor=follower, payload={"user_id": follower.id}, group_key=FOLLOW,
+        )
         return Response({"detail": "User followed successfully."}, status=status.HTTP_201_CREATED)
 
     def delete(self, request, user_id):
@@ -67,31 +52,71 @@ class FollowUserView(APIView):
         if not connection:
             return Response({"detail": "Not following this user."}, status=status.HTTP_400_BAD_REQUEST)
         
-        notification = Notification.objects.filter(recipient=followed).first()
-        if notification:
-            notification.delete()
+        # A follow notification coalesced with other followers stays
+        deleted, _ = Notification.objects.filter(
+            recipient=followed, actor=follower, kind=FOLLOW, actor_count=1,
+        ).delete()
+        if deleted:
+            unread.invalidate(followed.id)
 
         connection.delete()
         chat.delete()
         return Response({"detail": "User unfollowed successfully."}, status=status.HTTP_204_NO_CONTENT)
 
-class FollowersListView(APIView):
-    permission_classes = [IsAuthenticated]
+class ConnectionCursorPagination(CursorPagination):
+    """
+    Newest connections first on (created_at, id); each page is a range scan
+    on the (followed|follower, created_at, id) index.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
 
-    def get(self, request, user_id):
-        user = get_object_or_404(User, id=user_id)
-        followers = user.followers.all()
-        serializer = FollowSerializer(followers, many=True)
-        return Response(serializer.data)
 
-class FollowingListView(APIView):
+# Profiles rendered by UserProfileSerializer
+PROFILE_RELATIONS = ('investor_preferences', 'business_preferences')
+
+
+def _with_profiles(queryset, side):
+    return queryset.select_related(side, *(f"{side}__{relation}" for relation in PROFILE_RELATIONS))
+
+
+class FollowersListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
+    serializer_class = FollowerSerializer
+    pagination_class = ConnectionCursorPagination
 
-    def get(self, request, user_id):
-        user = get_object_or_404(User, id=user_id)
-        following = user.following.all()
-        serializer = FollowSerializer(following, many=True)
-        return Response(serializer.data)
+    def get_queryset(self):
+        user = get_object_or_404(User, id=self.kwargs['user_id'])
+        return _with_profiles(Connections.objects.filter(followed=user), 'follower')
+
+
+class FollowingListView(generics.ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = FollowingSerializer
+    pagination_class = ConnectionCursorPagination
+
+    def get_queryset(self):
+        user = get_object_or_404(User, id=self.kwargs['user_id'])
+        return _with_profiles(Connections.objects.filter(follower=user), 'followed')
+
+
+def connections_overview(user):
+    """
+    Follower and following counts of a user with the newest page of each;
+    the rest is paged through FollowersListView / FollowingListView.
+    """
+    page_size = ConnectionCursorPagination.page_size
+    followers = _with_profiles(Connections.objects.filter(followed=user), 'follower').order_by('-created_at', '-id')
+    following = _with_profiles(Connections.objects.filter(follower=user), 'followed').order_by('-created_at', '-id')
+    followers_count, following_count = counts(user)
+    return {
+        'followers': UserProfileSerializer([c.follower for c in followers[:page_size]], many=True).data,
+        'following': UserProfileSerializer([c.followed for c in following[:page_size]], many=True).data,
+        'followers_count': followers_count,
+        'following_count': following_count,
+    }
 
 
 class CheckFollowStatusView(APIView):
@@ -110,33 +135,15 @@ class UserConnectionsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        user = request.user
-
-        followers = CustomUser.objects.filter(following__followed=user)
-        following = CustomUser.objects.filter(followers__follower=user)
-
-        followers_data = UserProfileSerializer(followers, many=True).data
-        following_data = UserProfileSerializer(following, many=True).data
-
-        return Response({
-            'followers': followers_data,
-            'following': following_data
-        })
+        user = User.objects.select_related('stats').get(pk=request.user.pk)
+        return Response(connections_overview(user))
         
 class UserFollowersFollowingView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, user_id=None, *args, **kwargs):
-        target_user = get_object_or_404(CustomUser, id=user_id)
-        followers = CustomUser.objects.filter(following__followed=target_user)
-        following = CustomUser.objects.filter(followers__follower=target_user)
-        followers_data = UserProfileSerializer(followers, many=True).data
-        following_data = UserProfileSerializer(following, many=True).data
-        
-        return Response({
-            'followers': followers_data,
-            'following': following_data
-        })
+        target_user = get_object_or_404(CustomUser.objects.select_related('stats'), id=user_id)
+        return Response(connections_overview(target_user))
         
 class SuggestedUsersView(APIView):
     permission_classes = [IsAuthenticated]
@@ -146,34 +153,16 @@ class SuggestedUsersView(APIView):
         return Response(serializer.data)
     
     def get_suggested_users(self, request):
-        current_user = request.user
-
-        # Step 1: Base Query - Exclude current user, 'admin' role, and already-followed users
-        followed_user_ids = Connections.objects.filter(follower=current_user).values_list('followed_id', flat=True)
-        base_users = CustomUser.objects.filter(
-            ~Q(role='admin'),
-            ~Q(id=current_user.id),
-            ~Q(id__in=followed_user_ids)
-        )
-
-        # Step 2: Mutual Connection Scoring - annotate users with mutual followers count
-        mutual_connections = Connections.objects.filter(
-            follower__in=base_users, 
-            followed=current_user
-        ).values('follower_id').annotate(mutual_count=Count('follower_id'))
-
-        # Build a user list with mutual connections prioritized
-        suggested_users = base_users.annotate(
-            mutual_count=Count('followers__follower_id', filter=Q(followers__follower=current_user))
-        ).order_by('-mutual_count')
-
-        # Step 3: Additional Sorting and Randomization
-        # Order users by mutual connection count, then by recent activity, finally randomize a few for diversity
-        recently_active_time = timezone.now() - timedelta(days=7)
-        active_users = suggested_users.filter(last_login__gte=recently_active_time).order_by('?')[:5]  # Top 5 active users
-        diverse_users = suggested_users.order_by('?')[:7]  # Add randomness for variety
-
-        # Combine active and diverse users
-        final_suggestions = list(active_users) + list(diverse_users)
-
-        return final_suggestions[:7]  
\ No newline at end of file
+        shown = settings.SUGGESTIONS_SHOWN
+        # Precomputed ranking (see connections.suggestions); pick a few of the best for variety
+        ranked = suggestions.suggested_ids(request.user.id, shown * 3)
+        if ranked is None:
+            # Computed by the task worker; the most followed accounts meanwhile
+            schedule_refresh([request.user.id], countdown=0)
+            ranked = suggestions.fallback_ids(request.user.id, shown * 3)
+        picked = sorted(random.sample(range(len(ranked)), min(shown, len(ranked))))
+        suggested_ids = [ranked[index] for index in picked]
+
+        users = CustomUser.objects.filter(id__in=suggested_ids, status=True).select_related(*PROFILE_RELATIONS)
+        users_by_id = {user.id: user for user in users}
+        return [users_by_id[user_id] for user_id in suggested_ids if user_id in users_by_id]  
\ No newline at end of file
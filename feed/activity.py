@@ -0,0 +1,26 @@
+"""
+Notifications to post authors about activity on their posts.
+"""
+from notifications.models import LIKE, COMMENT
+from notifications.service import notify
+from .models import Post
+
+
+def _notify_author(post_id, actor, kind, message, payload):
+    author_id = Post.objects.filter(pk=post_id).values_list('user_id', flat=True).first()
+    if author_id is not None:
+        notify(
+            [author_id], kind, message, actor=actor, payload={'post_id': post_id, **payload},
+            group_key=f'post:{post_id}',
+        )
+
+
+def post_liked(post_id, actor):
+    _notify_author(post_id, actor, LIKE, f"{actor.full_name} liked your post", {})
+
+
+def post_commented(comment):
+    _notify_author(
+        comment.post_id, comment.user, COMMENT, f"{comment.user.full_name} commented on your post",
+        {'comment_id': comment.id},
+    )
@@ -0,0 +1,56 @@
+"""
+Denormalized like/comment/share counters on `Post`.
+
+The counters move with atomic `F()` updates as rows are created and deleted
+(see `feed.signals`); `reconcile_counters` recomputes them from the source
+tables for anything that bypassed signals (bulk operations, raw SQL).
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import Post, Comment, Like, Share
+
+# Source model -> Post counter column it feeds.
+COUNTERS = {
+    Like: 'like_count',
+    Comment: 'comment_count',
+    Share: 'share_count',
+}
+
+
+def adjust(model, post_id, delta):
+    """
+    Atomically move the counter fed by `model` on one post by `delta`.
+    """
+    field = COUNTERS[model]
+    Post.objects.filter(pk=post_id).update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def count_subquery(model):
+    """
+    Correlated COUNT of `model` rows for the outer post.
+    """
+    return Coalesce(
+        Subquery(
+            model.objects.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile_counters(batch_size=1000):
+    """
+    Recompute every post's counters from the source tables, one primary key
+    range per UPDATE. Returns the number of posts processed.
+    """
+    post_ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(post_ids), batch_size):
+        batch = post_ids[start:start + batch_size]
+        Post.objects.filter(pk__gte=batch[0], pk__lte=batch[-1]).update(**{
+            field: count_subquery(model) for model, field in COUNTERS.items()
+        })
+    return len(post_ids)
@@ -0,0 +1,102 @@
+"""
+Single-statement like, unlike and toggle.
+
+Each operation is one Postgres statement: the INSERT ... ON CONFLICT DO NOTHING
+and/or DELETE ... RETURNING on the like row and the matching `like_count`
+update run as data-modifying CTEs, so they commit together. Double taps
+converge instead of raising IntegrityError. The counter is only written when a
+row actually changed, so repeated taps do not queue up on the post's row lock.
+
+These bypass model signals, which is why the counter is updated here.
+"""
+from django.db import connection
+from .models import Post, Like
+
+POST_TABLE = Post._meta.db_table
+LIKE_TABLE = Like._meta.db_table
+
+LIKE_SQL = f"""
+WITH inserted AS (
+    INSERT INTO {LIKE_TABLE} (post_id, user_id, created_at)
+    SELECT %(post)s, %(user)s, now()
+    WHERE EXISTS (SELECT 1 FROM {POST_TABLE} WHERE id = %(post)s)
+    ON CONFLICT (post_id, user_id) DO NOTHING
+    RETURNING id
+), counted AS (
+    UPDATE {POST_TABLE} SET like_count = like_count + 1
+    WHERE id = %(post)s AND EXISTS (SELECT 1 FROM inserted)
+    RETURNING like_count
+)
+SELECT TRUE, COALESCE(
+    (SELECT like_count FROM counted),
+    (SELECT like_count FROM {POST_TABLE} WHERE id = %(post)s)
+), EXISTS (SELECT 1 FROM inserted)
+"""
+
+UNLIKE_SQL = f"""
+WITH deleted AS (
+    DELETE FROM {LIKE_TABLE} WHERE post_id = %(post)s AND user_id = %(user)s
+    RETURNING id
+), counted AS (
+    UPDATE {POST_TABLE} SET like_count = GREATEST(like_count - 1, 0)
+    WHERE id = %(post)s AND EXISTS (SELECT 1 FROM deleted)
+    RETURNING like_count
+)
+SELECT FALSE, COALESCE(
+    (SELECT like_count FROM counted),
+    (SELECT like_count FROM {POST_TABLE} WHERE id = %(post)s)
+), EXISTS (SELECT 1 FROM deleted)
+"""
+
+# The INSERT only runs when the DELETE found nothing; all sub-statements share
+# one snapshot, so exactly one of them can take effect.
+TOGGLE_SQL = f"""
+WITH deleted AS (
+    DELETE FROM {LIKE_TABLE} WHERE post_id = %(post)s AND user_id = %(user)s
+    RETURNING id
+), inserted AS (
+    INSERT INTO {LIKE_TABLE} (post_id, user_id, created_at)
+    SELECT %(post)s, %(user)s, now()
+    WHERE NOT EXISTS (SELECT 1 FROM deleted)
+      AND EXISTS (SELECT 1 FROM {POST_TABLE} WHERE id = %(post)s)
+    ON CONFLICT (post_id, user_id) DO NOTHING
+    RETURNING id
+), counted AS (
+    UPDATE {POST_TABLE}
+    SET like_count = GREATEST(
+        like_count + (SELECT count(*) FROM inserted) - (SELECT count(*) FROM deleted), 0
+    )
+    WHERE id = %(post)s
+      AND (EXISTS (SELECT 1 FROM inserted) OR EXISTS (SELECT 1 FROM deleted))
+    RETURNING like_count
+)
+SELECT NOT EXISTS (SELECT 1 FROM deleted), COALESCE(
+    (SELECT like_count FROM counted),
+    (SELECT like_count FROM {POST_TABLE} WHERE id = %(post)s)
+), EXISTS (SELECT 1 FROM inserted) OR EXISTS (SELECT 1 FROM deleted)
+"""
+
+
+def _run(sql, post_id, user_id):
+    """
+    Returns (liked, like_count, changed), or None if the post does not exist.
+    `changed` is False when the like was already in the requested state.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'post': post_id, 'user': user_id})
+        liked, like_count, changed = cursor.fetchone()
+    if like_count is None:
+        return None
+    return liked, like_count, changed
+
+
+def like(post_id, user_id):
+    return _run(LIKE_SQL, post_id, user_id)
+
+
+def unlike(post_id, user_id):
+    return _run(UNLIKE_SQL, post_id, user_id)
+
+
+def toggle(post_id, user_id):
+    return _run(TOGGLE_SQL, post_id, user_id)
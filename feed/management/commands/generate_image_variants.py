@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from feed.models import Post
+from user_authentication.models import InvestorPreferences
+from user_management.models import BusinessPreferences
+from zephyr import images
+
+# Models with image variants and their image fields.
+IMAGE_FIELDS = {
+    Post: ['image'],
+    InvestorPreferences: ['avatar_image', 'cover_image'],
+    BusinessPreferences: ['avatar_image', 'cover_image'],
+}
+
+
+class Command(BaseCommand):
+    help = "Queue rendering of missing or outdated thumbnail/WebP variants for post images, avatars and covers."
+
+    def handle(self, *args, **options):
+        for model, fields in IMAGE_FIELDS.items():
+            pending = 0
+            for instance in model.objects.only('pk', 'image_variants', *fields).iterator():
+                stale = images.stale_fields(instance, fields)
+                if stale:
+                    images.generate_variants.delay(model._meta.label, instance.pk, stale)
+                    pending += 1
+            self.stdout.write(f"{model.__name__}: {pending} rows queued.")
+        self.stdout.write(self.style.SUCCESS("Run `manage.py run_task_worker` to render them."))
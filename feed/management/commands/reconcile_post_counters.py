@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from feed.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the like/comment/share counters on every post from the source tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        processed = reconcile_counters(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled counters for {processed} posts."))
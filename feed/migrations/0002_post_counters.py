@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:46
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('feed', 'Post')
+
+    def count(model_name):
+        model = apps.get_model('feed', model_name)
+        return Coalesce(
+            Subquery(
+                model.objects.filter(post=OuterRef('pk')).order_by().values('post')
+                .annotate(total=Count('pk')).values('total'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    Post.objects.update(
+        like_count=count('Like'),
+        comment_count=count('Comment'),
+        share_count=count('Share'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='share_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
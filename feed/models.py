@@ -8,6 +8,19 @@ class Post(models.Model):
     location = models.CharField(max_length=255, blank=True)
     image = models.ImageField(upload_to="post_images/")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized counters, kept up to date by feed.signals (see feed.counters)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    share_count = models.PositiveIntegerField(default=0)
+    # Storage names of the resized WebP copies of `image` (see zephyr.images)
+    image_variants = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Cursor pagination of the global feed and of a user's posts
+            models.Index(fields=['-created_at', '-id'], name='feed_post_created_id'),
+            models.Index(fields=['user', '-created_at', '-id'], name='feed_post_user_created_id'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.caption[:20]}"
@@ -16,13 +29,13 @@ class Post(models.Model):
         return self.likes.filter(user=user).exists()
 
     def total_likes(self):
-        return self.likes.count()
+        return self.like_count
 
     def total_comments(self):
-        return self.comments.count()
+        return self.comment_count
 
     def total_shares(self):
-        return self.shares.count()
+        return self.share_count
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
@@ -30,6 +43,11 @@ class Comment(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-created_at', '-id'], name='feed_comment_post_created_id'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on {self.post.caption[:20]}"
 
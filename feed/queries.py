@@ -0,0 +1,28 @@
+"""
+Query layer for feed endpoints.
+
+Post lists are fetched with the viewer's like state annotated onto the main
+query and the author's profile joined in, so serializing a page does not run
+per-post queries. Counts are the denormalized columns on `Post`.
+"""
+from django.db.models import Exists, OuterRef, Value
+from .models import Post, Like
+
+
+def feed_posts(viewer=None, queryset=None):
+    """
+    Posts annotated with `viewer_has_liked`, with author profiles selected alongside.
+
+    `queryset` narrows the posts (e.g. one user's posts); defaults to all posts.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+
+    if viewer is not None and viewer.is_authenticated:
+        viewer_has_liked = Exists(Like.objects.filter(post=OuterRef('pk'), user=viewer))
+    else:
+        viewer_has_liked = Value(False)
+
+    return queryset.select_related(
+        'user', 'user__investor_preferences', 'user__business_preferences'
+    ).annotate(viewer_has_liked=viewer_has_liked)
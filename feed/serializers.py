@@ -3,6 +3,7 @@ from rest_framework import serializers
 from .models import Post, Comment, Like, Share
 from user_authentication.models import CustomUser, InvestorPreferences
 from user_management.models import BusinessPreferences
+from zephyr import images
 
 
 class UserProfileSerializer(serializers.Serializer):
@@ -24,7 +25,7 @@ class UserProfileSerializer(serializers.Serializer):
             try:
                 investor_profile = instance.investor_preferences
                 user_data['name'] = instance.full_name
-                user_data['image'] = investor_profile.avatar_image.url if investor_profile.avatar_image else None
+                user_data['image'] = images.variant_url(investor_profile, 'avatar_image')
             except InvestorPreferences.DoesNotExist:
                 user_data['name'] = instance.full_name
                 user_data['image'] = None  # If no investor preferences exist, set image to None
@@ -33,7 +34,7 @@ class UserProfileSerializer(serializers.Serializer):
             try:
                 business_profile = instance.business_preferences
                 user_data['name'] = business_profile.company_name
-                user_data['image'] = business_profile.avatar_image.url if business_profile.avatar_image else None
+                user_data['image'] = images.variant_url(business_profile, 'avatar_image')
             except BusinessPreferences.DoesNotExist:
                 user_data['name'] = "Business Profile"  # Default name if no business preferences
                 user_data['image'] = None  # Default to None if no business preferences exist
@@ -49,15 +50,25 @@ class PostSerializer(serializers.ModelSerializer):
     total_comments = serializers.ReadOnlyField()
     total_shares = serializers.ReadOnlyField()
     is_liked = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     user = UserProfileSerializer(read_only=True)
 
     class Meta:
         model = Post
-        fields = ['id', 'user', 'caption', 'location', 'image', 'created_at', 'total_likes', 'total_comments', 'total_shares', 'is_liked']
+        fields = ['id', 'user', 'caption', 'location', 'image', 'image_variants', 'created_at', 'total_likes', 'total_comments', 'total_shares', 'is_liked']
+
+    def get_image_variants(self, obj):
+        # thumb / small / large WebP URLs; empty until they have been rendered
+        request = self.context.get('request')
+        urls = images.variant_urls(obj, 'image')
+        return {variant: request.build_absolute_uri(url) if request else url for variant, url in urls.items()}
+
     def get_is_liked(self, obj):
-            # Retrieve the authenticated user from the request
+            # Annotated by the feed query; otherwise checked for the authenticated user
+            if hasattr(obj, 'viewer_has_liked'):
+                return obj.viewer_has_liked
             user = self.context.get('request').user
-            return obj.is_liked_by_user(user)
+            return user.is_authenticated and obj.is_liked_by_user(user)
 
 class CommentSerializer(serializers.ModelSerializer):
     user = UserProfileSerializer(read_only=True)
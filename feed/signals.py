@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from connections.models import Connections
+from .models import Post, Comment, Like, Share
+from .counters import adjust
+from . import activity, tasks, timeline
+from zephyr import images
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Share)
+def increment_post_counter(sender, instance, created, **kwargs):
+    if created:
+        adjust(sender, instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Share)
+def decrement_post_counter(sender, instance, **kwargs):
+    adjust(sender, instance.post_id, -1)
+
+
+@receiver(post_save, sender=Like)
+def notify_like(sender, instance, created, **kwargs):
+    if created:
+        activity.post_liked(instance.post_id, instance.user)
+
+
+@receiver(post_save, sender=Comment)
+def notify_comment(sender, instance, created, **kwargs):
+    if created:
+        activity.post_commented(instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        # Queued outside the request's error path: a Redis outage must not fail the post.
+        transaction.on_commit(lambda: tasks.fan_out_post.delay(instance.pk), robust=True)
+
+
+@receiver(post_save, sender=Post)
+def generate_image_variants(sender, instance, **kwargs):
+    images.schedule(instance, ['image'])
+
+
+@receiver(post_save, sender=Connections)
+def add_followed_to_timeline(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            lambda: timeline.add_author(instance.follower_id, instance.followed_id), robust=True
+        )
+
+
+@receiver(post_delete, sender=Connections)
+def remove_unfollowed_from_timeline(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: timeline.remove_author(instance.follower_id, instance.followed_id), robust=True
+    )
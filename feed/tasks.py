@@ -0,0 +1,13 @@
+from zephyr.tasks import task
+from . import timeline
+from .models import Post
+
+
+@task(max_retries=2)
+def fan_out_post(post_id):
+    """
+    Push a new post into its author's and their followers' timelines.
+    """
+    post = Post.objects.filter(pk=post_id).only('user_id', 'created_at').first()
+    if post is not None:
+        timeline.fan_out(post)
@@ -1,3 +1,158 @@
+from unittest import skipUnless
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from rest_framework.test import APIClient
+from user_authentication.models import CustomUser, InvestorPreferences
+from user_management.models import BusinessPreferences
+from .models import Post, Comment, Like, Share
+from .counters import reconcile_counters
+from . import likes
 
-# Create your tests here.
+
+class FeedQueryCountTests(TestCase):
+    """
+    Feed pages must cost a fixed number of queries however many posts they hold.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = CustomUser.objects.create(
+            username='viewer', email='viewer@example.com', full_name='Viewer', role='investor',
+        )
+        InvestorPreferences.objects.create(user=cls.viewer)
+
+        cls.business = CustomUser.objects.create(
+            username='business', email='business@example.com', full_name='Business', role='business',
+        )
+        BusinessPreferences.objects.create(
+            user=cls.business, company_name='Acme', business_type='B2B', company_stage='Seed',
+            company_description='Widgets', seeking_amount=1000, website='https://acme.example.com',
+            product_type='Hardware', annual_revenue=100, employee_count=5,
+        )
+
+        for index in range(8):
+            author = cls.viewer if index % 2 else cls.business
+            post = Post.objects.create(
+                user=author, caption=f'post {index}',
+                image=SimpleUploadedFile(f'post{index}.jpg', b'image', content_type='image/jpeg'),
+            )
+            Comment.objects.create(post=post, user=cls.viewer, text='nice')
+            Share.objects.create(post=post, user=cls.business)
+            if index % 3 == 0:
+                Like.objects.create(post=post, user=cls.viewer)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_post_list_query_count_is_constant(self):
+        # A single SELECT for the page; cursor pagination runs no COUNT.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/feed/posts/', {'page_size': 20})
+        self.assertEqual(response.status_code, 200)
+
+        posts = {post['caption']: post for post in response.data['results']}
+        self.assertEqual(len(posts), 8)
+        self.assertEqual(posts['post 0']['total_likes'], 1)
+        self.assertTrue(posts['post 0']['is_liked'])
+        self.assertEqual(posts['post 1']['total_likes'], 0)
+        self.assertFalse(posts['post 1']['is_liked'])
+        self.assertEqual(posts['post 1']['total_comments'], 1)
+        self.assertEqual(posts['post 1']['total_shares'], 1)
+        self.assertEqual(posts['post 0']['user']['name'], 'Acme')
+        self.assertEqual(posts['post 1']['user']['name'], 'Viewer')
+
+    def test_user_post_list_query_count_is_constant(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/feed/user/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_anonymous_post_list(self):
+        with self.assertNumQueries(1):
+            response = APIClient().get('/api/feed/posts/', {'page_size': 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(post['is_liked'] for post in response.data['results']))
+
+    def test_post_list_cursor_pages(self):
+        first = self.client.get('/api/feed/posts/', {'page_size': 5}).data
+        self.assertEqual([post['caption'] for post in first['results']], [f'post {i}' for i in range(7, 2, -1)])
+
+        with self.assertNumQueries(1):
+            second = self.client.get(first['next']).data
+        self.assertEqual([post['caption'] for post in second['results']], ['post 2', 'post 1', 'post 0'])
+        self.assertIsNone(second['next'])
+
+    def test_comment_list_query_count_is_constant(self):
+        post = Post.objects.get(caption='post 0')
+        for index in range(5):
+            Comment.objects.create(post=post, user=self.business, text=f'comment {index}')
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/feed/posts/{post.pk}/comments/')
+        self.assertEqual(len(response.data['results']), 6)
+
+
+class PostCounterTests(TestCase):
+    """
+    Denormalized counters follow likes, comments and shares and can be reconciled.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='author', email='author@example.com', full_name='Author')
+        self.post = Post.objects.create(
+            user=self.user, image=SimpleUploadedFile('post.jpg', b'image', content_type='image/jpeg'),
+        )
+
+    def test_counters_follow_rows(self):
+        like = Like.objects.create(post=self.post, user=self.user)
+        Comment.objects.create(post=self.post, user=self.user, text='first')
+        Comment.objects.create(post=self.post, user=self.user, text='second')
+        Share.objects.create(post=self.post, user=self.user)
+        like.delete()
+
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.like_count, self.post.comment_count, self.post.share_count), (0, 2, 1)
+        )
+
+    def test_reconcile_fixes_drift(self):
+        Like.objects.bulk_create([Like(post=self.post, user=self.user)])
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7)
+
+        reconcile_counters()
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+
+
+@skipUnless(connection.vendor == 'postgresql', "like statements use Postgres data-modifying CTEs")
+class LikeStatementTests(TestCase):
+    """
+    Like, unlike and toggle are idempotent and keep like_count in step.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='liker', email='liker@example.com', full_name='Liker')
+        self.post = Post.objects.create(
+            user=self.user, image=SimpleUploadedFile('post.jpg', b'image', content_type='image/jpeg'),
+        )
+
+    def test_like_and_unlike_are_idempotent(self):
+        self.assertEqual(likes.like(self.post.pk, self.user.pk), (True, 1, True))
+        self.assertEqual(likes.like(self.post.pk, self.user.pk), (True, 1, False))
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+
+        self.assertEqual(likes.unlike(self.post.pk, self.user.pk), (False, 0, True))
+        self.assertEqual(likes.unlike(self.post.pk, self.user.pk), (False, 0, False))
+        self.assertFalse(Like.objects.filter(post=self.post).exists())
+
+    def test_toggle(self):
+        self.assertEqual(likes.toggle(self.post.pk, self.user.pk), (True, 1, True))
+        self.assertEqual(likes.toggle(self.post.pk, self.user.pk), (False, 0, True))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_missing_post(self):
+        self.assertIsNone(likes.toggle(self.post.pk + 1000, self.user.pk))
+        self.assertIsNone(likes.like(self.post.pk + 1000, self.user.pk))
@@ -0,0 +1,217 @@
+"""
+Home timelines: posts from the accounts a user follows, newest first.
+
+New posts are pushed (fan-out-on-write) into a capped Redis sorted set per
+follower, scored by creation time. Authors with more than
+FEED_FANOUT_MAX_FOLLOWERS followers are not fanned out; their recent posts are
+merged in when a follower reads (fan-out-on-read). A read is then one sorted
+set range plus one batch query that hydrates the page.
+
+Timelines are ordered by (score, post id), newest first, and paged with a
+"score:post id" cursor so posts sharing a timestamp are neither skipped nor
+repeated across pages.
+"""
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.db.models import Q
+from django_redis import get_redis_connection
+from connections.models import Connections, UserStats
+from .models import Post
+from .queries import feed_posts
+
+CELEBRITIES_KEY = 'feed:celebrities'
+FANOUT_BATCH_SIZE = 1000
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _timeline_key(user_id):
+    return f"feed:timeline:{user_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _score(post):
+    return post.created_at.timestamp()
+
+
+def _push(pipeline, user_id, entries):
+    key = _timeline_key(user_id)
+    pipeline.zadd(key, entries)
+    pipeline.zremrangebyrank(key, 0, -settings.FEED_TIMELINE_LENGTH - 1)
+
+
+def fan_out(post):
+    """
+    Push a new post into its author's and their followers' timelines, or mark
+    the author for fan-out-on-read if they have too many followers.
+    """
+    redis = _redis()
+    followers = Connections.objects.filter(followed_id=post.user_id)
+    entry = {post.pk: _score(post)}
+
+    followers_count = UserStats.objects.filter(pk=post.user_id).values_list('followers_count', flat=True).first()
+    if (followers_count or 0) > settings.FEED_FANOUT_MAX_FOLLOWERS:
+        redis.sadd(CELEBRITIES_KEY, post.user_id)
+        follower_ids = []
+    else:
+        redis.srem(CELEBRITIES_KEY, post.user_id)
+        follower_ids = followers.values_list('follower_id', flat=True).iterator(chunk_size=FANOUT_BATCH_SIZE)
+
+    pipeline = redis.pipeline(transaction=False)
+    _push(pipeline, post.user_id, entry)
+    for count, follower_id in enumerate(follower_ids, start=1):
+        _push(pipeline, follower_id, entry)
+        if count % FANOUT_BATCH_SIZE == 0:
+            pipeline.execute()
+    pipeline.execute()
+
+
+def add_author(user_id, author_id):
+    """
+    Backfill a newly followed author's recent posts into the user's timeline.
+    """
+    if author_id in _celebrity_ids():
+        return
+    recent = Post.objects.filter(user_id=author_id).order_by('-created_at')[:settings.FEED_TIMELINE_LENGTH]
+    entries = {post_id: created_at.timestamp() for post_id, created_at in recent.values_list('id', 'created_at')}
+    if entries:
+        pipeline = _redis().pipeline(transaction=False)
+        _push(pipeline, user_id, entries)
+        pipeline.execute()
+
+
+def remove_author(user_id, author_id):
+    """
+    Drop an unfollowed author's posts from the user's timeline.
+    """
+    post_ids = list(Post.objects.filter(user_id=author_id).values_list('id', flat=True))
+    if post_ids:
+        _redis().zrem(_timeline_key(user_id), *post_ids)
+
+
+def rebuild(user_id):
+    """
+    Fill an empty timeline (new account, flushed Redis) from the database.
+    """
+    followed = Connections.objects.filter(follower_id=user_id).exclude(
+        followed_id__in=_celebrity_ids()
+    ).values('followed_id')
+    recent = Post.objects.filter(
+        Q(user_id=user_id) | Q(user_id__in=followed)
+    ).order_by('-created_at')[:settings.FEED_TIMELINE_LENGTH]
+    entries = {post_id: created_at.timestamp() for post_id, created_at in recent.values_list('id', 'created_at')}
+    if entries:
+        pipeline = _redis().pipeline(transaction=False)
+        _push(pipeline, user_id, entries)
+        pipeline.execute()
+    return entries
+
+
+def _celebrity_ids():
+    return {int(user_id) for user_id in _redis().smembers(CELEBRITIES_KEY)}
+
+
+def _celebrity_entries(user_id, before, limit):
+    """
+    (post id, score) of the newest posts by followed accounts that are not
+    fanned out, after the `before` cursor.
+    """
+    celebrity_ids = _celebrity_ids()
+    if not celebrity_ids:
+        return []
+    followed = Connections.objects.filter(follower_id=user_id, followed_id__in=celebrity_ids).values('followed_id')
+    posts = Post.objects.filter(user_id__in=followed)
+    if before is not None:
+        score, post_id = before
+        created_at = _from_score(score)
+        older = Q(created_at__lt=created_at)
+        if post_id is not None:
+            older |= Q(created_at=created_at, id__lt=post_id)
+        posts = posts.filter(older)
+    return [
+        (post_id, created_at.timestamp())
+        for post_id, created_at in posts.order_by('-created_at', '-id').values_list('id', 'created_at')[:limit]
+    ]
+
+
+def _from_score(score):
+    # Scores are created_at timestamps; rounding to whole microseconds gives
+    # back the stored datetime exactly, which datetime.fromtimestamp does not
+    return EPOCH + timedelta(microseconds=round(score * 1000000))
+
+
+def _timeline_order(entry):
+    post_id, score = entry
+    return -score, -post_id
+
+
+def decode_cursor(cursor):
+    """
+    (score, post id) of a `next` cursor; a bare score, as returned before
+    cursors carried the post id, has no post id. Raises ValueError.
+    """
+    score, _, post_id = cursor.partition(':')
+    return float(score), int(post_id) if post_id else None
+
+
+def _encode_cursor(entry):
+    post_id, score = entry
+    return f"{score!r}:{post_id}"
+
+
+def _entries(redis, key, before, count):
+    """
+    The first `count` (post id, score) of a timeline after the `before` cursor.
+    """
+    if before is None:
+        return [
+            (int(post_id), score)
+            for post_id, score in redis.zrevrangebyscore(key, '+inf', '-inf', start=0, num=count, withscores=True)
+        ]
+    score, last_id = before
+    pipeline = redis.pipeline(transaction=False)
+    # Posts sharing the cursor's score, which the sorted set orders by member
+    # string rather than by id, are all read and filtered by id here
+    pipeline.zrangebyscore(key, score, score, withscores=True)
+    pipeline.zrevrangebyscore(key, f"({score}", '-inf', start=0, num=count, withscores=True)
+    ties, older = pipeline.execute()
+    entries = [(int(post_id), entry_score) for post_id, entry_score in older]
+    if last_id is not None:
+        entries += [(int(post_id), entry_score) for post_id, entry_score in ties if int(post_id) < last_id]
+    return sorted(entries, key=_timeline_order)[:count]
+
+
+def page(user, before=None, limit=20):
+    """
+    One page of the user's home timeline after the `before` (score, post id)
+    cursor (see `decode_cursor`).
+
+    Returns the hydrated posts in timeline order and the cursor for the next
+    page (None when there is nothing older).
+    """
+    redis = _redis()
+    key = _timeline_key(user.pk)
+    entries = _entries(redis, key, before, limit + 1)
+    if not entries and before is None and not redis.exists(key):
+        entries = sorted(rebuild(user.pk).items(), key=_timeline_order)[:limit + 1]
+
+    entries = sorted(
+        set(entries) | set(_celebrity_entries(user.pk, before, limit + 1)),
+        key=_timeline_order,
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    posts = feed_posts(user, Post.objects.filter(id__in=[post_id for post_id, _ in entries])).in_bulk()
+
+    missing = [post_id for post_id, _ in entries if post_id not in posts]
+    if missing:
+        # Deleted since they were fanned out
+        redis.zrem(key, *missing)
+
+    return (
+        [posts[post_id] for post_id, _ in entries if post_id in posts],
+        _encode_cursor(entries[-1]) if has_more else None,
+    )
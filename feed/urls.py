@@ -2,7 +2,7 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, LikeViewSet, ShareViewSet, CommentListView, ToggleLikePostView,PostViewForRequestUser
+from .views import PostViewSet, CommentViewSet, LikeViewSet, ShareViewSet, CommentListView, ToggleLikePostView,PostViewForRequestUser, TimelineView, LikePostView
 router = DefaultRouter()
 router.register(r'posts', PostViewSet)
 router.register(r'comments', CommentViewSet)
@@ -13,6 +13,8 @@ urlpatterns = [
     path('', include(router.urls)),
     path('posts/<int:post_id>/comments/', CommentListView.as_view(), name='post-comments'),
     path('toggle-like/', ToggleLikePostView.as_view(), name='toggle_like_post'),
+    path('posts/<int:post_id>/like/', LikePostView.as_view(), name='like-post'),
     path('user/posts/', PostViewForRequestUser.as_view(), name='user-posts'),
+    path('timeline/', TimelineView.as_view(), name='home-timeline'),
 
 ]
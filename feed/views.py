@@ -2,37 +2,40 @@
 from rest_framework import viewsets, permissions, status, generics
 from .models import Post, Comment, Like, Share
 from .serializers import PostSerializer, CommentSerializer, LikeSerializer, ShareSerializer
+from .queries import feed_posts
+from . import activity, likes
+from django.http import Http404
+from . import timeline
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.shortcuts import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination
 
 
-class CustomPagination(PageNumberPagination):
-    page_size = 1  # Number of items per page
-    page_size_query_param = 'page_size'  # Allow clients to set a custom page size
-    max_page_size = 100  # Maximum allowed page size
+class FeedCursorPagination(CursorPagination):
+    """
+    Cursor pagination on (created_at, id), newest first.
+
+    No COUNT query, and each page is an index range scan that starts where the
+    previous one ended, so deep scrolling costs the same as the first page.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
 
-    def get_paginated_response(self, data):
-        return Response({
-            'links': {
-                'next': self.get_next_link(),
-                'previous': self.get_previous_link()
-            },
-            'total_count': self.page.paginator.count,
-            'total_pages': self.page.paginator.num_pages,
-            'current_page': self.page.number,
-            'page_size': self.get_page_size(self.request),
-            'results': data
-        })
-    
 
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    pagination_class = CustomPagination
+    pagination_class = FeedCursorPagination
+
+    def get_queryset(self):
+        # Like state and author profiles come with the page query
+        return feed_posts(self.request.user).order_by('-created_at')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -79,10 +82,12 @@ class ShareViewSet(viewsets.ModelViewSet):
 class CommentListView(generics.ListAPIView):
     serializer_class = CommentSerializer
     permission_classes=[IsAuthenticated]
+    pagination_class = FeedCursorPagination
     def get_queryset(self):
         post_id = self.kwargs['post_id']
-        print(post_id)
-        return Comment.objects.filter(post_id=post_id).order_by('-created_at')
+        return Comment.objects.filter(post_id=post_id).select_related(
+            'user', 'user__investor_preferences', 'user__business_preferences'
+        ).order_by('-created_at')
 
 
 class ToggleLikePostView(APIView):
@@ -94,29 +99,82 @@ class ToggleLikePostView(APIView):
 
         if not post_id:
             return Response({"detail": "Post ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            post_id = int(post_id)
+        except (TypeError, ValueError):
+            return Response({"detail": "Post ID must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One statement flips the like row and the post's counter together
+        result = likes.toggle(post_id, user.id)
+        if result is None:
+            raise Http404
+        liked, total_likes, changed = result
+        if liked and changed:
+            activity.post_liked(post_id, user)
+
+        return Response({
+            "message": "Liked the post" if liked else "Unliked the post",
+            "isLiked": liked,
+            "total_likes": total_likes
+        }, status=status.HTTP_201_CREATED if liked else status.HTTP_200_OK)
+
+
+class LikePostView(APIView):
+    """
+    Idempotent like (POST) and unlike (DELETE) of a post. Repeating either
+    request leaves the like and the count unchanged.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, post_id):
+        result = likes.like(post_id, request.user.id)
+        if result and result[2]:
+            activity.post_liked(post_id, request.user)
+        return self.respond(result)
+
+    def delete(self, request, post_id):
+        return self.respond(likes.unlike(post_id, request.user.id))
 
-        post = get_object_or_404(Post, id=post_id)
-        existing_like = Like.objects.filter(user=user, post=post).first()
-        if existing_like:
-            existing_like.delete()
-            return Response({
-                "message": "Unliked the post",
-                "isLiked": False,
-                "total_likes": post.total_likes()
-            }, status=status.HTTP_200_OK)
-        else:
-            Like.objects.create(user=user, post=post)
-            return Response({
-                "message": "Liked the post",
-                "isLiked": True,
-                "total_likes": post.total_likes()
-            }, status=status.HTTP_201_CREATED)
+    def respond(self, result):
+        if result is None:
+            raise Http404
+        liked, total_likes, _changed = result
+        return Response({"isLiked": liked, "total_likes": total_likes}, status=status.HTTP_200_OK)
 
 
 class PostViewForRequestUser(generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FeedCursorPagination
     
     def get_queryset(self):
         user = self.request.user
-        return Post.objects.filter(user=user).order_by('-created_at')
\ No newline at end of file
+        return feed_posts(user, Post.objects.filter(user=user)).order_by('-created_at')
+
+
+class TimelineView(APIView):
+    """
+    Home timeline of the authenticated user: their own posts and those of the
+    accounts they follow, newest first.
+
+    Query params:
+        - before (str, optional): The `next` cursor of the previous page.
+        - limit (int, optional): Page size, defaults to FEED_TIMELINE_PAGE_SIZE.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            before = request.query_params.get('before')
+            before = timeline.decode_cursor(before) if before else None
+            limit = int(request.query_params.get('limit') or settings.FEED_TIMELINE_PAGE_SIZE)
+        except ValueError:
+            raise ValidationError({"detail": "Invalid cursor or limit."})
+        limit = max(1, min(limit, settings.FEED_TIMELINE_MAX_PAGE_SIZE))
+
+        posts, next_cursor = timeline.page(request.user, before, limit)
+        serializer = PostSerializer(posts, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            'next': next_cursor,
+        }, status=status.HTTP_200_OK)
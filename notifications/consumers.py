@@ -1,39 +1,81 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from .models import Notification
+from .serializers import NotificationSerializer
+from .tasks import group_name
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class NotificationConsumer(AsyncWebsocketConsumer):
+    group_name = None
+
     async def connect(self):
-        self.user_id = self.scope["url_route"]["kwargs"]["user_id"]
-        self.group_name = f"notifications_{self.user_id}"
-        print(f"User {self.user_id} is connecting. Group name: {self.group_name}")
+        # The user comes from the JWT access token; a legacy URL id must match it
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4001)
+            return
+        url_user_id = self.scope["url_route"]["kwargs"].get("user_id")
+        if url_user_id is not None and str(url_user_id) != str(user.id):
+            await self.close(code=4003)
+            return
+
+        self.user_id = user.id
+        self.group_name = group_name(self.user_id)
 
         # Join the notification group
         await self.channel_layer.group_add(
             self.group_name,
             self.channel_name
         )
-        
-        print(f"User {self.user_id} joined group: {self.group_name}")
-        await self.accept()
-        print(f"WebSocket connection accepted for user {self.user_id}")
+
+        await self.accept(subprotocol=self.scope.get("auth_subprotocol"))
+        logger.debug(f"User {self.user_id} joined notification group {self.group_name}")
+
+        # Send what arrived while the user had no socket open. The group was
+        # joined first, so a notification created meanwhile may come twice;
+        # clients dedupe by id.
+        for notification in await self.replay_undelivered():
+            await self.send(text_data=json.dumps(notification))
 
     async def disconnect(self, close_code):
-        print(f"User {self.user_id} is disconnecting. Close code: {close_code}")
+        if self.group_name is None:
+            return
 
         # Leave the notification group
         await self.channel_layer.group_discard(
             self.group_name,
             self.channel_name
         )
-        print(f"User {self.user_id} left group: {self.group_name}")
+        logger.debug(f"User {self.user_id} left notification group {self.group_name} (code {close_code})")
 
     # Send notification to the WebSocket
     async def send_notification(self, event):
-        message = event["message"]
-        created_at = event["created_at"]
-        print(f"Sending notification to user {self.user_id}: {message}")
-        await self.send(text_data=json.dumps({
-            "message": message,
-            "created_at": created_at
-        }))
-        print(f"Notification sent to user {self.user_id}")
+        notification = event["notification"]
+        await self.send(text_data=json.dumps(notification))
+        await self.mark_delivered(notification["id"])
+
+    @database_sync_to_async
+    def replay_undelivered(self):
+        """
+        The newest undelivered notifications, oldest first, marked delivered
+        together with any older undelivered ones.
+        """
+        notifications = list(
+            Notification.objects.filter(recipient_id=self.user_id, delivered_at__isnull=True)
+            .order_by('-created_at', '-id')[:settings.NOTIFICATION_REPLAY_LIMIT]
+        )
+        if not notifications:
+            return []
+        Notification.objects.filter(
+            recipient_id=self.user_id, delivered_at__isnull=True, id__lte=max(n.id for n in notifications),
+        ).update(delivered_at=timezone.now())
+        return NotificationSerializer(reversed(notifications), many=True).data
+
+    @database_sync_to_async
+    def mark_delivered(self, notification_id):
+        Notification.objects.filter(id=notification_id, delivered_at__isnull=True).update(delivered_at=timezone.now())
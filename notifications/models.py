@@ -1,17 +1,61 @@
 from django.db import models
 from user_authentication.models import CustomUser
 
+GENERAL = 'general'
+FOLLOW = 'follow'
+LIKE = 'like'
+COMMENT = 'comment'
+MESSAGE = 'message'
+
+KIND_CHOICES = [
+    (GENERAL, 'General'),
+    (FOLLOW, 'Follow'),
+    (LIKE, 'Like'),
+    (COMMENT, 'Comment'),
+    (MESSAGE, 'Message'),
+]
+
 
 class Notification(models.Model):
     recipient = models.ForeignKey(CustomUser, related_name='notifications', on_delete=models.CASCADE)
+    actor = models.ForeignKey(
+        CustomUser, related_name='sent_notifications', on_delete=models.CASCADE, null=True, blank=True
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=GENERAL)
     message = models.TextField()
+    # Ids the client needs to link the notification (post, conversation, ...)
+    payload = models.JSONField(default=dict, blank=True)
+    # Notifications with the same kind and group key are coalesced into one
+    # row per recipient (see notifications.service); `actor` is then the
+    # latest actor and `created_at` the latest occurrence.
+    group_key = models.CharField(max_length=100, blank=True, default='')
+    actor_count = models.PositiveIntegerField(default=1)
+    # Distinct actors of a coalesced notification, counted by `actor_count`
+    actor_ids = models.JSONField(default=list, blank=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set once pushed over a websocket; undelivered ones are replayed on connect
+    delivered_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
+        indexes = [
+            # Cursor pagination of a user's notifications
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notification_recipient_created'),
+            # Open group to coalesce into
+            models.Index(
+                fields=['recipient', 'kind', 'group_key', '-created_at'], name='notification_open_group',
+                condition=models.Q(is_read=False) & ~models.Q(group_key=''),
+            ),
+            # Unread counts
+            models.Index(fields=['recipient'], name='notification_unread', condition=models.Q(is_read=False)),
+            models.Index(
+                fields=['recipient', 'created_at'], name='notification_undelivered',
+                condition=models.Q(delivered_at__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Notification for {self.recipient.username}: {self.message[:50]}..."
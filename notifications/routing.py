@@ -1,7 +1,8 @@
-
 from django.urls import re_path
 from .consumers import NotificationConsumer
 
 websocket_urlpatterns = [
+    re_path(r"^ws/notifications/$", NotificationConsumer.as_asgi()),
+    # Legacy route; the id must match the authenticated user.
     re_path(r"^ws/notifications/(?P<user_id>\d+)/$", NotificationConsumer.as_asgi()),
 ]
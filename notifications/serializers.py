@@ -5,5 +5,5 @@ from .models import Notification
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'message', 'is_read', 'created_at']
+        fields = ['id', 'kind', 'actor', 'actor_count', 'message', 'payload', 'is_read', 'created_at']
         read_only_fields = ['id', 'created_at']
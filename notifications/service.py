@@ -0,0 +1,146 @@
+"""
+Creating and delivering notifications.
+
+`notify()` stores one notification per recipient in a single bulk INSERT and,
+once the transaction commits, queues their delivery to the recipients'
+notification websockets (see notifications.tasks), so callers never wait on
+the channel layer. A notification stays undelivered until a socket has sent
+it; `NotificationConsumer` replays undelivered ones when the recipient
+connects.
+
+Notifications given a `group_key` are coalesced: within the kind's window in
+NOTIFICATION_COALESCE_WINDOWS, a new one updates the recipient's unread
+notification of the same kind and group instead of adding a row ("Alice and 4
+others liked your post"). Pushes of a coalesced notification are held back
+for NOTIFICATION_PUSH_INTERVAL seconds so a burst reaches the socket as one
+frame carrying the final state.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from .models import Notification, FOLLOW, LIKE, COMMENT
+from .tasks import deliver
+from . import unread
+
+# Text of a notification coalesced from several actors
+COALESCED_MESSAGES = {
+    FOLLOW: "{actor} and {others} started following you!",
+    LIKE: "{actor} and {others} liked your post",
+    COMMENT: "{actor} and {others} commented on your post",
+}
+
+
+def _push_pending_key(notification_id):
+    return f"notifications:push:{notification_id}"
+
+
+def coalesced_message(kind, actor_name, actor_count, message):
+    template = COALESCED_MESSAGES.get(kind)
+    if template is None or actor_count < 2:
+        return message
+    others = actor_count - 1
+    return template.format(actor=actor_name, others=f"{others} other{'s' if others > 1 else ''}")
+
+
+def _coalesce(recipient_ids, kind, message, actor, payload, group_key, window):
+    """
+    Fold the notification into the open groups of the recipients that have
+    one. Returns the updated notifications.
+    """
+    now = timezone.now()
+    groups = {}
+    candidates = Notification.objects.select_for_update().filter(
+        recipient_id__in=recipient_ids, kind=kind, group_key=group_key,
+        is_read=False, created_at__gte=now - window,
+    ).order_by('-created_at')
+    for notification in candidates:
+        groups.setdefault(notification.recipient_id, notification)
+
+    for notification in groups.values():
+        if not notification.actor_ids and notification.actor_id:
+            # Grouped before actors were tracked
+            notification.actor_ids = [notification.actor_id]
+        # A repeat by an earlier actor (e.g. like, unlike, like) is not another actor
+        if actor is None:
+            notification.actor_count += 1
+        elif actor.id not in notification.actor_ids:
+            notification.actor_ids.append(actor.id)
+            notification.actor_count += 1
+        notification.actor_id = actor.id if actor else None
+        notification.message = coalesced_message(
+            kind, actor.full_name if actor else '', notification.actor_count, message
+        )
+        notification.payload = payload or {}
+        notification.created_at = now
+        notification.delivered_at = None
+    Notification.objects.bulk_update(
+        groups.values(), ['actor_count', 'actor_ids', 'actor', 'message', 'payload', 'created_at', 'delivered_at'],
+    )
+    return list(groups.values())
+
+
+def _schedule_push(notification_ids, coalesced_ids):
+    if notification_ids:
+        deliver.delay(notification_ids)
+    if coalesced_ids:
+        # One held-back push per group and interval; later updates ride along
+        redis = get_redis_connection("default")
+        interval = settings.NOTIFICATION_PUSH_INTERVAL
+        due = [
+            notification_id for notification_id in coalesced_ids
+            if redis.set(_push_pending_key(notification_id), 1, nx=True, ex=interval)
+        ]
+        if due:
+            deliver.apply_async((due,), countdown=interval)
+
+
+def notify(recipient_ids, kind, message, actor=None, payload=None, group_key=None):
+    """
+    Notify each user in `recipient_ids`, skipping the actor themselves.
+
+    Args:
+        recipient_ids (iterable): Ids of the users to notify.
+        kind (str): One of the kinds in notifications.models.
+        message (str): Text shown to the user.
+        actor (CustomUser, optional): The user who caused the notification.
+        payload (dict, optional): JSON serializable ids the client links to.
+        group_key (str, optional): Coalesce with unread notifications of the
+            same kind and group key within the kind's window.
+
+    Returns:
+        list: The created and the coalesced notifications.
+    """
+    actor_id = actor.id if actor else None
+    recipient_ids = list(dict.fromkeys(
+        int(recipient_id) for recipient_id in recipient_ids if recipient_id != actor_id
+    ))
+    if not recipient_ids:
+        return []
+
+    window = settings.NOTIFICATION_COALESCE_WINDOWS.get(kind) if group_key else None
+    with transaction.atomic():
+        coalesced = []
+        if window:
+            coalesced = _coalesce(
+                recipient_ids, kind, message, actor, payload, group_key, timedelta(seconds=window)
+            )
+        grouped = {notification.recipient_id for notification in coalesced}
+
+        created = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=recipient_id, actor_id=actor_id, actor_ids=[actor_id] if actor_id else [],
+                kind=kind, message=message, payload=payload or {}, group_key=group_key or '',
+            )
+            for recipient_id in recipient_ids if recipient_id not in grouped
+        ], batch_size=settings.NOTIFICATION_BATCH_SIZE)
+
+    created_recipients = [notification.recipient_id for notification in created]
+    created_ids = [notification.pk for notification in created]
+    coalesced_ids = [notification.pk for notification in coalesced]
+    # Coalesced notifications were unread already
+    transaction.on_commit(lambda: unread.adjust(created_recipients, 1), robust=True)
+    # Undelivered notifications are replayed on connect, so a failed push is not fatal
+    transaction.on_commit(lambda: _schedule_push(created_ids, coalesced_ids), robust=True)
+    return created + coalesced
@@ -0,0 +1,54 @@
+import asyncio
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from zephyr.tasks import task
+from user_authentication.models import CustomUser
+from .models import Notification, MESSAGE
+from .serializers import NotificationSerializer
+
+
+def group_name(user_id):
+    return f"notifications_{user_id}"
+
+
+def notification_event(notification):
+    return {
+        "type": "send_notification",
+        "notification": dict(NotificationSerializer(notification).data),
+    }
+
+
+async def _publish(events):
+    channel_layer = get_channel_layer()
+    await asyncio.gather(*(
+        channel_layer.group_send(group_name(recipient_id), event)
+        for recipient_id, event in events
+    ))
+
+
+@task(max_retries=3)
+def deliver(notification_ids):
+    """
+    Push notifications to the websockets of their recipients.
+    """
+    notifications = Notification.objects.filter(id__in=notification_ids, delivered_at__isnull=True)
+    events = [(notification.recipient_id, notification_event(notification)) for notification in notifications]
+    if events:
+        async_to_sync(_publish)(events)
+
+
+@task(max_retries=3)
+def notify_offline_message(sender_id, receiver_id, conversation_id, message_id):
+    """
+    Notify the receiver of a chat message who had no chat socket open. Sends
+    of one conversation coalesce into a single notification.
+    """
+    # notifications.service queues deliveries from this module
+    from .service import notify
+
+    sender = CustomUser.objects.only('full_name').get(pk=sender_id)
+    notify(
+        [receiver_id], MESSAGE, f"{sender.full_name} sent you a message", actor=sender,
+        payload={'conversation_id': conversation_id, 'message_id': message_id},
+        group_key=f'conversation:{conversation_id}',
+    )
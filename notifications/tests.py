@@ -1,3 +1,120 @@
+from unittest import mock
+import fakeredis
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
+from user_authentication.models import CustomUser
+from .models import Notification, LIKE
+from .service import notify
+from . import unread
 
-# Create your tests here.
+
+class UnreadCountTests(TestCase):
+    """
+    Cached unread counts must never miss an adjustment made while a miss is
+    being filled from the database.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            username='reader', email='reader@example.com', full_name='Reader', role='investor',
+        )
+        Notification.objects.bulk_create([
+            Notification(recipient=cls.user, message=f'notification {index}', is_read=index == 0)
+            for index in range(4)
+        ])
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(unread, 'get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_miss_is_filled_from_the_database(self):
+        self.assertEqual(unread.unread_count(self.user.id), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.unread_count(self.user.id), 3)
+
+    def test_adjust_changes_cached_counts_only(self):
+        unread.adjust([self.user.id], 1)
+        self.assertIsNone(self.redis.zscore(unread._key(self.user.id), unread.COUNT))
+
+        unread.unread_count(self.user.id)
+        unread.adjust([self.user.id], 2)
+        unread.adjust([self.user.id], -1)
+        self.assertEqual(unread.unread_count(self.user.id), 4)
+
+    def test_adjustment_while_counting_drops_the_fill(self):
+        count = Notification.objects.filter(recipient=self.user, is_read=False).count
+
+        def count_then_adjust():
+            # A notification lands between the COUNT and the cache write
+            result = count()
+            Notification.objects.create(recipient=self.user, message='late')
+            unread.adjust([self.user.id], 1)
+            return result
+
+        with mock.patch.object(Notification.objects, 'filter') as filter:
+            filter.return_value.count.side_effect = count_then_adjust
+            self.assertEqual(unread.unread_count(self.user.id), 3)
+        self.assertIsNone(self.redis.zscore(unread._key(self.user.id), unread.COUNT))
+        self.assertEqual(unread.unread_count(self.user.id), 4)
+
+    def test_invalidate_drops_the_count(self):
+        unread.unread_count(self.user.id)
+        Notification.objects.filter(recipient=self.user).update(is_read=True)
+        unread.invalidate(self.user.id)
+        self.assertEqual(unread.unread_count(self.user.id), 0)
+
+
+class CoalesceTests(TestCase):
+    """
+    Notifications with a group key fold into the recipient's open group,
+    counting each actor once.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.alice, cls.bob = [
+            CustomUser.objects.create(
+                username=name.lower(), email=f'{name.lower()}@example.com', full_name=name, role='investor',
+            )
+            for name in ('Author', 'Alice', 'Bob')
+        ]
+
+    def like(self, actor, group_key='post:1'):
+        return notify([self.author.id], LIKE, f"{actor.full_name} liked your post", actor=actor, group_key=group_key)
+
+    def test_actors_are_counted_once(self):
+        self.like(self.alice)
+        self.like(self.bob)
+        self.like(self.alice)
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_ids, [self.alice.id, self.bob.id])
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.actor_id, self.alice.id)
+        self.assertEqual(notification.message, "Alice and 1 other liked your post")
+
+    def test_group_from_before_actor_tracking(self):
+        Notification.objects.create(
+            recipient=self.author, actor=self.alice, kind=LIKE, message="Alice liked your post", group_key='post:1',
+        )
+        self.like(self.alice)
+        self.like(self.bob)
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_ids, [self.alice.id, self.bob.id])
+        self.assertEqual(notification.actor_count, 2)
+
+    def test_read_stale_and_other_groups_are_not_coalesced(self):
+        read = self.like(self.alice)[0]
+        Notification.objects.filter(pk=read.pk).update(is_read=True)
+        stale = self.like(self.alice)[0]
+        Notification.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(days=1))
+        self.like(self.bob)
+        self.like(self.bob, group_key='post:2')
+
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 4)
+        self.assertFalse(Notification.objects.filter(actor_count__gt=1).exists())
@@ -0,0 +1,72 @@
+"""
+Cached unread notification counts.
+
+Each user's count is the `count` member of a small Redis sorted set,
+`notifications:unread:{user id}`. `ZADD XX INCR` adjusts only counts that are
+cached, and every adjustment also bumps the set's `version` member. A miss is
+filled from the database with one COUNT over the partial unread index, under
+WATCH: if an adjustment lands while counting, the fill is dropped and the next
+read counts again, so a cached count never misses a change. Keys expire after
+NOTIFICATION_UNREAD_TTL seconds without an adjustment as a backstop.
+"""
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import WatchError
+from .models import Notification
+
+COUNT = 'count'
+VERSION = 'version'
+
+
+def _key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def unread_count(user_id):
+    redis = _redis()
+    key = _key(user_id)
+    count = redis.zscore(key, COUNT)
+    if count is not None:
+        return max(int(count), 0)
+    with redis.pipeline() as pipeline:
+        pipeline.watch(key)
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        pipeline.multi()
+        pipeline.zadd(key, {COUNT: count}, nx=True)
+        pipeline.expire(key, settings.NOTIFICATION_UNREAD_TTL)
+        try:
+            pipeline.execute()
+        except WatchError:
+            # Adjusted while counting; left for the next read to count
+            pass
+    return count
+
+
+def _touch(pipeline, key):
+    # Fails a fill that is counting concurrently
+    pipeline.zincrby(key, 1, VERSION)
+    pipeline.expire(key, settings.NOTIFICATION_UNREAD_TTL)
+
+
+def adjust(user_ids, delta):
+    """
+    Add `delta` to the cached counts of `user_ids`; users not cached are skipped.
+    """
+    pipeline = _redis().pipeline(transaction=False)
+    for user_id in user_ids:
+        key = _key(user_id)
+        pipeline.zadd(key, {COUNT: delta}, xx=True, incr=True)
+        _touch(pipeline, key)
+    pipeline.execute()
+
+
+def invalidate(user_id):
+    key = _key(user_id)
+    pipeline = _redis().pipeline(transaction=False)
+    pipeline.zrem(key, COUNT)
+    _touch(pipeline, key)
+    pipeline.execute()
@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import NotificationListView
+from .views import NotificationListView, UnreadNotificationCountView, MarkNotificationsReadView
 
 urlpatterns = [
     path('notifications/', NotificationListView.as_view(), name='notification-list'),
+    path('notifications/unread-count/', UnreadNotificationCountView.as_view(), name='notification-unread-count'),
+    path('notifications/mark-read/', MarkNotificationsReadView.as_view(), name='notification-mark-read'),
 ]
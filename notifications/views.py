@@ -1,13 +1,71 @@
-from rest_framework import generics
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import Notification
 from .serializers import NotificationSerializer
+from . import unread
+
+
+class NotificationCursorPagination(CursorPagination):
+    """
+    Newest first on (created_at, id), an index range scan on
+    (recipient, created_at, id) per page.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
 
 
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NotificationCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Notification.objects.filter(recipient=user).order_by('-created_at')[:7]
\ No newline at end of file
+        return Notification.objects.filter(recipient=user)
+
+
+class UnreadNotificationCountView(APIView):
+    """
+    Number of unread notifications of the authenticated user, from the cached counter.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_count": unread.unread_count(request.user.id)}, status=status.HTTP_200_OK)
+
+
+class MarkNotificationsReadView(APIView):
+    """
+    Mark notifications of the authenticated user as read in one UPDATE.
+
+    Body:
+        - ids (list of int, optional): The notifications to mark.
+        - all (bool, optional): Mark every unread notification instead.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        notifications = Notification.objects.filter(recipient=request.user, is_read=False)
+        if not request.data.get('all'):
+            ids = request.data.get('ids')
+            if not isinstance(ids, list):
+                raise ValidationError({"ids": "A list of notification ids or \"all\": true is required."})
+            try:
+                ids = [int(notification_id) for notification_id in ids]
+            except (TypeError, ValueError):
+                raise ValidationError({"ids": "Notification ids must be integers."})
+            notifications = notifications.filter(id__in=ids)
+
+        updated = notifications.update(is_read=True)
+        if updated:
+            unread.adjust([request.user.id], -updated)
+        return Response({
+            "updated": updated,
+            "unread_count": unread.unread_count(request.user.id),
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,25 @@
+import signal
+import socket
+from django.core.management.base import BaseCommand
+from zephyr.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = "Run background tasks (emails, image variants) queued on Redis."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer', default=socket.gethostname(),
+            help="Consumer name; keep it stable across restarts so unfinished jobs are run again.",
+        )
+        parser.add_argument('--batch-size', type=int, default=10)
+
+    def handle(self, *args, **options):
+        worker = Worker(options['consumer'], batch_size=options['batch_size'])
+        # Finish the running job before exiting on SIGTERM
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        self.stdout.write(f"Running tasks as consumer '{options['consumer']}'")
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
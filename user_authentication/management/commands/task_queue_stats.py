@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from zephyr import tasks
+
+
+class Command(BaseCommand):
+    help = "Show background task queue depths, outcomes and queue wait / run time percentiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-dead', action='store_true',
+            help="Queue the dead-lettered jobs again before reporting.",
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_dead']:
+            self.stdout.write(f"Re-queued {tasks.retry_dead()} dead-lettered jobs.")
+
+        stats = tasks.stats()
+        self.stdout.write(f"queued={stats['queued']} delayed={stats['delayed']} dead={stats['dead']}")
+        for name, task_stats in stats['tasks'].items():
+            counts = ' '.join(
+                f"{outcome}={task_stats.get(outcome, 0)}"
+                for outcome in (tasks.SUCCEEDED, tasks.RETRIED, tasks.DEAD, tasks.EXPIRED)
+            )
+            self.stdout.write(f"{name}: {counts}")
+            for metric in ('wait_ms', 'run_ms'):
+                latency = task_stats[metric]
+                if latency:
+                    self.stdout.write(
+                        f"  {metric}: p50={latency['p50']:.1f} p95={latency['p95']:.1f} max={latency['max']:.1f}"
+                    )
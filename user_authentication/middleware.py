@@ -1,5 +1,14 @@
 # your_app/middleware.py
+from urllib.parse import parse_qs
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
 from django.http import JsonResponse
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken
+
+# Websocket subprotocol announcing that the next offered subprotocol is an access token.
+JWT_SUBPROTOCOL = 'jwt'
 
 class CheckUserStatusMiddleware:
     def __init__(self, get_response):
@@ -19,3 +28,42 @@ class CheckUserStatusMiddleware:
                     status=403
                 )
         return response
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate websocket connections with a SimpleJWT access token.
+
+    The token is taken from the `jwt` subprotocol (`new WebSocket(url, ['jwt', token])`)
+    or, failing that, from the `token` query parameter. It is only validated, never
+    looked up: `scope['user']` becomes a `TokenUser` backed by the token's claims
+    (`user_id`, `full_name`, `role`, ...), or `AnonymousUser` if the token is missing,
+    invalid, expired or belongs to an inactive account.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        raw_token, subprotocol = self.get_raw_token(scope)
+        scope['user'] = self.get_user(raw_token)
+        scope['auth_subprotocol'] = subprotocol
+        return await super().__call__(scope, receive, send)
+
+    def get_raw_token(self, scope):
+        subprotocols = scope.get('subprotocols') or []
+        if JWT_SUBPROTOCOL in subprotocols:
+            index = subprotocols.index(JWT_SUBPROTOCOL)
+            if index + 1 < len(subprotocols):
+                return subprotocols[index + 1], JWT_SUBPROTOCOL
+        query = parse_qs(scope.get('query_string', b'').decode())
+        return (query.get('token') or [None])[0], None
+
+    def get_user(self, raw_token):
+        if not raw_token:
+            return AnonymousUser()
+        try:
+            token = AccessToken(raw_token)
+        except TokenError:
+            return AnonymousUser()
+        if not token.get('is_active', True):
+            return AnonymousUser()
+        return TokenUser(token)
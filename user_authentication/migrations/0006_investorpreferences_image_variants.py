@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_authentication', '0005_alter_industry_name_alter_location_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investorpreferences',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 class Location(models.Model):
     """
@@ -29,6 +31,8 @@ class InvestorPreferences(models.Model):
     preferred_industries = models.ManyToManyField(Industry, blank=True)
     description = models.TextField(blank=True, null=True)
     user = models.OneToOneField('CustomUser', on_delete=models.CASCADE, related_name='investor_preferences')
+    # Storage names of the resized WebP copies of the images (see zephyr.images)
+    image_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"Preferences for {self.user.email}"
@@ -52,6 +56,16 @@ class CustomUser(AbstractUser):
     full_name = models.CharField(max_length=255)
     email = models.EmailField(max_length=300, unique=True)
     status = models.BooleanField(default=True)
+    # Denormalized search columns, kept up to date by user_management.search
+    search_document = SearchVectorField(null=True, editable=False)
+    search_text = models.TextField(blank=True, default='', editable=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            GinIndex(fields=['search_document'], name='user_search_document'),
+            # Substring (LIKE '%...%') matches on names, email and phone number
+            GinIndex(fields=['search_text'], opclasses=['gin_trgm_ops'], name='user_search_text_trgm'),
+        ]
 
     def __str__(self) -> str:
         """ representation of the CustomUser instance """
@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from zephyr import images
+from .models import InvestorPreferences
+
+
+@receiver(post_save, sender=InvestorPreferences)
+def generate_image_variants(sender, instance, **kwargs):
+    images.schedule(instance, ['avatar_image', 'cover_image'])
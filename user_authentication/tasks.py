@@ -0,0 +1,72 @@
+import json
+import logging
+from decouple import config
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage, send_mail
+from django_redis import get_redis_connection
+from zephyr.tasks import task
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+# Secrets are never task arguments: jobs are kept in Redis, and failed ones
+# are dead-lettered with their arguments. The tasks read them at send time.
+
+
+# The OTP is only valid for a minute; a later delivery is useless.
+@task(max_retries=3, expires=60)
+def send_otp_email(email):
+    """
+    Sends the pending registration OTP to the provided email address.
+
+    Args:
+        email (str): The recipient's email address, which keys the
+            registration data (with the OTP) cached in Redis.
+    """
+    data = get_redis_connection("default").get(email)
+    if not data:
+        logger.info(f"No pending registration for {email}, OTP not sent")
+        return
+    otp = json.loads(data)["otp"]
+    subject = "Your OTP Code"
+    message = f"Your OTP code is {otp}. It is valid for the next 1 minutes."
+    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
+    logger.info(f"OTP sent to {email}")
+
+
+@task
+def send_password_reset_email(user_id):
+    """
+    Creates a password reset token for the user and sends the reset link to
+    their email address as HTML.
+
+    Args:
+        user_id (int): The user requesting the reset.
+    """
+    user = CustomUser.objects.get(pk=user_id)
+    token = default_token_generator.make_token(user)
+    reset_link = config('BASE_URL') + f"change/password/{token}/"
+    get_redis_connection("default").setex(f"password_reset_token:{token}", 86400, user.id)
+    email = user.email
+
+    html_content = f"""
+    <div style="font-family: Arial, sans-serif; color: #333;">
+        <h2 style="color: #3B81F6;">Reset Your Password</h2>
+        <p>Hello,</p>
+        <p>We received a request to reset your password. Click the button below to set a new password for your account:</p>
+        <p>This will be Valid for only 24 Hours</p>
+        <a href="{reset_link}" style="display: inline-block; padding: 10px 20px; margin-top: 20px; color: white; background-color: #3B81F6; text-decoration: none; border-radius: 5px;">Reset Password</a>
+        <p style="margin-top: 20px; font-size: 12px; color: #888;">If you did not request this, you can safely ignore this email.</p>
+        <p>Thank you,<br>The Zephyr Team</p>
+    </div>
+    """
+
+    email_message = EmailMessage(
+        subject='Password Reset Request',
+        body=html_content,
+        from_email='noreply@yourdomain.com',
+        to=[email],
+    )
+    email_message.content_subtype = "html"  # Specify HTML content type
+    email_message.send()
@@ -3,7 +3,6 @@ from .serializer import *
 from rest_framework.views import APIView
 from django_redis import get_redis_connection
 import json , random
-from django.core.mail import send_mail
 from django.conf import settings
 from rest_framework.response import Response
 from rest_framework import status, generics
@@ -16,10 +15,9 @@ from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
-from decouple import config
-from django.core.mail import EmailMessage
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.hashers import make_password
+from .tasks import send_otp_email, send_password_reset_email
 
 
 
@@ -84,7 +82,7 @@ class UserRegistrationView(APIView):
                 if validated_data.get("email"):
                     try:
                         email_view = EmailSendingView()
-                        email_view.send_otp(validated_data.get("email"), otp)
+                        email_view.send_otp(validated_data.get("email"))
                     except Exception as e:
                         return Response(
                             {"error": "Failed to send OTP email. Please try again."},
@@ -114,23 +112,19 @@ class UserRegistrationView(APIView):
 class EmailSendingView:
     """
     Handles sending emails, such as sending an OTP to the user's email.
+
+    Emails are queued for the task worker so requests do not wait on SMTP.
     """
 
-    def send_otp(self, email, otp):
+    def send_otp(self, email):
         """
-        Sends the OTP to the provided email address.
+        Queues the OTP email to the provided email address. The task reads the
+        OTP from the registration data cached under the email.
 
         Args:
             email (str): The recipient's email address.
-            otp (int): The OTP to be sent.
         """
-        subject = "Your OTP Code"
-        message = f"Your OTP code is {otp}. It is valid for the next 1 minutes."
-        email_from = settings.DEFAULT_FROM_EMAIL
-        recipient_list = [email]
-
-        send_mail(subject, message, email_from, recipient_list)
-        print(f"OTP sent to {email}")
+        send_otp_email.delay(email)
 
 
 class OtpVerificationView(APIView):
@@ -287,7 +281,7 @@ class ResendOtpView(APIView):
             try:
                 self.redis_connection.setex(email, 3600, user_data_json)
                 email_view = EmailSendingView()
-                email_view.send_otp(email, new_otp)
+                email_view.send_otp(email)
 
                 return Response(
                     {"message": "New OTP has been sent to your email."},
@@ -452,41 +446,14 @@ class PasswordResetRequestView(generics.GenericAPIView):
     serializer_class = PasswordResetRequestSerializer
 
     def post(self, request):
-        redis_connection = get_redis_connection("default")
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         email = serializer.validated_data['email']
         user = CustomUser.objects.get(email=email)
-        token = default_token_generator.make_token(user)
-        reset_link = config('BASE_URL') + f"change/password/{token}/"
-        print(reset_link)
-        redis_connection.setex(f"password_reset_token:{token}", 86400, user.id)
-        
-        # HTML content for the email
-        html_content = f"""
-        <div style="font-family: Arial, sans-serif; color: #333;">
-            <h2 style="color: #3B81F6;">Reset Your Password</h2>
-            <p>Hello,</p>
-            <p>We received a request to reset your password. Click the button below to set a new password for your account:</p>
-            <p>This will be Valid for only 24 Hours</p>
-            <a href="{reset_link}" style="display: inline-block; padding: 10px 20px; margin-top: 20px; color: white; background-color: #3B81F6; text-decoration: none; border-radius: 5px;">Reset Password</a>
-            <p style="margin-top: 20px; font-size: 12px; color: #888;">If you did not request this, you can safely ignore this email.</p>
-            <p>Thank you,<br>The Zephyr Team</p>
-        </div>
-        """
-        
-        # Create an email message with HTML content
-        email_message = EmailMessage(
-            subject='Password Reset Request',
-            body=html_content,
-            from_email='noreply@yourdomain.com',
-            to=[email],
-        )
-        email_message.content_subtype = "html"  # Specify HTML content type
-        
-        # Send the email
-        email_message.send()
+
+        # The task worker creates the reset token and delivers the link
+        send_password_reset_email.delay(user.id)
 
         return Response({"detail": "Password reset email has been sent."}, status=status.HTTP_200_OK)
 
@@ -0,0 +1,161 @@
+"""
+Facet counts of the business discovery search.
+
+`counts(queryset)` counts the filtered businesses per industry, location,
+company stage and seeking amount bucket, plus the total, in one pass over
+the filtered rows: the ORM builds the filtered query and PostgreSQL groups it
+by GROUPING SETS. Counts are cached for DISCOVERY_FACETS_TTL seconds under a
+key built from the normalized filters, and all of them are dropped when a
+business profile, industry or location changes (see user_management.signals)
+by bumping the version that is part of every key.
+"""
+import hashlib
+import json
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+from django_filters.constants import EMPTY_VALUES
+from django_redis import get_redis_connection
+from user_authentication.models import Industry, Location
+
+CACHE_KEY = 'discovery:facets'
+VERSION_KEY = 'discovery:facets:version'
+
+# Lower bounds of the seeking amount buckets; the last one is open-ended
+AMOUNT_BUCKETS = [Decimal(0), Decimal(100000), Decimal(500000), Decimal(1000000), Decimal(5000000)]
+
+# Values listed per facet, most frequent first
+FACET_LIMIT = 20
+
+# Columns of the filtered query counted per value
+FACET_COLUMNS = ['industry_id', 'location_id', 'company_stage', 'amount_bucket']
+
+
+def _amount_bucket():
+    return Case(
+        *(When(seeking_amount__lt=upper, then=Value(index)) for index, upper in enumerate(AMOUNT_BUCKETS[1:])),
+        default=Value(len(AMOUNT_BUCKETS) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def _grouped(queryset):
+    """
+    Rows of (facet column, value, count); the total has no column.
+    """
+    filtered = queryset.order_by().annotate(amount_bucket=_amount_bucket()).values(*FACET_COLUMNS)
+    sql, params = filtered.query.sql_with_params()
+    columns = FACET_COLUMNS
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(f'GROUPING({column})' for column in columns)}, {', '.join(columns)}, COUNT(*) "
+            f"FROM ({sql}) AS filtered "
+            f"GROUP BY GROUPING SETS ({', '.join(f'({column})' for column in columns)}, ())",
+            params,
+        )
+        for row in cursor.fetchall():
+            grouping, values, count = row[:len(columns)], row[len(columns):-1], row[-1]
+            # GROUPING() is 0 for the column a grouping set is grouped by
+            column = next((index for index, flag in enumerate(grouping) if not flag), None)
+            if column is None:
+                yield None, None, count
+            else:
+                yield columns[column], values[column], count
+
+
+def _amount_range(index):
+    upper = AMOUNT_BUCKETS[index + 1] if index + 1 < len(AMOUNT_BUCKETS) else None
+    return {'min': str(AMOUNT_BUCKETS[index]), 'max': str(upper) if upper is not None else None}
+
+
+def compute(queryset):
+    """
+    Total and per-facet counts of `queryset`, a BusinessPreferences queryset.
+    """
+    total = 0
+    grouped = {column: [] for column in FACET_COLUMNS}
+    for column, value, count in _grouped(queryset):
+        if column is None:
+            total = count
+        elif value is not None:
+            grouped[column].append((value, count))
+    for values in grouped.values():
+        values.sort(key=lambda item: -item[1])
+        del values[FACET_LIMIT:]
+
+    names = {
+        'industry_id': dict(Industry.objects.filter(pk__in=[v for v, _ in grouped['industry_id']]).values_list('pk', 'name')),
+        'location_id': dict(Location.objects.filter(pk__in=[v for v, _ in grouped['location_id']]).values_list('pk', 'name')),
+    }
+    facets = {
+        'industries': [{'id': value, 'name': names['industry_id'].get(value), 'count': count} for value, count in grouped['industry_id']],
+        'locations': [{'id': value, 'name': names['location_id'].get(value), 'count': count} for value, count in grouped['location_id']],
+        'stages': [{'name': value, 'count': count} for value, count in grouped['company_stage']],
+        'amounts': [
+            {**_amount_range(index), 'count': count}
+            for index, count in sorted(grouped['amount_bucket'])
+        ],
+    }
+    return {'total': total, 'facets': facets}
+
+
+def _cache_key(version, filters):
+    """
+    Key of the counts for `filters`, the cleaned filter values: empty ones
+    are dropped and lists sorted, so equivalent queries share an entry.
+    """
+    normalized = {
+        name: sorted(str(item) for item in value) if isinstance(value, (list, tuple)) else str(value)
+        for name, value in filters.items() if value not in EMPTY_VALUES
+    }
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f"{CACHE_KEY}:{version}:{digest}"
+
+
+def counts(queryset, filters):
+    """
+    Facet counts of `queryset`, the businesses matching `filters`, from the
+    cache if counted recently.
+    """
+    redis = get_redis_connection("default")
+    version = redis.get(VERSION_KEY)
+    key = _cache_key(version.decode() if version else 0, filters)
+    payload = redis.get(key)
+    if payload:
+        return json.loads(payload)
+    result = compute(queryset)
+    redis.set(key, json.dumps(result), ex=settings.DISCOVERY_FACETS_TTL)
+    return result
+
+
+def without(result, queryset, user_id):
+    """
+    `result`, the counts of `queryset`, less the business of `user_id` if
+    `queryset` holds it. Lets users share the cached counts of a listing
+    that leaves out their own business.
+    """
+    row = queryset.filter(user_id=user_id).order_by().annotate(amount_bucket=_amount_bucket()) \
+        .values(*FACET_COLUMNS).first()
+    if row is None:
+        return result
+    facets = result['facets']
+    matches = {
+        'industries': lambda entry: entry['id'] == row['industry_id'],
+        'locations': lambda entry: entry['id'] == row['location_id'],
+        'stages': lambda entry: entry['name'] == row['company_stage'],
+        'amounts': lambda entry: entry['min'] == _amount_range(row['amount_bucket'])['min'],
+    }
+    for name, match in matches.items():
+        for entry in facets[name]:
+            if match(entry):
+                entry['count'] -= 1
+        facets[name] = [entry for entry in facets[name] if entry['count'] > 0]
+        if name != 'amounts':
+            facets[name].sort(key=lambda entry: -entry['count'])
+    result['total'] -= 1
+    return result
+
+
+def invalidate():
+    get_redis_connection("default").incr(VERSION_KEY)
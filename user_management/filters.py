@@ -1,11 +1,56 @@
 import django_filters
+from django_filters.constants import EMPTY_VALUES
 from user_authentication.models import CustomUser
+from .models import BusinessPreferences
+from .search import MIN_SUBSTRING_LENGTH
+
+
+class IndexedContainsFilter(django_filters.CharFilter):
+    """
+    Case-insensitive `contains` on a field that is part of CustomUser.search_text:
+    the trigram index on search_text narrows the rows down, the field itself
+    is then checked.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        if len(value) >= MIN_SUBSTRING_LENGTH:
+            qs = qs.filter(search_text__contains=value.lower())
+        return qs.filter(**{f'{self.field_name}__icontains': value})
+
 
 class CustomUserFilter(django_filters.FilterSet):
-    full_name = django_filters.CharFilter(field_name='full_name', lookup_expr='icontains')
-    email = django_filters.CharFilter(field_name='email', lookup_expr='icontains')
-    phone_number = django_filters.CharFilter(field_name='phone_number', lookup_expr='icontains')
+    full_name = IndexedContainsFilter(field_name='full_name')
+    email = IndexedContainsFilter(field_name='email')
+    phone_number = IndexedContainsFilter(field_name='phone_number')
 
     class Meta:
         model = CustomUser
         fields = ['full_name', 'email', 'phone_number']
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    pass
+
+
+class BusinessDiscoveryFilter(django_filters.FilterSet):
+    """
+    Filters of the business discovery search; lists are comma separated,
+    e.g. `?industry=1,4&min_amount=100000`.
+    """
+    industry = NumberInFilter(field_name='industry_id')
+    location = NumberInFilter(field_name='location_id')
+    stage = CharInFilter(field_name='company_stage')
+    min_amount = django_filters.NumberFilter(field_name='seeking_amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='seeking_amount', lookup_expr='lt')
+    min_revenue = django_filters.NumberFilter(field_name='annual_revenue', lookup_expr='gte')
+    max_revenue = django_filters.NumberFilter(field_name='annual_revenue', lookup_expr='lt')
+
+    class Meta:
+        model = BusinessPreferences
+        fields = ['industry', 'location', 'stage', 'min_amount', 'max_amount', 'min_revenue', 'max_revenue']
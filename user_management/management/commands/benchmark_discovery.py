@@ -0,0 +1,149 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.http import QueryDict
+from faker import Faker
+from user_authentication.models import CustomUser, Industry, Location
+from user_management import facets
+from user_management.filters import BusinessDiscoveryFilter
+from user_management.models import BusinessPreferences
+
+USERNAME_PREFIX = 'bench-biz-'
+PAGE_SIZE = 7
+STAGES = ['Idea', 'Pre-seed', 'Seed', 'Series A', 'Series B', 'Growth']
+
+
+def _separate_counts(queryset):
+    # One GROUP BY per facet plus the total, the straightforward way to count facets
+    queryset = queryset.order_by()
+    queryset.count()
+    for column in ('industry_id', 'location_id', 'company_stage'):
+        list(queryset.values(column).annotate(total=Count('pk')).order_by('-total')[:facets.FACET_LIMIT])
+    list(queryset.annotate(amount_bucket=facets._amount_bucket()).values('amount_bucket').annotate(total=Count('pk')))
+
+
+def _percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate fake businesses and time the discovery search with a mix of filters: "
+        "facet counts as separate GROUP BY queries, in one GROUPING SETS pass and from "
+        "the cache, and the first page. Needs PostgreSQL and Redis; run it against a "
+        "scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=500000, help="Businesses to generate.")
+        parser.add_argument('--queries', type=int, default=200, help="Filter combinations to time per variant.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-generate', action='store_true', help="Reuse previously generated businesses.")
+        parser.add_argument('--cleanup', action='store_true', help="Delete the generated businesses and exit.")
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} rows."))
+            return
+
+        fake = Faker()
+        Faker.seed(options['seed'])
+        random.seed(options['seed'])
+        if not options['skip_generate']:
+            self.generate(fake, options['businesses'], options['batch_size'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE "{BusinessPreferences._meta.db_table}"')
+
+        queries = [self.filterset(params) for params in self.params(options['queries'])]
+        total = BusinessPreferences.objects.count()
+        self.stdout.write(f"{total} businesses, {len(queries)} filter combinations, latency in ms:")
+        self.stdout.write(f"{'variant':<24}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}")
+        self.report("facets separate", queries, lambda filterset: _separate_counts(filterset.qs))
+        self.report("facets grouping sets", queries, lambda filterset: facets.compute(filterset.qs))
+        for filterset in queries:
+            facets.counts(filterset.qs, filterset.form.cleaned_data)
+        self.report("facets cached", queries, lambda filterset: facets.counts(filterset.qs, filterset.form.cleaned_data))
+        self.report("first page", queries, lambda filterset: list(filterset.qs[:PAGE_SIZE]))
+
+    def generate(self, fake, businesses, batch_size):
+        industries = [
+            Industry.objects.get_or_create(name=name)[0]
+            for name in ('Fintech', 'Healthcare', 'Energy', 'Retail', 'Logistics', 'Education', 'Gaming',
+                         'Agritech', 'Biotech', 'Real Estate', 'Media', 'Security', 'Travel', 'Food')
+        ]
+        locations = [Location.objects.get_or_create(name=fake.unique.city())[0] for _ in range(60)]
+        start = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).count()
+
+        for offset in range(start, start + businesses, batch_size):
+            count = min(batch_size, start + businesses - offset)
+            with transaction.atomic():
+                created = CustomUser.objects.bulk_create([
+                    CustomUser(
+                        username=f"{USERNAME_PREFIX}{offset + i}",
+                        email=f"biz.{offset + i}@example.com",
+                        phone_number=f"8{offset + i:011d}",
+                        full_name=fake.name(),
+                        role='business',
+                        password='!',
+                    )
+                    for i in range(count)
+                ])
+                BusinessPreferences.objects.bulk_create([
+                    BusinessPreferences(
+                        user=user, company_name=fake.company(), industry=random.choice(industries),
+                        location=random.choice(locations), business_type=fake.bs(),
+                        company_stage=random.choice(STAGES), company_description=fake.paragraph(nb_sentences=3),
+                        seeking_amount=Decimal(random.choice([50, 200, 700, 2000, 8000]) * 1000),
+                        website=fake.url(), product_type='Software',
+                        annual_revenue=Decimal(random.randint(0, 5000) * 1000), employee_count=random.randint(1, 500),
+                    )
+                    for user in created
+                ])
+            self.stdout.write(f"Generated {offset + count - start}/{businesses} businesses")
+
+    def params(self, count):
+        """
+        Filter combinations as the discovery page sends them: mostly one or
+        two filters, some none.
+        """
+        industry_ids = list(Industry.objects.values_list('pk', flat=True))
+        location_ids = list(Location.objects.values_list('pk', flat=True))
+        filters = [
+            lambda: {'industry': ','.join(map(str, random.sample(industry_ids, random.randint(1, 3))))},
+            lambda: {'location': str(random.choice(location_ids))},
+            lambda: {'stage': random.choice(STAGES)},
+            lambda: {'min_amount': str(random.choice(facets.AMOUNT_BUCKETS[1:]))},
+            lambda: {'min_revenue': str(random.randint(0, 4000) * 1000)},
+        ]
+        combinations = []
+        for _ in range(count):
+            params = {}
+            for make in random.sample(filters, random.choice([0, 1, 1, 2, 2, 3])):
+                params.update(make())
+            combinations.append(params)
+        return combinations
+
+    def filterset(self, params):
+        query = QueryDict(mutable=True)
+        query.update(params)
+        filterset = BusinessDiscoveryFilter(query, queryset=BusinessPreferences.objects.filter(user__role='business'))
+        filterset.is_valid()
+        return filterset
+
+    def report(self, name, queries, run):
+        timings = []
+        for filterset in queries:
+            started = time.perf_counter()
+            run(filterset)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"{name:<24}{_percentile(timings, 0.5):>10.1f}{_percentile(timings, 0.95):>10.1f}"
+            f"{_percentile(timings, 0.99):>10.1f}{statistics.mean(timings):>10.1f}"
+        )
@@ -0,0 +1,154 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+from faker import Faker
+from user_authentication.models import CustomUser, Industry, InvestorPreferences, Location
+from user_management.models import BusinessPreferences
+from user_management.search import search, update_documents
+
+USERNAME_PREFIX = 'bench-'
+PAGE_SIZE = 7
+
+
+def _legacy_search(queryset, query, company_name):
+    # The icontains filter the search views used before user_management.search
+    matches = Q(full_name__icontains=query) | Q(email__icontains=query) | Q(phone_number__icontains=query)
+    if company_name:
+        matches |= Q(business_preferences__company_name__icontains=query)
+    return queryset.filter(matches).order_by('full_name')
+
+
+def _percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate fake investors and businesses and compare the latency of the ranked "
+        "search with the previous icontains filters, as the admin search views run them "
+        "(count plus first page). Needs PostgreSQL; run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000, help="Users to generate.")
+        parser.add_argument('--queries', type=int, default=200, help="Search terms to time per variant.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-generate', action='store_true', help="Reuse previously generated users.")
+        parser.add_argument('--cleanup', action='store_true', help="Delete the generated users and exit.")
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} rows."))
+            return
+
+        fake = Faker()
+        Faker.seed(options['seed'])
+        random.seed(options['seed'])
+        if not options['skip_generate']:
+            self.generate(fake, options['users'], options['batch_size'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE "{CustomUser._meta.db_table}"')
+
+        terms = self.terms(fake, options['queries'])
+        variants = {
+            'investors': (CustomUser.objects.filter(role='investor'), False),
+            'businesses': (CustomUser.objects.filter(role='business'), True),
+        }
+        total = CustomUser.objects.count()
+        self.stdout.write(f"{total} users, {len(terms)} terms, latency in ms (count + first page):")
+        self.stdout.write(f"{'variant':<24}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}")
+        for name, (queryset, company_name) in variants.items():
+            self.report(f"{name} icontains", terms, lambda term: _legacy_search(queryset, term, company_name))
+            self.report(f"{name} search", terms, lambda term: search(queryset, term))
+
+    def generate(self, fake, users, batch_size):
+        industries = [
+            Industry.objects.get_or_create(name=name)[0]
+            for name in ('Fintech', 'Healthcare', 'Energy', 'Retail', 'Logistics', 'Education', 'Gaming',
+                         'Agritech', 'Biotech', 'Real Estate', 'Media', 'Security', 'Travel', 'Food')
+        ]
+        locations = [Location.objects.get_or_create(name=fake.unique.city())[0] for _ in range(60)]
+        start = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).count()
+
+        for offset in range(start, start + users, batch_size):
+            count = min(batch_size, start + users - offset)
+            with transaction.atomic():
+                created = CustomUser.objects.bulk_create([
+                    CustomUser(
+                        username=f"{USERNAME_PREFIX}{offset + i}",
+                        email=f"{fake.user_name()}.{offset + i}@example.com",
+                        phone_number=f"9{offset + i:011d}",
+                        full_name=fake.name(),
+                        role='investor' if random.random() < 0.7 else 'business',
+                        password='!',
+                    )
+                    for i in range(count)
+                ])
+                investors = [user for user in created if user.role == 'investor']
+                preferences = InvestorPreferences.objects.bulk_create([
+                    InvestorPreferences(user=user, description=fake.paragraph(nb_sentences=3))
+                    for user in investors
+                ])
+                InvestorPreferences.preferred_industries.through.objects.bulk_create([
+                    InvestorPreferences.preferred_industries.through(investorpreferences=preference, industry=industry)
+                    for preference in preferences for industry in random.sample(industries, random.randint(1, 3))
+                ])
+                InvestorPreferences.preferred_locations.through.objects.bulk_create([
+                    InvestorPreferences.preferred_locations.through(investorpreferences=preference, location=location)
+                    for preference in preferences for location in random.sample(locations, random.randint(1, 2))
+                ])
+                BusinessPreferences.objects.bulk_create([
+                    BusinessPreferences(
+                        user=user, company_name=fake.company(), industry=random.choice(industries),
+                        location=random.choice(locations), business_type=fake.bs(), company_stage='Seed',
+                        company_description=fake.paragraph(nb_sentences=5), seeking_amount=Decimal(100000),
+                        website=fake.url(), product_type='Software', annual_revenue=Decimal(50000),
+                        employee_count=random.randint(1, 500),
+                    )
+                    for user in created if user.role == 'business'
+                ])
+                # bulk_create sends no signals, so the search columns are filled here
+                update_documents([user.pk for user in created])
+            self.stdout.write(f"Generated {offset + count - start}/{users} users")
+
+    def terms(self, fake, count):
+        """
+        A mix of what admins type: whole names, name and email fragments,
+        company words, industries and locations.
+        """
+        generated = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX)
+        bounds = generated.aggregate(first=Min('pk'), last=Max('pk'))
+        picked = random.sample(range(bounds['first'], bounds['last'] + 1), min(count, bounds['last'] - bounds['first'] + 1))
+        samples = list(generated.filter(pk__in=picked).values_list('full_name', 'email'))
+        companies = list(BusinessPreferences.objects.filter(user_id__in=picked).values_list('company_name', flat=True))
+        tags = list(Industry.objects.values_list('name', flat=True)) + list(Location.objects.values_list('name', flat=True))
+        generators = [
+            lambda: random.choice(samples)[0],
+            lambda: random.choice(samples)[0].split()[-1],
+            lambda: random.choice(samples)[0].split()[-1][:4],
+            lambda: random.choice(samples)[1].split('.')[0],
+            lambda: random.choice(companies).split()[0].strip(','),
+            lambda: random.choice(tags),
+            lambda: fake.word(),
+        ]
+        return [random.choice(generators)() for _ in range(count)]
+
+    def report(self, name, terms, build):
+        timings = []
+        for term in terms:
+            started = time.perf_counter()
+            queryset = build(term)
+            queryset.count()
+            list(queryset[:PAGE_SIZE])
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"{name:<24}{_percentile(timings, 0.5):>10.1f}{_percentile(timings, 0.95):>10.1f}"
+            f"{_percentile(timings, 0.99):>10.1f}{statistics.mean(timings):>10.1f}"
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from user_management.matching import compute_all
+
+
+class Command(BaseCommand):
+    help = "Score every investor against every business and store each user's top matches in Redis."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        investors, businesses = compute_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Computed matches for {investors} investors and {businesses} businesses."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from user_management.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's search document and search text."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        processed = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the search index for {processed} users."))
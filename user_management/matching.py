@@ -0,0 +1,244 @@
+"""
+Investor / business matching.
+
+Both sides are encoded over the same features, the industries and locations:
+an investor by their preferred industries and locations, a business by its
+industry and location, each weighted by WEIGHTS and scaled to unit length.
+The match score of a pair is the dot product of their vectors (a weighted
+cosine similarity in [0, 1]), so scoring every investor against every
+business is one matrix product, done in blocks of MATCHING_BATCH_SIZE rows.
+
+The best MATCHING_TOP_N matches of each user with a non-zero score are stored
+in a Redis sorted set per user:
+
+    matching:investor:{id}  -> business user ids
+    matching:business:{id}  -> investor user ids
+
+`compute_all()` (run by `manage.py compute_matches`) scores the world.
+`refresh(side, user_id)`, queued when a profile changes, scores that single
+profile against the other side, stores its list and patches the entries of
+the counterparts whose score with it changed, using the profile's previous
+features kept in `matching:features:{side}:{id}`. A counterpart that loses
+an entry may hold one match less than it could until the next full run.
+Reads never score: a user without stored matches gets the default listing
+while their refresh is queued.
+
+Investors state no preference for a company stage or seeking amount, so
+those business fields do not take part in the score.
+"""
+import json
+import numpy as np
+from django.conf import settings
+from django_redis import get_redis_connection
+from user_authentication.models import InvestorPreferences, Industry, Location
+from .models import BusinessPreferences
+
+INVESTOR = 'investor'
+BUSINESS = 'business'
+COUNTERPART = {INVESTOR: BUSINESS, BUSINESS: INVESTOR}
+NO_MATCHES = ''
+
+# Feature -> weight of a match on it
+WEIGHTS = {
+    'industry': 2.0,
+    'location': 1.0,
+}
+# Feature -> investor preferences many-to-many field
+INVESTOR_FIELDS = {
+    'industry': 'preferred_industries',
+    'location': 'preferred_locations',
+}
+
+
+def _matches_key(side, user_id):
+    return f"matching:{side}:{user_id}"
+
+
+def _features_key(side, user_id):
+    return f"matching:features:{side}:{user_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _investor_profiles(user_ids=None):
+    """
+    {user id: {feature: [ids]}} of active investors with any preference.
+    """
+    profiles = {}
+    for feature, field in INVESTOR_FIELDS.items():
+        pairs = getattr(InvestorPreferences, field).through.objects.filter(
+            investorpreferences__user__role=INVESTOR, investorpreferences__user__status=True,
+        )
+        if user_ids is not None:
+            pairs = pairs.filter(investorpreferences__user_id__in=user_ids)
+        for user_id, value in pairs.values_list('investorpreferences__user_id', f'{feature}_id'):
+            profiles.setdefault(user_id, {name: [] for name in WEIGHTS})[feature].append(value)
+    return profiles
+
+
+def _business_profiles(user_ids=None):
+    """
+    {user id: {feature: [ids]}} of active businesses with an industry or location.
+    """
+    rows = BusinessPreferences.objects.filter(user__role=BUSINESS, user__status=True)
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    profiles = {}
+    for user_id, industry_id, location_id in rows.values_list('user_id', 'industry_id', 'location_id'):
+        features = {'industry': [industry_id] if industry_id else [], 'location': [location_id] if location_id else []}
+        if any(features.values()):
+            profiles[user_id] = features
+    return profiles
+
+
+PROFILES = {INVESTOR: _investor_profiles, BUSINESS: _business_profiles}
+
+
+class Vocabulary:
+    """
+    Column of every (feature, id) in the feature vectors.
+    """
+
+    def __init__(self):
+        self.ids = {
+            'industry': np.fromiter(Industry.objects.order_by('pk').values_list('pk', flat=True), dtype=np.int64),
+            'location': np.fromiter(Location.objects.order_by('pk').values_list('pk', flat=True), dtype=np.int64),
+        }
+        self.offsets = {}
+        self.size = 0
+        for feature in WEIGHTS:
+            self.offsets[feature] = self.size
+            self.size += len(self.ids[feature])
+
+    def encode(self, profiles):
+        """
+        Unit-length weighted feature vectors of `profiles`, one row each.
+        """
+        matrix = np.zeros((len(profiles), self.size), dtype=np.float32)
+        for row, features in enumerate(profiles):
+            for feature, weight in WEIGHTS.items():
+                values = np.asarray(features.get(feature, []), dtype=np.int64)
+                columns = np.searchsorted(self.ids[feature], values)
+                # Ids created after the vocabulary was loaded are ignored
+                known = columns < len(self.ids[feature])
+                known[known] = self.ids[feature][columns[known]] == values[known]
+                matrix[row, self.offsets[feature] + columns[known]] = weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+
+def _load(side, vocabulary, user_ids=None):
+    profiles = PROFILES[side](user_ids)
+    ids = np.fromiter(profiles, dtype=np.int64, count=len(profiles))
+    return ids, vocabulary.encode(list(profiles.values())), profiles
+
+
+def _top(scores, counterpart_ids, n):
+    """
+    Best `n` (counterpart id, score) pairs with a positive score, best first.
+    """
+    n = min(n, len(scores))
+    if not n:
+        return []
+    top = np.argpartition(-scores, n - 1)[:n]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [(counterpart_ids[i], round(float(scores[i]), 6)) for i in top.tolist() if scores[i] > 0]
+
+
+def _store(pipeline, side, user_id, matches):
+    key = _matches_key(side, user_id)
+    pipeline.delete(key)
+    # The placeholder keeps a user without matches from being recomputed on every read
+    pipeline.zadd(key, dict(matches) if matches else {NO_MATCHES: 0})
+    pipeline.expire(key, settings.MATCHING_TTL)
+
+
+def compute_all(batch_size=None):
+    """
+    Score every investor against every business and store both sides' top
+    matches. Returns the number of (investors, businesses) processed.
+    """
+    batch_size = batch_size or settings.MATCHING_BATCH_SIZE
+    top_n = settings.MATCHING_TOP_N
+    vocabulary = Vocabulary()
+    loaded = {side: _load(side, vocabulary) for side in PROFILES}
+
+    redis = _redis()
+    for side, (ids, matrix, profiles) in loaded.items():
+        counterpart_ids, counterpart_matrix, _profiles = loaded[COUNTERPART[side]]
+        counterpart_ids = counterpart_ids.tolist()
+        for start in range(0, len(ids), batch_size):
+            block = matrix[start:start + batch_size] @ counterpart_matrix.T
+            pipeline = redis.pipeline()
+            for row, user_id in enumerate(ids[start:start + batch_size].tolist()):
+                _store(pipeline, side, user_id, _top(block[row], counterpart_ids, top_n))
+                pipeline.set(_features_key(side, user_id), json.dumps(profiles[user_id]))
+            pipeline.execute()
+    return len(loaded[INVESTOR][0]), len(loaded[BUSINESS][0])
+
+
+def refresh(side, user_id):
+    """
+    Re-score one profile against the other side after it changed. Returns
+    its stored matches.
+    """
+    top_n = settings.MATCHING_TOP_N
+    vocabulary = Vocabulary()
+    counterpart = COUNTERPART[side]
+    counterpart_ids, counterpart_matrix, _profiles = _load(counterpart, vocabulary)
+    features = PROFILES[side]([user_id]).get(user_id)
+
+    redis = _redis()
+    previous = redis.get(_features_key(side, user_id))
+    previous = json.loads(previous) if previous else None
+    new_scores = counterpart_matrix @ vocabulary.encode([features or {}])[0]
+    old_scores = counterpart_matrix @ vocabulary.encode([previous or {}])[0]
+
+    # Counterparts whose cached list holds a stale score for this user
+    changed = np.flatnonzero(~np.isclose(new_scores, old_scores))
+    changed_ids = counterpart_ids[changed].tolist()
+    pipeline = redis.pipeline()
+    for changed_id in changed_ids:
+        pipeline.exists(_matches_key(counterpart, changed_id))
+    cached = pipeline.execute()
+
+    matches = _top(new_scores, counterpart_ids.tolist(), top_n) if features else []
+    pipeline = redis.pipeline()
+    for changed_id, index, exists in zip(changed_ids, changed.tolist(), cached):
+        if not exists:
+            # Computed in full on its next read
+            continue
+        key = _matches_key(counterpart, changed_id)
+        if new_scores[index] > 0:
+            pipeline.zadd(key, {user_id: round(float(new_scores[index]), 6)})
+            pipeline.zrem(key, NO_MATCHES)
+            pipeline.zremrangebyrank(key, 0, -(top_n + 1))
+        else:
+            pipeline.zrem(key, user_id)
+    _store(pipeline, side, user_id, matches)
+    if features:
+        pipeline.set(_features_key(side, user_id), json.dumps(features))
+    else:
+        pipeline.delete(_features_key(side, user_id))
+    pipeline.execute()
+    return matches
+
+
+def matched_ids(side, user_id):
+    """
+    Ids of a user's matches on the other side, best first, or None if none
+    are stored.
+    """
+    cached = _redis().zrevrange(_matches_key(side, user_id), 0, -1)
+    if not cached:
+        return None
+    return [int(match_id) for match_id in cached if match_id != NO_MATCHES.encode()]
+
+
+def side_of(user):
+    """
+    The matching side of a user, or None for other roles.
+    """
+    return user.role if user.role in COUNTERPART else None
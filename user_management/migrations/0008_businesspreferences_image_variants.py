@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0007_alter_documentsbusiness_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businesspreferences',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_authentication', '0007_search_columns'),
+        ('user_management', '0008_businesspreferences_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='businesspreferences',
+            index=models.Index(fields=['company_name', 'id'], name='business_company_name'),
+        ),
+        migrations.AddIndex(
+            model_name='businesspreferences',
+            index=models.Index(condition=models.Q(('industry__isnull', False)), fields=['industry', 'company_name', 'id'], name='business_industry_name'),
+        ),
+        migrations.AddIndex(
+            model_name='businesspreferences',
+            index=models.Index(condition=models.Q(('location__isnull', False)), fields=['location', 'company_name', 'id'], name='business_location_name'),
+        ),
+        migrations.AddIndex(
+            model_name='businesspreferences',
+            index=models.Index(fields=['company_stage', 'company_name', 'id'], name='business_stage_name'),
+        ),
+        migrations.AddIndex(
+            model_name='businesspreferences',
+            index=models.Index(fields=['seeking_amount'], name='business_seeking_amount'),
+        ),
+        migrations.AddIndex(
+            model_name='businesspreferences',
+            index=models.Index(fields=['annual_revenue'], name='business_annual_revenue'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:30
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+BATCH_SIZE = 1000
+
+
+def _vector(parts, weight):
+    return SearchVector(Value(' '.join(filter(None, parts))), weight=weight, config=settings.SEARCH_CONFIG)
+
+
+def backfill_search_columns(apps, schema_editor):
+    # The search columns are PostgreSQL features (tsvector, pg_trgm)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # The documents as user_management.search.update_documents builds them,
+    # frozen on the historical models
+    CustomUser = apps.get_model('user_authentication', 'CustomUser')
+    InvestorPreferences = apps.get_model('user_authentication', 'InvestorPreferences')
+    BusinessPreferences = apps.get_model('user_management', 'BusinessPreferences')
+    tag_fields = {'industry': 'preferred_industries', 'location': 'preferred_locations'}
+
+    all_ids = list(CustomUser.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(all_ids), BATCH_SIZE):
+        user_ids = all_ids[start:start + BATCH_SIZE]
+        users = list(CustomUser.objects.filter(pk__in=user_ids).only('full_name', 'email', 'phone_number'))
+        businesses = {
+            row['user_id']: row for row in BusinessPreferences.objects.filter(user_id__in=user_ids)
+            .values('user_id', 'company_name', 'company_description', 'industry__name', 'location__name')
+        }
+        descriptions = dict(
+            InvestorPreferences.objects.filter(user_id__in=user_ids).values_list('user_id', 'description')
+        )
+        tags = {}
+        for feature, field in tag_fields.items():
+            pairs = getattr(InvestorPreferences, field).through.objects.filter(investorpreferences__user_id__in=user_ids)
+            for user_id, name in pairs.values_list('investorpreferences__user_id', f'{feature}__name'):
+                tags.setdefault(user_id, []).append(name)
+
+        for user in users:
+            business = businesses.get(user.id, {})
+            names = [user.full_name, business.get('company_name')]
+            user.search_text = '\n'.join(filter(None, names + [user.email, user.phone_number])).lower()
+            user.search_document = (
+                _vector(names, 'A')
+                + _vector(tags.get(user.id, []) + [business.get('industry__name'), business.get('location__name')], 'B')
+                + _vector([descriptions.get(user.id), business.get('company_description')], 'C')
+            )
+        CustomUser.objects.bulk_update(users, ['search_text', 'search_document'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_authentication', '0007_search_columns'),
+        ('user_management', '0009_discovery_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_columns, migrations.RunPython.noop),
+    ]
@@ -36,6 +36,25 @@ class BusinessPreferences(models.Model):
     facebook = models.URLField(blank=True, null=True, validators=[URLValidator()])
     twitter = models.URLField(blank=True, null=True, validators=[URLValidator()])
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='business_preferences')
+    # Storage names of the resized WebP copies of the images (see zephyr.images)
+    image_variants = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Discovery search pages (see user_management.facets), ordered by company name
+            models.Index(fields=['company_name', 'id'], name='business_company_name'),
+            models.Index(
+                fields=['industry', 'company_name', 'id'], name='business_industry_name',
+                condition=models.Q(industry__isnull=False),
+            ),
+            models.Index(
+                fields=['location', 'company_name', 'id'], name='business_location_name',
+                condition=models.Q(location__isnull=False),
+            ),
+            models.Index(fields=['company_stage', 'company_name', 'id'], name='business_stage_name'),
+            models.Index(fields=['seeking_amount'], name='business_seeking_amount'),
+            models.Index(fields=['annual_revenue'], name='business_annual_revenue'),
+        ]
 
     def __str__(self):
         return f"Business Preferences for {self.company_name}"
@@ -0,0 +1,98 @@
+"""
+Search over investors and businesses.
+
+Each user row carries two denormalized search columns (see CustomUser), kept
+up to date by user_management.signals, which queue `update_search_documents`
+once a change commits:
+
+- `search_document`, a weighted tsvector of the name and company name (A),
+  the industries and locations (B) and the descriptions (C), GIN indexed;
+- `search_text`, the lower-cased name, company name, email and phone number
+  under a pg_trgm GIN index, so substring matches (LIKE '%...%') read the
+  index instead of scanning the table.
+
+`search(queryset, query)` keeps users matching either and orders them by
+full-text rank; queries too short for trigrams fall back to `icontains` on
+the fields. The columns are filled by a data migration, and
+`manage.py rebuild_search_index` recomputes both for every user, e.g. after
+renaming an industry.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Q, Value
+from user_authentication.models import CustomUser, InvestorPreferences
+from .matching import INVESTOR_FIELDS
+from .models import BusinessPreferences
+
+# Trigrams cannot narrow down shorter substrings
+MIN_SUBSTRING_LENGTH = 3
+
+# CustomUser fields that are part of the search columns
+USER_FIELDS = {'full_name', 'email', 'phone_number'}
+
+
+def _vector(parts, weight):
+    return SearchVector(Value(' '.join(filter(None, parts))), weight=weight, config=settings.SEARCH_CONFIG)
+
+
+def update_documents(user_ids):
+    """
+    Recompute the search columns of the given users in one bulk UPDATE.
+    """
+    user_ids = list(user_ids)
+    users = list(CustomUser.objects.filter(pk__in=user_ids).only('full_name', 'email', 'phone_number'))
+    businesses = {
+        row['user_id']: row for row in BusinessPreferences.objects.filter(user_id__in=user_ids)
+        .values('user_id', 'company_name', 'company_description', 'industry__name', 'location__name')
+    }
+    descriptions = dict(
+        InvestorPreferences.objects.filter(user_id__in=user_ids).values_list('user_id', 'description')
+    )
+    tags = {}
+    for feature, field in INVESTOR_FIELDS.items():
+        pairs = getattr(InvestorPreferences, field).through.objects.filter(investorpreferences__user_id__in=user_ids)
+        for user_id, name in pairs.values_list('investorpreferences__user_id', f'{feature}__name'):
+            tags.setdefault(user_id, []).append(name)
+
+    for user in users:
+        business = businesses.get(user.id, {})
+        names = [user.full_name, business.get('company_name')]
+        user.search_text = '\n'.join(filter(None, names + [user.email, user.phone_number])).lower()
+        user.search_document = (
+            _vector(names, 'A')
+            + _vector(tags.get(user.id, []) + [business.get('industry__name'), business.get('location__name')], 'B')
+            + _vector([descriptions.get(user.id), business.get('company_description')], 'C')
+        )
+    CustomUser.objects.bulk_update(users, ['search_text', 'search_document'])
+    return len(users)
+
+
+def rebuild(batch_size=1000):
+    """
+    Recompute the search columns of every user. Returns the number of users.
+    """
+    user_ids = list(CustomUser.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(user_ids), batch_size):
+        update_documents(user_ids[start:start + batch_size])
+    return len(user_ids)
+
+
+def search(queryset, query):
+    """
+    Users of `queryset` whose search document matches `query` (web search
+    syntax) or whose name, company name, email or phone number contains it,
+    best ranked first.
+    """
+    query = query.strip()
+    tsquery = SearchQuery(query, search_type='websearch', config=settings.SEARCH_CONFIG)
+    matches = Q(search_document=tsquery)
+    if len(query) >= MIN_SUBSTRING_LENGTH:
+        matches |= Q(search_text__contains=query.lower())
+    else:
+        # Scans the table, as every search did before the trigram index
+        for field in sorted(USER_FIELDS):
+            matches |= Q(**{f'{field}__icontains': query})
+        matches |= Q(business_preferences__company_name__icontains=query)
+    return queryset.filter(matches).annotate(
+        rank=SearchRank(F('search_document'), tsquery),
+    ).order_by('-rank', 'full_name')
@@ -3,6 +3,7 @@ from user_authentication.models import Industry, Location, InvestorPreferences,
 from .models import *
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from zephyr.images import ImageVariantField
 
 User = get_user_model()
 
@@ -360,13 +361,14 @@ class DetailedInformationForSpecificUserBusinessProfileSerializer(serializers.Mo
 
 class ListingInvestorSerializer(serializers.ModelSerializer):
     avatar_image = serializers.ImageField(source='investor_preferences.avatar_image', required=False)
+    avatar_thumbnail = ImageVariantField('avatar_image', source='investor_preferences')
     description = serializers.CharField(source='investor_preferences.description', required=False)
     full_name = serializers.CharField()
     email = serializers.EmailField()
 
     class Meta:
         model = CustomUser
-        fields = ['id', 'avatar_image', 'description', 'full_name', 'email']
+        fields = ['id', 'avatar_image', 'avatar_thumbnail', 'description', 'full_name', 'email']
         
         
         
@@ -376,11 +378,23 @@ class UserSideBusinessPreferencesSerializer(serializers.ModelSerializer):
     industry = serializers.CharField(source="industry.name")
     about_description = serializers.CharField(source="company_description")
     avatar_image = serializers.ImageField()
+    avatar_thumbnail = ImageVariantField('avatar_image')
     user_id = serializers.IntegerField(source="user.id")
 
     class Meta:
         model = BusinessPreferences
-        fields = ['id', 'company_name', 'location', 'industry', 'about_description', 'avatar_image','user_id']
+        fields = ['id', 'company_name', 'location', 'industry', 'about_description', 'avatar_image', 'avatar_thumbnail', 'user_id']
+
+
+class DiscoveryBusinessSerializer(UserSideBusinessPreferencesSerializer):
+    """
+    A business in the discovery search, with the fields it can be filtered by.
+    """
+    location = serializers.CharField(source="location.name", allow_null=True)
+    industry = serializers.CharField(source="industry.name", allow_null=True)
+
+    class Meta(UserSideBusinessPreferencesSerializer.Meta):
+        fields = UserSideBusinessPreferencesSerializer.Meta.fields + ['company_stage', 'seeking_amount', 'annual_revenue']
 
 
 class UserImageNameDetailsSerializer(serializers.Serializer):
@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from user_authentication.models import CustomUser, Industry, InvestorPreferences, Location
+from zephyr import images
+from .models import BusinessPreferences
+from .tasks import schedule_refresh, update_search_documents
+from . import facets, matching, search
+
+
+@receiver(post_save, sender=BusinessPreferences)
+def generate_image_variants(sender, instance, **kwargs):
+    images.schedule(instance, ['avatar_image', 'cover_image'])
+
+
+@receiver(post_save, sender=BusinessPreferences)
+def rescore_business(sender, instance, **kwargs):
+    transaction.on_commit(lambda: schedule_refresh(matching.BUSINESS, instance.user_id), robust=True)
+
+
+@receiver(post_save, sender=InvestorPreferences)
+def rescore_investor(sender, instance, **kwargs):
+    transaction.on_commit(lambda: schedule_refresh(matching.INVESTOR, instance.user_id), robust=True)
+
+
+@receiver(m2m_changed, sender=InvestorPreferences.preferred_industries.through)
+@receiver(m2m_changed, sender=InvestorPreferences.preferred_locations.through)
+def rescore_investor_preferences(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        rescore_investor(sender, instance)
+
+
+# Search documents are rebuilt by the task worker once the change commits (see
+# user_management.search), keeping the queries off registration and profile edits.
+
+@receiver(post_save, sender=CustomUser)
+def index_user(sender, instance, update_fields=None, **kwargs):
+    # Saves of unrelated fields (e.g. last_login) leave the search columns as they are
+    if update_fields is None or search.USER_FIELDS & set(update_fields):
+        update_search_documents.delay([instance.pk])
+
+
+@receiver(post_save, sender=BusinessPreferences)
+@receiver(post_save, sender=InvestorPreferences)
+def index_profile(sender, instance, **kwargs):
+    update_search_documents.delay([instance.user_id])
+
+
+@receiver(m2m_changed, sender=InvestorPreferences.preferred_industries.through)
+@receiver(m2m_changed, sender=InvestorPreferences.preferred_locations.through)
+def index_investor_preferences(sender, instance, action, reverse, pk_set=None, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            update_search_documents.delay([instance.user_id])
+        return
+    # Changed from the industry / location side
+    if action == 'pre_clear':
+        # post_clear has no pk_set, so the investors are looked up before the rows go
+        feature = 'industry' if sender is InvestorPreferences.preferred_industries.through else 'location'
+        instance._cleared_search_user_ids = list(
+            sender.objects.filter(**{feature: instance}).values_list('investorpreferences__user_id', flat=True)
+        )
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_search_user_ids', [])
+        if user_ids:
+            update_search_documents.delay(user_ids)
+    elif action in ('post_add', 'post_remove'):
+        user_ids = list(InvestorPreferences.objects.filter(pk__in=pk_set or ()).values_list('user_id', flat=True))
+        if user_ids:
+            update_search_documents.delay(user_ids)
+
+
+@receiver(post_save, sender=Industry)
+@receiver(post_save, sender=Location)
+def index_tag_users(sender, instance, created, **kwargs):
+    if created:
+        return
+    feature = 'industry' if sender is Industry else 'location'
+    through = getattr(InvestorPreferences, matching.INVESTOR_FIELDS[feature]).through
+    user_ids = set(through.objects.filter(**{feature: instance}).values_list('investorpreferences__user_id', flat=True))
+    user_ids.update(BusinessPreferences.objects.filter(**{feature: instance}).values_list('user_id', flat=True))
+    user_ids = sorted(user_ids)
+    # A rename can touch many users, so it is reindexed in the background
+    for start in range(0, len(user_ids), 1000):
+        update_search_documents.delay(user_ids[start:start + 1000])
+
+
+@receiver(post_save, sender=BusinessPreferences)
+@receiver(post_delete, sender=BusinessPreferences)
+@receiver(post_save, sender=Industry)
+@receiver(post_save, sender=Location)
+def invalidate_discovery_facets(sender, **kwargs):
+    transaction.on_commit(facets.invalidate, robust=True)
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django_redis import get_redis_connection
+from zephyr.tasks import task
+from . import matching, search
+
+
+@task(max_retries=2)
+def refresh_matches(side, user_id):
+    """
+    Re-score one investor or business profile against the other side.
+    """
+    matching.refresh(side, user_id)
+
+
+def schedule_refresh(side, user_id, countdown=None):
+    """
+    Queue a re-score of one profile, at most one per profile and
+    MATCHING_REFRESH_INTERVAL since editing a profile fires several signals.
+    """
+    redis = get_redis_connection("default")
+    interval = settings.MATCHING_REFRESH_INTERVAL
+    if redis.set(f"matching:pending:{side}:{user_id}", 1, nx=True, ex=interval):
+        refresh_matches.apply_async((side, user_id), countdown=interval if countdown is None else countdown)
+
+
+@task(max_retries=2)
+def update_search_documents(user_ids):
+    """
+    Recompute the search columns of a batch of users.
+    """
+    search.update_documents(user_ids)
@@ -1,3 +1,209 @@
+from unittest import mock, skipUnless
+import fakeredis
+from django.db import connection
+from django.db.models import Count
 from django.test import TestCase
+from user_authentication.models import CustomUser, Industry, InvestorPreferences, Location
+from .models import BusinessPreferences
+from . import facets, matching
+from .matching import BUSINESS, INVESTOR
 
-# Create your tests here.
+
+def create_user(name, role):
+    return CustomUser.objects.create(
+        username=name.lower(), email=f'{name.lower()}@example.com', full_name=name, role=role,
+    )
+
+
+def create_business(name, industry, location, stage='Seed', amount=1000):
+    user = create_user(name, 'business')
+    BusinessPreferences.objects.create(
+        user=user, company_name=name, industry=industry, location=location, business_type='B2B',
+        company_stage=stage, company_description='Widgets', seeking_amount=amount,
+        website='https://example.com', product_type='Hardware', annual_revenue=100, employee_count=5,
+    )
+    return user
+
+
+class MatchingRefreshTests(TestCase):
+    """
+    Re-scoring one profile must patch the stored matches of the counterparts
+    whose score with it changed, and leave the rest alone.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fintech = Industry.objects.create(name='Fintech')
+        cls.health = Industry.objects.create(name='Healthcare')
+        city = Location.objects.create(name='Lagos')
+        cls.fintech_business = create_business('Payco', cls.fintech, city)
+        cls.health_business = create_business('Medico', cls.health, city)
+
+        cls.investor = create_user('Ada', 'investor')
+        preferences = InvestorPreferences.objects.create(user=cls.investor)
+        preferences.preferred_industries.set([cls.fintech])
+        cls.generalist = create_user('Grace', 'investor')
+        preferences = InvestorPreferences.objects.create(user=cls.generalist)
+        preferences.preferred_industries.set([cls.fintech, cls.health])
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(matching, 'get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        matching.compute_all()
+
+    def set_industries(self, *industries):
+        self.investor.investor_preferences.preferred_industries.set(industries)
+
+    def test_compute_all(self):
+        self.assertEqual(matching.matched_ids(INVESTOR, self.investor.id), [self.fintech_business.id])
+        # Equal scores
+        self.assertCountEqual(
+            matching.matched_ids(INVESTOR, self.generalist.id), [self.fintech_business.id, self.health_business.id]
+        )
+        self.assertEqual(matching.matched_ids(BUSINESS, self.fintech_business.id), [self.investor.id, self.generalist.id])
+        self.assertEqual(matching.matched_ids(BUSINESS, self.health_business.id), [self.generalist.id])
+
+    def test_refresh_patches_counterparts(self):
+        self.set_industries(self.health)
+        matches = matching.refresh(INVESTOR, self.investor.id)
+
+        self.assertEqual([match_id for match_id, _score in matches], [self.health_business.id])
+        self.assertEqual(matching.matched_ids(INVESTOR, self.investor.id), [self.health_business.id])
+        self.assertEqual(matching.matched_ids(BUSINESS, self.fintech_business.id), [self.generalist.id])
+        self.assertEqual(matching.matched_ids(BUSINESS, self.health_business.id), [self.investor.id, self.generalist.id])
+
+    def test_refresh_matches_a_full_run(self):
+        self.set_industries(self.health)
+        matching.refresh(INVESTOR, self.investor.id)
+        patched = {
+            user_id: matching.matched_ids(BUSINESS, user_id)
+            for user_id in (self.fintech_business.id, self.health_business.id)
+        }
+        matching.compute_all()
+        for user_id, match_ids in patched.items():
+            self.assertEqual(matching.matched_ids(BUSINESS, user_id), match_ids)
+
+    def test_refresh_leaves_uncached_counterparts(self):
+        self.redis.delete(matching._matches_key(BUSINESS, self.health_business.id))
+        self.set_industries(self.health)
+        matching.refresh(INVESTOR, self.investor.id)
+
+        self.assertIsNone(matching.matched_ids(BUSINESS, self.health_business.id))
+
+    def test_refresh_of_a_cleared_profile(self):
+        self.set_industries()
+        self.assertEqual(matching.refresh(INVESTOR, self.investor.id), [])
+
+        self.assertEqual(matching.matched_ids(INVESTOR, self.investor.id), [])
+        self.assertIsNone(self.redis.get(matching._features_key(INVESTOR, self.investor.id)))
+        self.assertEqual(matching.matched_ids(BUSINESS, self.fintech_business.id), [self.generalist.id])
+
+
+def separate_counts(queryset):
+    """
+    The rows of `facets._grouped`, counted with one GROUP BY per facet.
+    """
+    filtered = queryset.order_by().annotate(amount_bucket=facets._amount_bucket())
+    yield None, None, filtered.count()
+    for column in facets.FACET_COLUMNS:
+        for row in filtered.values(column).annotate(total=Count('pk')):
+            yield column, row[column], row['total']
+
+
+def by_value(result):
+    return {name: sorted(entries, key=repr) for name, entries in result['facets'].items()}
+
+
+class FacetTests(TestCase):
+    """
+    Facet counts of the discovery search: decoding of the GROUPING SETS
+    rows, and the counts less the viewer's own business.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fintech = Industry.objects.create(name='Fintech')
+        cls.health = Industry.objects.create(name='Healthcare')
+        cls.lagos = Location.objects.create(name='Lagos')
+        cls.abuja = Location.objects.create(name='Abuja')
+        cls.viewer = create_business('Payco', cls.fintech, cls.lagos)
+        create_business('Paystack', cls.fintech, cls.lagos, amount=200000)
+        create_business('Medico', cls.health, cls.abuja, stage='Idea')
+        create_business('Clinic', cls.health, None, stage='Idea', amount=7000000)
+
+    def setUp(self):
+        self.queryset = BusinessPreferences.objects.all()
+
+    def test_grouping_rows_are_decoded(self):
+        rows = [
+            (1, 1, 1, 1, None, None, None, None, 4),
+            (0, 1, 1, 1, self.fintech.id, None, None, None, 2),
+            (0, 1, 1, 1, self.health.id, None, None, None, 2),
+            (1, 0, 1, 1, None, self.lagos.id, None, None, 2),
+            (1, 0, 1, 1, None, self.abuja.id, None, None, 1),
+            # Businesses without a location
+            (1, 0, 1, 1, None, None, None, None, 1),
+            (1, 1, 0, 1, None, None, 'Idea', None, 2),
+            (1, 1, 0, 1, None, None, 'Seed', None, 2),
+            (1, 1, 1, 0, None, None, None, 4, 1),
+            (1, 1, 1, 0, None, None, None, 0, 2),
+            (1, 1, 1, 0, None, None, None, 1, 1),
+        ]
+        with mock.patch.object(facets, 'connection') as patched:
+            patched.cursor.return_value.__enter__.return_value.fetchall.return_value = rows
+            result = facets.compute(self.queryset)
+
+        self.assertEqual(result['total'], 4)
+        self.assertEqual(result['facets']['locations'], [
+            {'id': self.lagos.id, 'name': 'Lagos', 'count': 2},
+            {'id': self.abuja.id, 'name': 'Abuja', 'count': 1},
+        ])
+        self.assertEqual(
+            [(entry['name'], entry['count']) for entry in result['facets']['industries']],
+            [('Fintech', 2), ('Healthcare', 2)],
+        )
+        self.assertEqual(result['facets']['amounts'], [
+            {'min': '0', 'max': '100000', 'count': 2},
+            {'min': '100000', 'max': '500000', 'count': 1},
+            {'min': '5000000', 'max': None, 'count': 1},
+        ])
+
+    @skipUnless(connection.vendor == 'postgresql', "facets are counted with Postgres GROUPING SETS")
+    def test_grouping_sets_match_separate_counts(self):
+        queryset = self.queryset.filter(industry=self.health)
+        self.assertCountEqual(list(facets._grouped(queryset)), list(separate_counts(queryset)))
+
+    def test_without_matches_counting_without_the_business(self):
+        with mock.patch.object(facets, '_grouped', separate_counts):
+            result = facets.without(facets.compute(self.queryset), self.queryset, self.viewer.id)
+            expected = facets.compute(self.queryset.exclude(user=self.viewer))
+
+        self.assertEqual(result['total'], 3)
+        self.assertEqual(by_value(result), by_value(expected))
+        self.assertEqual(result['facets']['amounts'], expected['facets']['amounts'])
+
+    def test_without_leaves_counts_not_holding_the_business(self):
+        queryset = self.queryset.filter(industry=self.health)
+        with mock.patch.object(facets, '_grouped', separate_counts):
+            result = facets.compute(queryset)
+        self.assertEqual(facets.without(result, queryset, self.viewer.id)['total'], 2)
+
+    def test_cache_key_normalizes_filters(self):
+        self.assertEqual(
+            facets._cache_key(1, {'industry': [2, 1], 'stage': '', 'location': None}),
+            facets._cache_key(1, {'industry': [1, 2]}),
+        )
+        self.assertNotEqual(facets._cache_key(1, {}), facets._cache_key(2, {}))
+
+    def test_counts_are_cached_until_invalidated(self):
+        redis = fakeredis.FakeRedis()
+        with mock.patch.object(facets, 'get_redis_connection', return_value=redis), \
+                mock.patch.object(facets, '_grouped', side_effect=separate_counts) as grouped:
+            facets.counts(self.queryset, {})
+            facets.counts(self.queryset, {})
+            self.assertEqual(grouped.call_count, 1)
+            facets.invalidate()
+            facets.counts(self.queryset, {})
+            self.assertEqual(grouped.call_count, 2)
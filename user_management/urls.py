@@ -25,6 +25,7 @@ urlpatterns = [
     path('admin/business/individual-business-info/<int:pk>/', RetrieveSpecificUserDetailedBusinessProfileView.as_view(), name='retrieve_specific_user_detailed_business_profile'),
     path('fetch-investors/', InvesterCardListViewWithMinimalData.as_view(), name='investor-preferences-list'),
     path('fetch-business-user/', UserBusinessPreferencesListView.as_view(), name='business-preferences-list'),
+    path('discover-businesses/', BusinessDiscoveryView.as_view(), name='business-discovery'),
     path('fetch-user-role/<int:id>/', FetchUserRoleView.as_view(), name='fetch_user_role'),
     path('user-details/', UserDetailsAPIView.as_view(), name='user-details'),
 ]
@@ -8,10 +8,16 @@ from rest_framework.exceptions import NotFound
 import json
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from functools import partial
+from django.db.models import Case, When, Value, IntegerField
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from user_authentication.permission import IsAdmin, IsBusiness, IsInvestor
+from . import facets, matching, search
+from .filters import BusinessDiscoveryFilter
+from .tasks import schedule_refresh
 
 class CustomPagination(PageNumberPagination):
     page_size = 7  
@@ -27,6 +33,27 @@ class CustomPagination(PageNumberPagination):
         })
         
 
+class CountedPaginator(Paginator):
+    """
+    A paginator given the total up front instead of counting the queryset.
+    """
+
+    def __init__(self, object_list, per_page, total=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.total = total
+
+    @cached_property
+    def count(self):
+        return super().count if self.total is None else self.total
+
+
+class DiscoveryPagination(CustomPagination):
+    def paginate_queryset(self, queryset, request, view=None, total=None):
+        # The facet counts include the total, so the page skips its COUNT query
+        self.django_paginator_class = partial(CountedPaginator, total=total)
+        return super().paginate_queryset(queryset, request, view)
+
+
 class LocationViewSet(viewsets.ModelViewSet):
     """
     API viewset for managing locations.
@@ -494,13 +521,9 @@ class InvestorSearchView(generics.ListAPIView):
         base_queryset = CustomUser.objects.filter(role='investor').prefetch_related('investor_preferences')
         
         if query:
-            base_queryset = base_queryset.filter(
-                Q(full_name__icontains=query) | 
-                Q(email__icontains=query) | 
-                Q(phone_number__icontains=query)
-            )
+            # Ranked full-text and indexed substring matches (see user_management.search)
+            return search.search(base_queryset, query)
         
-        # Apply ordering to the queryset in both cases
         return base_queryset.order_by('full_name')
     
 class ToggleUserStatus(APIView):
@@ -551,13 +574,7 @@ class AdminBusinessSearchView(generics.ListAPIView):
         base_queryset = CustomUser.objects.filter(role='business').prefetch_related('business_preferences')
         
         if query:
-            base_queryset = base_queryset.filter(
-                Q(full_name__icontains=query) | 
-                Q(email__icontains=query) | 
-                Q(phone_number__icontains=query) |
-                Q(business_preferences__company_name__icontains=query) 
-
-            )
+            return search.search(base_queryset, query)
         
         return base_queryset.order_by('full_name')
     
@@ -597,6 +614,27 @@ class RetrieveSpecificUserDetailedBusinessProfileView(generics.RetrieveAPIView):
     
     
     
+def _matched_ids(request, side):
+    """
+    The requesting user's matches, best first, to list with `?mode=ranked`;
+    None for the default listing. Only users on the matching `side` have
+    any. Matches not computed yet are queued and the default listing is
+    served meanwhile.
+    """
+    if request.query_params.get('mode') != 'ranked' or matching.side_of(request.user) != side:
+        return None
+    ids = matching.matched_ids(side, request.user.id)
+    if ids is None:
+        schedule_refresh(side, request.user.id, countdown=0)
+    return ids
+
+
+def _in_match_order(queryset, field, ids):
+    return queryset.filter(**{f'{field}__in': ids}).order_by(
+        Case(*(When(**{field: pk}, then=Value(position)) for position, pk in enumerate(ids)), output_field=IntegerField())
+    )
+
+
 class InvesterCardListViewWithMinimalData(generics.ListAPIView):
     serializer_class = ListingInvestorSerializer
     permission_classes = [IsAuthenticated]
@@ -604,7 +642,11 @@ class InvesterCardListViewWithMinimalData(generics.ListAPIView):
 
     def get_queryset(self):
         current_user = self.request.user
-        return CustomUser.objects.filter(role='investor').exclude(id=current_user.id).prefetch_related('investor_preferences').order_by('full_name')
+        queryset = CustomUser.objects.filter(role='investor').exclude(id=current_user.id).prefetch_related('investor_preferences')
+        matched_ids = _matched_ids(self.request, matching.BUSINESS)
+        if matched_ids is not None:
+            return _in_match_order(queryset, 'id', matched_ids)
+        return queryset.order_by('full_name')
     
     
 class UserBusinessPreferencesListView(generics.ListAPIView):
@@ -614,10 +656,50 @@ class UserBusinessPreferencesListView(generics.ListAPIView):
 
     def get_queryset(self):
         current_user = self.request.user
-        return BusinessPreferences.objects.select_related('location', 'industry', 'user') \
-            .filter(user__role='business').exclude(user=current_user).order_by('user__full_name')
+        queryset = BusinessPreferences.objects.select_related('location', 'industry', 'user') \
+            .filter(user__role='business').exclude(user=current_user)
+        matched_ids = _matched_ids(self.request, matching.INVESTOR)
+        if matched_ids is not None:
+            return _in_match_order(queryset, 'user_id', matched_ids)
+        return queryset.order_by('user__full_name')
             
 
+class BusinessDiscoveryView(generics.ListAPIView):
+    """
+    Faceted business search: filter by industry, location, company stage,
+    seeking amount and annual revenue (see BusinessDiscoveryFilter). Besides
+    the page of businesses the response holds `facets`, the number of
+    matching businesses per industry, location, stage and seeking amount
+    bucket (see user_management.facets).
+    """
+    serializer_class = DiscoveryBusinessSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = DiscoveryPagination
+    filterset_class = BusinessDiscoveryFilter
+
+    def businesses(self):
+        return BusinessPreferences.objects.select_related('location', 'industry', 'user') \
+            .filter(user__role='business').order_by('company_name', 'id')
+
+    def get_queryset(self):
+        return self.businesses().exclude(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        filterset = self.filterset_class(request.query_params, queryset=self.businesses(), request=request)
+        if not filterset.is_valid():
+            raise serializers.ValidationError(filterset.errors)
+        # Counted with the requesting user's business, so every user shares the cached counts
+        counts = facets.counts(filterset.qs, filterset.form.cleaned_data)
+        if request.user.role == 'business':
+            counts = facets.without(counts, filterset.qs, request.user.id)
+        queryset = filterset.qs.exclude(user=request.user)
+
+        page = self.paginator.paginate_queryset(queryset, request, view=self, total=counts['total'])
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        response.data['facets'] = counts['facets']
+        return response
+
+
 class FetchUserRoleView(APIView):
     """
     API to fetch the role of a user based on their ID.
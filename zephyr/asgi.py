@@ -10,19 +10,22 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zephyr.settings')
+
+# Set up Django before importing consumers, which import models.
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
+from user_authentication.middleware import JWTAuthMiddleware
 from chat import routing
 from notifications.routing import websocket_urlpatterns
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zephyr.settings')
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "http": django_asgi_app,
+    # Sockets are bound to the user of the JWT access token, without a DB lookup.
+    "websocket": JWTAuthMiddleware(
         URLRouter(
             routing.websocket_urlpatterns + websocket_urlpatterns
         )
     )
 })
-
-
@@ -0,0 +1,98 @@
+"""
+Shared asyncio Redis client for websocket consumers.
+
+Consumers talk to Redis natively on the event loop instead of hopping through
+the `database_sync_to_async` thread pool, which stays free for ORM work. One
+connection pool is kept per event loop (bounded by ASYNC_REDIS_MAX_CONNECTIONS)
+and every command and pipeline is timed; `stats()` returns the counters and
+commands slower than ASYNC_REDIS_SLOW_MS are logged.
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict
+from django.conf import settings
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+
+logger = logging.getLogger(__name__)
+
+_pools = weakref.WeakKeyDictionary()
+_stats = defaultdict(lambda: {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+_stats_lock = threading.Lock()
+
+
+def _record(command, started, failed):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        entry = _stats[command]
+        entry['calls'] += 1
+        entry['errors'] += failed
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+    if elapsed_ms > settings.ASYNC_REDIS_SLOW_MS:
+        logger.warning(f"Slow Redis command {command}: {elapsed_ms:.1f} ms")
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error=True):
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = await super().execute(raise_on_error)
+            failed = False
+            return response
+        finally:
+            _record('PIPELINE', started, failed)
+
+
+class InstrumentedRedis(Redis):
+    """
+    `redis.asyncio.Redis` that records the latency of every command.
+    """
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = await super().execute_command(*args, **options)
+            failed = False
+            return response
+        finally:
+            _record(str(args[0]).upper(), started, failed)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def get_connection():
+    """
+    Client on the pool of the running event loop, created on first use.
+
+    Connections are borrowed per command, so the client can be shared by every
+    consumer on the loop; when all ASYNC_REDIS_MAX_CONNECTIONS are busy callers
+    wait up to ASYNC_REDIS_POOL_TIMEOUT seconds for one.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.ASYNC_REDIS_MAX_CONNECTIONS,
+            timeout=settings.ASYNC_REDIS_POOL_TIMEOUT,
+        )
+        _pools[loop] = pool
+    return InstrumentedRedis(connection_pool=pool)
+
+
+def stats():
+    """
+    Snapshot of per-command call counts, errors and latency since start-up.
+    """
+    with _stats_lock:
+        return {
+            command: dict(entry, avg_ms=entry['total_ms'] / entry['calls'])
+            for command, entry in _stats.items()
+        }
@@ -0,0 +1,165 @@
+"""
+Image derivatives for uploaded pictures (post images, avatars, covers).
+
+When a model's image field changes, a background task (see zephyr/tasks.py)
+renders WebP variants at fixed sizes with Pillow and saves them next to the
+original under `<dir>/variants/`. Their storage names are recorded in the
+model's `image_variants` JSON field, keyed by image field:
+
+    {"avatar_image": {"source": "avatar_images/a.png", "thumb": "...", "small": "...", ...}}
+
+Readers use `variant_url()`, which falls back to the original until the
+variants exist. `image_variants_ready` is sent once a model's variants are saved.
+"""
+import os
+from io import BytesIO
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from .tasks import task
+
+# name -> (bounding box, crop to fill). Sizes are never upscaled.
+VARIANTS = {
+    'thumb': ((160, 160), True),
+    'small': ((480, 480), False),
+    'large': ((1080, 1080), False),
+}
+
+image_variants_ready = Signal()
+
+
+def variant_name(name, variant):
+    directory, filename = os.path.split(os.path.splitext(name)[0])
+    return os.path.join(directory, 'variants', f"{filename}_{variant}.webp")
+
+
+def render_variants(field_file):
+    """
+    Render every variant of an image file and save it to storage.
+
+    Returns a mapping of variant name to storage name.
+    """
+    with field_file.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    names = {}
+    for variant, (size, crop) in VARIANTS.items():
+        if crop:
+            resized = ImageOps.fit(image, size, Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, 'WEBP', quality=settings.IMAGE_VARIANT_QUALITY, method=4)
+        names[variant] = default_storage.save(
+            variant_name(field_file.name, variant), ContentFile(buffer.getvalue())
+        )
+    return names
+
+
+def _delete_variants(record):
+    for variant, name in record.items():
+        if variant != 'source':
+            default_storage.delete(name)
+
+
+def process(model, pk, fields):
+    """
+    Render the variants of `fields` on one row and record them.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    variants = dict(instance.image_variants or {})
+    for field in fields:
+        field_file = getattr(instance, field)
+        previous = variants.pop(field, None)
+        if previous:
+            _delete_variants(previous)
+        if field_file:
+            variants[field] = {'source': field_file.name, **render_variants(field_file)}
+    model.objects.filter(pk=pk).update(image_variants=variants)
+    instance.image_variants = variants
+    image_variants_ready.send(sender=model, instance=instance)
+
+
+@task(max_retries=2)
+def generate_variants(model_label, pk, fields):
+    process(apps.get_model(model_label), pk, fields)
+
+
+def stale_fields(instance, fields):
+    """
+    Image fields whose recorded variants do not match the current file.
+    """
+    variants = instance.image_variants or {}
+    return [
+        field for field in fields
+        if (getattr(instance, field).name or None) != variants.get(field, {}).get('source')
+    ]
+
+
+def schedule(instance, fields):
+    """
+    Queue variant generation for the changed image fields of a saved instance.
+    """
+    changed = stale_fields(instance, fields)
+    if changed:
+        label, pk = instance._meta.label, instance.pk
+        # Queued outside the request's error path: a Redis outage must not fail the upload.
+        transaction.on_commit(lambda: generate_variants.delay(label, pk, changed), robust=True)
+
+
+def variant_name_or_original(instance, field, variant='thumb'):
+    """
+    Storage name of an image variant, or of the original while variants are pending.
+    """
+    field_file = getattr(instance, field)
+    if not field_file:
+        return None
+    record = (instance.image_variants or {}).get(field, {})
+    if record.get('source') == field_file.name and variant in record:
+        return record[variant]
+    return field_file.name
+
+
+def variant_url(instance, field, variant='thumb'):
+    name = variant_name_or_original(instance, field, variant)
+    return default_storage.url(name) if name else None
+
+
+def variant_urls(instance, field):
+    """
+    All variant URLs of an image field; empty while they are pending.
+    """
+    field_file = getattr(instance, field)
+    record = (instance.image_variants or {}).get(field, {})
+    if not field_file or record.get('source') != field_file.name:
+        return {}
+    return {variant: default_storage.url(name) for variant, name in record.items() if variant != 'source'}
+
+
+class ImageVariantField(serializers.Field):
+    """
+    Read-only URL of one variant of an image field, absolute when the request
+    is in the serializer context.
+    """
+
+    def __init__(self, image_field, variant='thumb', **kwargs):
+        self.image_field = image_field
+        self.variant = variant
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', '*')
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        url = variant_url(instance, self.image_field, self.variant)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if url and request else url
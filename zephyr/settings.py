@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -126,10 +127,12 @@ REST_FRAMEWORK = {
 }
 
 
+REDIS_URL = config('REDIS_URL', default='redis://127.0.0.1:6379/1')
+
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
-        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'LOCATION': REDIS_URL,
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         },
@@ -145,14 +148,94 @@ CHANNEL_LAYERS = {
     },
 }
 
+# asyncio Redis pool shared by websocket consumers (see zephyr/async_redis.py)
+ASYNC_REDIS_MAX_CONNECTIONS = config('ASYNC_REDIS_MAX_CONNECTIONS', default=50, cast=int)
+ASYNC_REDIS_POOL_TIMEOUT = config('ASYNC_REDIS_POOL_TIMEOUT', default=5, cast=int)
+ASYNC_REDIS_SLOW_MS = config('ASYNC_REDIS_SLOW_MS', default=50, cast=int)
+
+# chat identity cache (per-worker LRU in front of Redis)
+CHAT_IDENTITY_CACHE_SIZE = config('CHAT_IDENTITY_CACHE_SIZE', default=10000, cast=int)
+CHAT_IDENTITY_CACHE_TTL = config('CHAT_IDENTITY_CACHE_TTL', default=60, cast=int)
+
+# chat write-behind persistence (run `manage.py flush_chat_messages` when enabled)
+CHAT_WRITE_BEHIND = config('CHAT_WRITE_BEHIND', default=False, cast=bool)
+CHAT_WRITE_BEHIND_BATCH_SIZE = config('CHAT_WRITE_BEHIND_BATCH_SIZE', default=500, cast=int)
+CHAT_WRITE_BEHIND_FLUSH_MS = config('CHAT_WRITE_BEHIND_FLUSH_MS', default=200, cast=int)
+CHAT_WRITE_BEHIND_ID_BLOCK = config('CHAT_WRITE_BEHIND_ID_BLOCK', default=100, cast=int)
+CHAT_WRITE_BEHIND_MAX_DELIVERIES = config('CHAT_WRITE_BEHIND_MAX_DELIVERIES', default=5, cast=int)
+
+# chat voice uploads (streamed as binary websocket frames)
+CHAT_VOICE_MAX_BYTES = config('CHAT_VOICE_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+CHAT_VOICE_SPOOL_BYTES = config('CHAT_VOICE_SPOOL_BYTES', default=256 * 1024, cast=int)
+
+# chat presence (Redis only; heartbeats keep a connection alive for CHAT_PRESENCE_TTL)
+CHAT_PRESENCE_TTL = config('CHAT_PRESENCE_TTL', default=60, cast=int)
+CHAT_PRESENCE_HEARTBEAT_INTERVAL = config('CHAT_PRESENCE_HEARTBEAT_INTERVAL', default=20, cast=int)
+CHAT_PRESENCE_OFFLINE_GRACE = config('CHAT_PRESENCE_OFFLINE_GRACE', default=5, cast=float)
+CHAT_PRESENCE_PARTNERS_TTL = config('CHAT_PRESENCE_PARTNERS_TTL', default=300, cast=int)
+CHAT_STATUS_BATCH_MAX = config('CHAT_STATUS_BATCH_MAX', default=500, cast=int)
+
+# feed home timelines (Redis sorted sets, fan-out-on-write below the follower threshold)
+FEED_TIMELINE_LENGTH = config('FEED_TIMELINE_LENGTH', default=800, cast=int)
+FEED_FANOUT_MAX_FOLLOWERS = config('FEED_FANOUT_MAX_FOLLOWERS', default=5000, cast=int)
+FEED_TIMELINE_PAGE_SIZE = config('FEED_TIMELINE_PAGE_SIZE', default=20, cast=int)
+FEED_TIMELINE_MAX_PAGE_SIZE = config('FEED_TIMELINE_MAX_PAGE_SIZE', default=100, cast=int)
+
+# background tasks (Redis stream queue, run `manage.py run_task_worker`; see zephyr/tasks.py)
+TASK_QUEUE_EAGER = config('TASK_QUEUE_EAGER', default=False, cast=bool)
+TASK_QUEUE_MAX_RETRIES = config('TASK_QUEUE_MAX_RETRIES', default=5, cast=int)
+TASK_QUEUE_RETRY_BACKOFF = config('TASK_QUEUE_RETRY_BACKOFF', default=5, cast=float)
+TASK_QUEUE_RETRY_BACKOFF_MAX = config('TASK_QUEUE_RETRY_BACKOFF_MAX', default=600, cast=float)
+TASK_QUEUE_LATENCY_SAMPLES = config('TASK_QUEUE_LATENCY_SAMPLES', default=1000, cast=int)
+
+# notifications (bulk inserted by notifications.service.notify, replayed on connect)
+NOTIFICATION_BATCH_SIZE = config('NOTIFICATION_BATCH_SIZE', default=1000, cast=int)
+NOTIFICATION_REPLAY_LIMIT = config('NOTIFICATION_REPLAY_LIMIT', default=50, cast=int)
+# seconds within which same-kind notifications of a group coalesce into one; 0 disables
+NOTIFICATION_COALESCE_WINDOWS = {
+    'follow': config('NOTIFICATION_COALESCE_FOLLOW', default=3600, cast=int),
+    'like': config('NOTIFICATION_COALESCE_LIKE', default=3600, cast=int),
+    'comment': config('NOTIFICATION_COALESCE_COMMENT', default=1800, cast=int),
+    'message': config('NOTIFICATION_COALESCE_MESSAGE', default=600, cast=int),
+}
+NOTIFICATION_PUSH_INTERVAL = config('NOTIFICATION_PUSH_INTERVAL', default=5, cast=int)
+# seconds a cached unread count lives without being adjusted
+NOTIFICATION_UNREAD_TTL = config('NOTIFICATION_UNREAD_TTL', default=86400, cast=int)
+
+# "people you may know" (top-K per user in Redis, run `manage.py compute_suggestions` periodically)
+SUGGESTIONS_TOP_K = config('SUGGESTIONS_TOP_K', default=50, cast=int)
+SUGGESTIONS_SHOWN = config('SUGGESTIONS_SHOWN', default=7, cast=int)
+SUGGESTIONS_TTL = config('SUGGESTIONS_TTL', default=86400 * 2, cast=int)
+# seconds a follow/unfollow waits before the users' suggestions are recomputed
+SUGGESTIONS_REFRESH_INTERVAL = config('SUGGESTIONS_REFRESH_INTERVAL', default=60, cast=int)
+# users of a shared industry or location considered per tag; larger tags are sampled
+SUGGESTIONS_TAG_SAMPLE = config('SUGGESTIONS_TAG_SAMPLE', default=1000, cast=int)
+
+# investor / business matching (top-N per user in Redis, run `manage.py compute_matches` periodically)
+MATCHING_TOP_N = config('MATCHING_TOP_N', default=50, cast=int)
+MATCHING_TTL = config('MATCHING_TTL', default=86400 * 2, cast=int)
+# rows scored per matrix product by compute_matches
+MATCHING_BATCH_SIZE = config('MATCHING_BATCH_SIZE', default=256, cast=int)
+# seconds a profile change waits before the profile is re-scored
+MATCHING_REFRESH_INTERVAL = config('MATCHING_REFRESH_INTERVAL', default=30, cast=int)
+
+# investor / business search (text search configuration of the search documents)
+SEARCH_CONFIG = config('SEARCH_CONFIG', default='english')
+# seconds the facet counts of the unfiltered business discovery listing are cached
+DISCOVERY_FACETS_TTL = config('DISCOVERY_FACETS_TTL', default=300, cast=int)
+
+# image variants (thumbnails / WebP copies rendered after upload, see zephyr/images.py)
+IMAGE_VARIANT_QUALITY = config('IMAGE_VARIANT_QUALITY', default=80, cast=int)
+
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = config('EMAIL_HOST')
-EMAIL_PORT = config('EMAIL_PORT')
-EMAIL_HOST_PASSWORD=config('EMAIL_HOST_PASSWORD')
-EMAIL_HOST_USER=config('EMAIL_HOST_USER')
-DEFAULT_FROM_EMAIL=config('DEFAULT_FROM_EMAIL')
+# 'django.core.mail.backends.console.EmailBackend' prints mails locally
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
+EMAIL_HOST_PASSWORD=config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_HOST_USER=config('EMAIL_HOST_USER', default='')
+DEFAULT_FROM_EMAIL=config('DEFAULT_FROM_EMAIL', default='noreply@localhost')
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
 
@@ -0,0 +1,368 @@
+"""
+Background tasks on a Redis stream.
+
+Functions decorated with `@task` are queued with `.delay(*args, **kwargs)`
+(or `.apply_async(args, kwargs, countdown=seconds)`) once the current
+transaction commits, or with `await .adelay(...)` from websocket consumers, and run by `Worker` (started with
+`manage.py run_task_worker`). Arguments must be JSON serializable.
+
+Jobs are read through a consumer group and acknowledged only after they ran,
+so jobs of a crashed worker are claimed by another one and run again; tasks
+should be safe to repeat. A failed job is retried with exponential backoff
+(held in a sorted set until it is due) and moved to the dead-letter list after
+its last retry. Queue wait and run time of every job are sampled for
+`stats()`.
+
+With TASK_QUEUE_EAGER the task runs inline instead, which needs no worker.
+"""
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+from .async_redis import get_connection
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'tasks:stream'
+GROUP_NAME = 'task-workers'
+DELAYED_KEY = 'tasks:delayed'
+DEAD_KEY = 'tasks:dead'
+NAMES_KEY = 'tasks:names'
+
+SUCCEEDED = 'succeeded'
+RETRIED = 'retried'
+DEAD = 'dead'
+EXPIRED = 'expired'
+
+
+def _stats_key(name):
+    return f"tasks:stats:{name}"
+
+
+def _samples_key(name, metric):
+    return f"tasks:samples:{name}:{metric}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+class Task:
+    """
+    A function that can be queued. Calling the task runs it directly.
+    """
+
+    def __init__(self, func, max_retries=None, expires=None):
+        self.func = func
+        self.name = f"{func.__module__}.{func.__name__}"
+        self.max_retries = settings.TASK_QUEUE_MAX_RETRIES if max_retries is None else max_retries
+        # Seconds after which a job that has not run yet is dropped.
+        self.expires = expires
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """
+        Queue the task after the current transaction commits.
+
+        Returns the job id.
+        """
+        return self.apply_async(args, kwargs)
+
+    def _job(self, args, kwargs):
+        return {
+            'id': uuid.uuid4().hex,
+            'task': self.name,
+            'args': args,
+            'kwargs': kwargs,
+            'attempt': 0,
+        }
+
+    def apply_async(self, args=(), kwargs=None, countdown=None):
+        """
+        Queue the task after the current transaction commits, to run no
+        sooner than `countdown` seconds from then if given.
+
+        Returns the job id.
+        """
+        kwargs = kwargs or {}
+        job = self._job(args, kwargs)
+        if settings.TASK_QUEUE_EAGER:
+            transaction.on_commit(lambda: self.func(*args, **kwargs))
+        else:
+            transaction.on_commit(lambda: _push(job, countdown))
+        return job['id']
+
+    async def adelay(self, *args, **kwargs):
+        """
+        Queue the task right away from the event loop, on the shared asyncio
+        Redis client rather than through the database thread pool.
+
+        Returns the job id.
+        """
+        job = self._job(args, kwargs)
+        if settings.TASK_QUEUE_EAGER:
+            await sync_to_async(self.func)(*args, **kwargs)
+        else:
+            job['created_at'] = job['queued_at'] = time.time()
+            await get_connection().xadd(STREAM_KEY, {'job': json.dumps(job)})
+        return job['id']
+
+
+def _push(job, countdown=None):
+    # Wait and expiry are measured from when the job is due
+    job['created_at'] = job['queued_at'] = time.time() + (countdown or 0)
+    if countdown:
+        _redis().zadd(DELAYED_KEY, {json.dumps(job): job['queued_at']})
+    else:
+        _redis().xadd(STREAM_KEY, {'job': json.dumps(job)})
+
+
+def task(func=None, *, max_retries=None, expires=None):
+    """
+    Decorator turning a module-level function into a `Task`.
+    """
+    if func is None:
+        return lambda func: Task(func, max_retries=max_retries, expires=expires)
+    return Task(func)
+
+
+# Fields every queued job carries (see Task.apply_async and _push)
+JOB_FIELDS = ('id', 'task', 'args', 'kwargs', 'attempt', 'created_at', 'queued_at')
+
+
+def _decode_job(fields):
+    """
+    The job of a stream entry. Raises ValueError, KeyError or TypeError for
+    a malformed or truncated entry.
+    """
+    job = json.loads(fields[b'job'])
+    missing = [name for name in JOB_FIELDS if name not in job]
+    if missing:
+        raise KeyError(f"job without {', '.join(missing)}")
+    return job
+
+
+def backoff(attempt):
+    """
+    Seconds to wait before retry number `attempt`: exponential, capped, jittered.
+    """
+    delay = min(settings.TASK_QUEUE_RETRY_BACKOFF * 2 ** (attempt - 1), settings.TASK_QUEUE_RETRY_BACKOFF_MAX)
+    return random.uniform(delay / 2, delay)
+
+
+def _record(pipeline, name, outcome, wait_ms=None, run_ms=None):
+    pipeline.sadd(NAMES_KEY, name)
+    pipeline.hincrby(_stats_key(name), outcome, 1)
+    for metric, value in (('wait_ms', wait_ms), ('run_ms', run_ms)):
+        if value is not None:
+            key = _samples_key(name, metric)
+            pipeline.lpush(key, round(value, 2))
+            pipeline.ltrim(key, 0, settings.TASK_QUEUE_LATENCY_SAMPLES - 1)
+
+
+class Worker:
+    """
+    Runs queued jobs one at a time.
+
+    Each pass first moves due retries back onto the stream, then runs this
+    consumer's unacknowledged jobs (left over from a crash) or else the next
+    batch of new ones. Jobs left idle by dead workers are claimed periodically.
+    """
+
+    def __init__(self, consumer_name, batch_size=10, block_ms=1000, claim_idle_ms=300000):
+        self.redis = _redis()
+        self.consumer_name = consumer_name
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self._stopped = threading.Event()
+
+    def ensure_group(self):
+        try:
+            self.redis.xgroup_create(STREAM_KEY, GROUP_NAME, id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def claim_abandoned(self):
+        """
+        Take over jobs left unacknowledged by workers that died while running them.
+        """
+        start = '0-0'
+        while True:
+            start, _claimed, *_ = self.redis.xautoclaim(
+                STREAM_KEY, GROUP_NAME, self.consumer_name,
+                min_idle_time=self.claim_idle_ms, start_id=start, count=self.batch_size,
+            )
+            if start in (b'0-0', '0-0'):
+                return
+
+    def promote_due(self):
+        """
+        Move retries whose backoff has elapsed back onto the stream.
+        """
+        due = self.redis.zrangebyscore(DELAYED_KEY, '-inf', time.time(), start=0, num=100)
+        for payload in due:
+            # Only the worker whose ZREM succeeds re-queues the job.
+            if self.redis.zrem(DELAYED_KEY, payload):
+                job = json.loads(payload)
+                job['queued_at'] = time.time()
+                self.redis.xadd(STREAM_KEY, {'job': json.dumps(job)})
+        return len(due)
+
+    def _read(self, last_id):
+        response = self.redis.xreadgroup(
+            GROUP_NAME, self.consumer_name, {STREAM_KEY: last_id},
+            count=self.batch_size, block=None if last_id == '0' else self.block_ms,
+        )
+        return response[0][1] if response else []
+
+    def execute(self, entry_id, fields):
+        """
+        Run one job, then acknowledge it together with its outcome: recorded
+        as succeeded, scheduled for a retry, dead-lettered or expired.
+        """
+        pipeline = self.redis.pipeline()
+        try:
+            job = _decode_job(fields)
+        except (ValueError, KeyError, TypeError) as e:
+            # Dead-lettered as is, rather than re-read on every pending sweep
+            logger.error(f"Malformed task entry {entry_id} dead-lettered: {e!r}")
+            pipeline.lpush(DEAD_KEY, json.dumps({
+                'entry_id': entry_id.decode() if isinstance(entry_id, bytes) else entry_id,
+                'fields': {key.decode(errors='replace'): value.decode(errors='replace') for key, value in fields.items()},
+                'error': repr(e),
+                'failed_at': time.time(),
+            }))
+            pipeline.xack(STREAM_KEY, GROUP_NAME, entry_id)
+            pipeline.xdel(STREAM_KEY, entry_id)
+            pipeline.execute()
+            return
+        started = time.time()
+        wait_ms = (started - job['queued_at']) * 1000
+
+        task = None
+        try:
+            task = import_string(job['task'])
+            if task.expires is not None and started - job['created_at'] > task.expires:
+                logger.info(f"Task {job['task']} {job['id']} expired before it ran")
+                _record(pipeline, job['task'], EXPIRED, wait_ms=wait_ms)
+            else:
+                task.func(*job['args'], **job['kwargs'])
+                _record(pipeline, job['task'], SUCCEEDED, wait_ms, (time.time() - started) * 1000)
+        except Exception as e:
+            run_ms = (time.time() - started) * 1000
+            job['attempt'] += 1
+            if task is not None and job['attempt'] <= task.max_retries:
+                delay = backoff(job['attempt'])
+                logger.warning(
+                    f"Task {job['task']} {job['id']} failed (attempt {job['attempt']}), retrying in {delay:.1f}s: {e}"
+                )
+                pipeline.zadd(DELAYED_KEY, {json.dumps(job): time.time() + delay})
+                _record(pipeline, job['task'], RETRIED, wait_ms, run_ms)
+            else:
+                logger.error(f"Task {job['task']} {job['id']} failed permanently: {e}")
+                job['error'] = repr(e)
+                job['failed_at'] = time.time()
+                pipeline.lpush(DEAD_KEY, json.dumps(job))
+                _record(pipeline, job['task'], DEAD, wait_ms, run_ms)
+        finally:
+            close_old_connections()
+
+        pipeline.xack(STREAM_KEY, GROUP_NAME, entry_id)
+        pipeline.xdel(STREAM_KEY, entry_id)
+        pipeline.execute()
+
+    def run_once(self):
+        self.promote_due()
+        entries = self._read('0') or self._read('>')
+        for entry_id, fields in entries:
+            if fields:
+                self.execute(entry_id, fields)
+            else:
+                # Deleted from the stream while pending
+                self.redis.xack(STREAM_KEY, GROUP_NAME, entry_id)
+        return len(entries)
+
+    def run(self):
+        self.ensure_group()
+        last_claim = None
+        while not self._stopped.is_set():
+            try:
+                if last_claim is None or time.monotonic() - last_claim > self.claim_idle_ms / 1000:
+                    self.claim_abandoned()
+                    last_claim = time.monotonic()
+                self.run_once()
+            except Exception as e:
+                # Unacknowledged jobs stay pending and run on the next pass.
+                logger.error(f"Task worker error: {e}")
+                time.sleep(1)
+
+    def stop(self):
+        self._stopped.set()
+
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    samples = sorted(float(sample) for sample in samples)
+    pick = lambda fraction: samples[min(len(samples) - 1, int(len(samples) * fraction))]
+    return {'p50': pick(0.5), 'p95': pick(0.95), 'max': samples[-1]}
+
+
+def stats():
+    """
+    Queue depths, and per task the outcome counts and the queue wait / run
+    time percentiles (ms) over the recent samples.
+    """
+    redis = _redis()
+    names = sorted(name.decode() for name in redis.smembers(NAMES_KEY))
+    pipeline = redis.pipeline()
+    pipeline.xlen(STREAM_KEY)
+    pipeline.zcard(DELAYED_KEY)
+    pipeline.llen(DEAD_KEY)
+    for name in names:
+        pipeline.hgetall(_stats_key(name))
+        pipeline.lrange(_samples_key(name, 'wait_ms'), 0, -1)
+        pipeline.lrange(_samples_key(name, 'run_ms'), 0, -1)
+    queued, delayed, dead, *per_task = pipeline.execute()
+
+    tasks = {}
+    for index, name in enumerate(names):
+        counts, wait, run = per_task[index * 3:index * 3 + 3]
+        tasks[name] = {
+            **{outcome.decode(): int(count) for outcome, count in counts.items()},
+            'wait_ms': _percentiles(wait),
+            'run_ms': _percentiles(run),
+        }
+    return {'queued': queued, 'delayed': delayed, 'dead': dead, 'tasks': tasks}
+
+
+def retry_dead():
+    """
+    Move every dead-lettered job back onto the stream with a fresh retry budget.
+    """
+    redis = _redis()
+    moved = 0
+    while True:
+        payload = redis.rpop(DEAD_KEY)
+        if payload is None:
+            return moved
+        job = json.loads(payload)
+        job.pop('error', None)
+        job.pop('failed_at', None)
+        job['attempt'] = 0
+        job['created_at'] = job['queued_at'] = time.time()
+        redis.xadd(STREAM_KEY, {'job': json.dumps(job)})
+        moved += 1